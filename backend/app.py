@@ -6,12 +6,11 @@
 部署到Render.com
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
-import json
 from datetime import datetime, timedelta
-import traceback
 import logging
 
 # 配置日志
@@ -30,11 +29,153 @@ except ImportError as e:
     logger.error(f"garminconnect library not available: {e}")
     GARMIN_AVAILABLE = False
 
+from garmin_core.session_pool import SessionPool
+from garmin_core.token_store import create_token_store
+from garmin_core.service import GarminService, ServiceError, NotModified, load_garmin_class
+from garmin_core.http_cache import compress
+from garmin_core.streaming import stream_format, MIMETYPES
+from garmin_core.singleflight import SingleFlight
+from garmin_core.sync_state import SyncStateStore
+from garmin_core.jobs import BackfillJobManager
+from garmin_core.rate_limiter import rate_limiter
+from garmin_core.circuit_breaker import breaker, STATE_VALUES
+from garmin_core.cache import DayMetricCache
+from garmin_core.training import classifier
+from garmin_core.timing import startup
+from garmin_core.metrics import metrics, record_sync_payload
+from garmin_core import profiling
+from garmin_core import jsoncodec
+from garmin_core.locks import LeaderLock
+from garmin_core.prefetch import PrefetchScheduler
+from garmin_core.batch import BatchSync
+from garmin_core.history import MetricHistoryStore, COLUMNS as HISTORY_COLUMNS, AGGREGATES, PERIODS
+from garmin_core import config
+
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify 使用 jsoncodec（已安装 orjson / ujson 时更快）；需要缩进时（调试模式）使用默认实现"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is not None:
+            return super().dumps(obj, **kwargs)
+        return jsoncodec.dumps(obj)
+
+
 app = Flask(__name__)
-CORS(app)  # 允许跨域请求
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['ETag', 'X-Payload-Bytes'])  # 允许跨域请求（前端需要读取 ETag 做条件请求）
+
+# 按账户缓存的Garmin会话池（替代单一的全局客户端）
+session_pool = SessionPool()
+
+# 持久化的令牌存储，进程重启后无需重新登录
+token_store = create_token_store()
+
+# 按 (账户, 日期, 指标) 的数据缓存，过去的日子无需重复获取
+day_cache = DayMetricCache()
+
+# 每个账户的增量同步状态（每天是否完整同步 + 水位线）
+sync_state = SyncStateStore()
+
+# 每个账户的每日指标历史（列式存储），供 /api/garmin/summary 做区间和汇总查询
+metric_history = MetricHistoryStore()
+
+# 合并同一账户、同一日期范围的并发同步请求
+sync_flights = SingleFlight()
+
+# 登录、同步和用户信息的统一实现（与 Vercel 函数和命令行共用）
+garmin_service = GarminService(
+    Garmin if GARMIN_AVAILABLE else None,
+    session_pool=session_pool,
+    token_store=token_store,
+    cache=day_cache,
+    sync_state=sync_state,
+    history=metric_history,
+    flights=sync_flights,
+    garmin_loader=load_garmin_class if config.CLIENT_CLASS else None  # GARMIN_CLIENT_CLASS 替代 garminconnect
+)
+
+
+def service_response(handle, *args):
+    """调用 GarminService，ServiceError 转换为对应状态码的 JSON 响应，NotModified 转换为 304"""
+    try:
+        body = handle(*args)
+    except NotModified as e:
+        return Response(status=304, headers={'ETag': e.etag})
+    except ServiceError as e:
+        response = jsonify(e.to_dict())
+        if e.extra.get('retry_after') is not None:
+            response.headers['Retry-After'] = str(max(1, int(e.extra['retry_after'] + 0.5)))
+        return response, e.status
+    response = jsonify(body)
+    if body.get('etag'):
+        response.headers['ETag'] = body['etag']
+        record_sync_payload(body.get('format', 'full'), response.content_length or 0)
+    return response
+
+
+def request_account():
+    """只读取本地数据的接口的账户：验证 email 和 session_token（X-Session-Token 请求头或请求体）或请求体中的 password，
+    失败时抛出 ServiceError。session_token 是长期有效的凭据，不从查询参数读取（会留在访问日志和代理日志中）"""
+    data = request.get_json(silent=True) or {}
+    return garmin_service.authenticate({
+        'email': data.get('email') or request.args.get('email'),
+        'session_token': request.headers.get('X-Session-Token') or data.get('session_token'),
+        'password': data.get('password')
+    })
+
 
-# 全局Garmin客户端实例
-garmin_client = None
+def backfill_scope():
+    """回填任务的访问范围：管理员（X-Admin-Token）返回None表示所有账户，否则返回凭据验证通过的账户"""
+    if profiling.is_admin(request.headers.get('X-Admin-Token')):
+        return None
+    return request_account()
+
+
+@app.after_request
+def compress_response(response):
+    """按 Accept-Encoding 压缩较大的 JSON 响应（流式响应不压缩，保证逐帧送达），X-Payload-Bytes 为压缩前的大小"""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    raw = response.get_data()
+    response.headers['X-Payload-Bytes'] = str(len(raw))
+    body, encoding = compress(raw, request.headers.get('Accept-Encoding'))
+    response.headers.add('Vary', 'Accept-Encoding')
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# 历史数据回填任务（后台线程执行，重启后从检查点继续；多个 worker 进程时只在 leader 进程中执行）
+backfill_jobs = BackfillJobManager(
+    client_provider=garmin_service.session_client,
+    cache=day_cache,
+    sync_state=sync_state,
+    history=metric_history,
+    leader=LeaderLock('backfill')
+)
+backfill_jobs.start()
+
+# 多账户批量同步（按账户轮转，与其他请求共享限流预算）
+batch_sync = BatchSync(garmin_service)
+
+# 定时预取所有已知账户今天和昨天的数据，用户打开应用时直接命中缓存（多个 worker 进程时只在 leader 进程中执行）
+prefetcher = PrefetchScheduler(garmin_service, leader=LeaderLock('prefetch'))
+prefetcher.start()
+
+# /metrics 导出时读取的瞬时值
+metrics.gauge('garmin_cache_hit_ratio', lambda: day_cache.stats()['hit_ratio'], 'Day metric cache hit ratio')
+metrics.gauge('garmin_active_sessions', lambda: len(session_pool), 'Logged-in Garmin sessions in the pool')
+metrics.gauge('garmin_syncs_in_flight', lambda: sync_flights.stats()['in_flight'], 'Sync requests currently running')
+metrics.gauge('garmin_backfill_jobs_active', backfill_jobs.active_count, 'Queued or running backfill jobs')
+metrics.gauge('garmin_rate_limit_rps', lambda: rate_limiter.state()['rate'], 'Current shared rate limiter rate')
+metrics.gauge('garmin_circuit_state', lambda: STATE_VALUES[breaker.state()['state']],
+              'Upstream circuit breaker state (0 closed, 1 half-open, 2 open)')
+metrics.gauge('garmin_training_cache_hit_ratio', lambda: classifier.stats()['hit_ratio'],
+              'Activity classification cache hit ratio')
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -42,376 +183,265 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'garmin_available': GARMIN_AVAILABLE,
+        'sessions': session_pool.stats(),
+        'rate_limit': rate_limiter.state(),
+        'circuit': breaker.state(),
+        'cache': day_cache.stats(),
+        'backfill_jobs_active': backfill_jobs.active_count(),
+        'prefetch': prefetcher.state(),
+        'sync_requests': sync_flights.stats(),
+        'training_cache': classifier.stats(),
+        'startup': startup.report(),
+        'worker': {
+            'pid': os.getpid(),
+            'backfill_leader': backfill_jobs.is_runner,
+            'prefetch_leader': prefetcher.is_running,
+            'rate_limit_backend': config.RATE_LIMIT_BACKEND,
+            'json_encoder': jsoncodec.ENCODER
+        },
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 文本格式的运行指标：上游请求耗时/结果、缓存命中率、会话数、进行中的同步"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/garmin/login', methods=['POST'])
 def garmin_login():
     """Garmin登录端点"""
-    global garmin_client
+    return service_response(garmin_service.login, request.get_json(silent=True) or {})
+
+@app.route('/api/garmin/sync', methods=['POST'])
+def garmin_sync():
+    """Garmin数据同步端点 - 只获取必要数据，可选流式输出（每天就绪后立即返回）"""
+    data = request.get_json(silent=True) or {}
+    fmt = stream_format(data.get('stream'), request.headers.get('Accept'))
+    if data.get('profile'):
+        return profiled_sync(data, fmt)
+    if not fmt:
+        return service_response(garmin_service.sync, data, request.headers.get('If-None-Match'))
     
-    if not GARMIN_AVAILABLE:
+    try:
+        frames = garmin_service.stream_sync(data, fmt)
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
+    return Response(
+        stream_with_context(frames),
+        mimetype=MIMETYPES[fmt],
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # 关闭反向代理缓冲，保证逐帧送达
+        }
+    )
+
+def profiled_sync(data, fmt):
+    """管理员对一次同步做性能分析（profile: cprofile / sampling），分析文件通过 /api/garmin/profiles/<id> 下载"""
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
         return jsonify({
             'success': False,
-            'error': 'garminconnect library not available'
-        }), 500
-    
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        password = data.get('password')
-        
-        if not email or not password:
-            return jsonify({
-                'success': False,
-                'error': 'Email and password are required'
-            }), 400
-        
-        logger.info(f"Attempting Garmin login for user: {email}")
-        
-        # 创建Garmin客户端
-        garmin_client = Garmin(email, password)
-        
-        # 尝试登录
-        try:
-            garmin_client.login()
-            logger.info("Garmin login successful")
-            
-            # 简单验证登录状态 - 只获取基本用户信息
-            try:
-                # 使用最简单的API调用来验证登录状态
-                user_profile = garmin_client.get_full_name()
-                if user_profile:
-                    logger.info(f"Login verified - user: {user_profile}")
-                    return jsonify({
-                        'success': True,
-                        'message': 'Successfully logged in to Garmin Connect',
-                        'user_info': {
-                            'name': user_profile,
-                            'email': email
-                        }
-                    })
-                else:
-                    # 如果获取用户名失败，但登录成功，仍然返回成功
-                    logger.warning("Could not retrieve user profile, but login appears successful")
-                    return jsonify({
-                        'success': True,
-                        'message': 'Successfully logged in to Garmin Connect',
-                        'user_info': {
-                            'email': email
-                        }
-                    })
-                    
-            except Exception as profile_error:
-                logger.warning(f"Could not retrieve user profile after login: {profile_error}")
-                
-                # 检查是否是隐私保护问题
-                error_msg = str(profile_error).lower()
-                if "privacy" in error_msg or "protected" in error_msg:
-                    logger.info("Privacy protection detected, but login successful")
-                    return jsonify({
-                        'success': True,
-                        'message': 'Successfully logged in to Garmin Connect (privacy protection active)',
-                        'user_info': {
-                            'email': email
-                        },
-                        'warning': 'Some data may be privacy protected. Please check your Garmin Connect privacy settings.'
-                    })
-                
-                # 对于其他错误，仍然认为登录成功（因为login()没有抛出异常）
-                return jsonify({
-                    'success': True,
-                    'message': 'Successfully logged in to Garmin Connect',
-                    'user_info': {
-                        'email': email
-                    },
-                    'warning': 'Could not verify user profile, but login appears successful.'
-                })
-                
-        except Exception as login_error:
-            logger.error(f"Garmin login failed: {login_error}")
-            garmin_client = None
-            
-            # 分析登录错误类型
-            error_msg = str(login_error).lower()
-            if "privacy" in error_msg or "protected" in error_msg:
-                return jsonify({
-                    'success': False,
-                    'error': 'Privacy protection is active on your Garmin account. Please check your Garmin Connect privacy settings and try again.',
-                    'error_type': 'privacy_protected'
-                }), 403
-            elif "authentication" in error_msg or "credential" in error_msg or "password" in error_msg:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid email or password. Please check your Garmin Connect credentials.',
-                    'error_type': 'invalid_credentials'
-                }), 401
-            elif "too many" in error_msg or "rate limit" in error_msg:
-                return jsonify({
-                    'success': False,
-                    'error': 'Too many login attempts. Please wait a few minutes and try again.',
-                    'error_type': 'rate_limited'
-                }), 429
-            elif "network" in error_msg or "connection" in error_msg:
-                return jsonify({
-                    'success': False,
-                    'error': 'Network connection error. Please check your internet connection and try again.',
-                    'error_type': 'network_error'
-                }), 503
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': f'Login failed: {str(login_error)}',
-                    'error_type': 'unknown_error'
-                }), 500
-        
-    except Exception as e:
-        logger.error(f"Garmin login error: {e}")
-        logger.error(traceback.format_exc())
-        garmin_client = None
+            'error': 'Profiling requires a valid X-Admin-Token'
+        }), 403
+    if fmt:
         return jsonify({
             'success': False,
-            'error': f'Login error: {str(e)}'
-        }), 500
-
-@app.route('/api/garmin/sync', methods=['POST'])
-def garmin_sync():
-    """Garmin数据同步端点 - 优化版本，只获取必要数据"""
-    global garmin_client
-    
-    if not GARMIN_AVAILABLE:
+            'error': 'Profiling is not supported for streaming sync'
+        }), 400
+    mode = data.get('profile')
+    if mode not in profiling.PROFILE_FORMATS:
         return jsonify({
             'success': False,
-            'error': 'garminconnect library not available'
-        }), 500
+            'error': f"Unknown profile mode: {mode}. Use {' or '.join(profiling.PROFILE_FORMATS)}"
+        }), 400
     
-    if not garmin_client:
+    # 分析的同步单独执行（不与其他请求合并），并附带耗时树
+    try:
+        result, profile = profiling.capture(mode, garmin_service.sync, {**data, 'debug_timings': True})
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
+    profile['download'] = f"/api/garmin/profiles/{profile['id']}"
+    result['profile'] = profile
+    return jsonify(result)
+
+@app.route('/api/garmin/sync/batch', methods=['POST'])
+def garmin_sync_batch():
+    """多账户批量同步（仅管理员）- 按账户轮转执行，返回每个账户的结果，或流式输出进度"""
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
         return jsonify({
             'success': False,
-            'error': 'Not logged in. Please login first.'
-        }), 401
-    
+            'error': 'Batch sync requires a valid X-Admin-Token'
+        }), 403
+    data = request.get_json(silent=True) or {}
+    fmt = stream_format(data.get('stream'), request.headers.get('Accept'))
     try:
-        data = request.get_json()
-        target_date = data.get('date')
-        days_count = min(data.get('days', 3), 7)  # 限制最多7天，默认3天
-        
-        # 设置目标日期
-        if target_date:
-            try:
-                date_obj = datetime.strptime(target_date, '%Y-%m-%d')
-            except ValueError:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid date format. Use YYYY-MM-DD'
-                }), 400
-        else:
-            date_obj = datetime.now()
-        
-        logger.info(f"Syncing Garmin data for {days_count} days from {date_obj.strftime('%Y-%m-%d')}")
-        
-        # 获取数据 - 只获取核心健康数据
-        result_data = []
-        
-        for i in range(days_count):
-            current_date = date_obj - timedelta(days=i)
-            date_str = current_date.strftime('%Y-%m-%d')
-            
-            try:
-                logger.info(f"Fetching essential data for {date_str}")
-                
-                # 添加延迟以避免API限制
-                import time
-                if i > 0:  # 第一次请求不延迟
-                    time.sleep(2)  # 增加到2秒延迟
-                
-                day_data = {
-                    'date': date_str,
-                    'steps': None,
-                    'heart_rate': None,
-                    'sleep': None,
-                    'weight': None,
-                    'activities_summary': None
-                }
-                
-                # 1. 获取步数数据（最重要的基础数据）
-                try:
-                    steps_data = garmin_client.get_steps_data(date_str)
-                    if steps_data and not (isinstance(steps_data, dict) and steps_data.get('privacyProtected')):
-                        # 只提取关键步数信息
-                        day_data['steps'] = {
-                            'total_steps': steps_data.get('totalSteps', 0),
-                            'step_goal': steps_data.get('stepGoal', 0),
-                            'distance': steps_data.get('totalDistance', 0)
-                        }
-                        logger.info(f"Steps data retrieved for {date_str}: {day_data['steps']['total_steps']} steps")
-                    else:
-                        logger.warning(f"Steps data privacy protected for {date_str}")
-                except Exception as steps_error:
-                    logger.warning(f"Could not fetch steps data for {date_str}: {steps_error}")
-                
-                # 2. 获取心率数据（核心健康指标）
-                try:
-                    hr_data = garmin_client.get_heart_rates(date_str)
-                    if hr_data and not (isinstance(hr_data, dict) and hr_data.get('privacyProtected')):
-                        # 只提取关键心率信息
-                        day_data['heart_rate'] = {
-                            'resting_hr': hr_data.get('restingHeartRate'),
-                            'max_hr': hr_data.get('maxHeartRate'),
-                            'min_hr': hr_data.get('minHeartRate')
-                        }
-                        logger.info(f"Heart rate data retrieved for {date_str}")
-                    else:
-                        logger.warning(f"Heart rate data privacy protected for {date_str}")
-                except Exception as hr_error:
-                    logger.warning(f"Could not fetch heart rate data for {date_str}: {hr_error}")
-                
-                # 3. 获取睡眠数据（如果可用）
-                try:
-                    sleep_data = garmin_client.get_sleep_data(date_str)
-                    if sleep_data and not (isinstance(sleep_data, dict) and sleep_data.get('privacyProtected')):
-                        # 只提取关键睡眠信息
-                        daily_sleep = sleep_data.get('dailySleepDTO', {})
-                        day_data['sleep'] = {
-                            'total_sleep_time': daily_sleep.get('sleepTimeSeconds'),
-                            'deep_sleep_time': daily_sleep.get('deepSleepSeconds'),
-                            'light_sleep_time': daily_sleep.get('lightSleepSeconds'),
-                            'rem_sleep_time': daily_sleep.get('remSleepSeconds'),
-                            'sleep_score': daily_sleep.get('overallSleepScore')
-                        }
-                        logger.info(f"Sleep data retrieved for {date_str}")
-                    else:
-                        logger.warning(f"Sleep data privacy protected for {date_str}")
-                except Exception as sleep_error:
-                    logger.warning(f"Could not fetch sleep data for {date_str}: {sleep_error}")
-                
-                # 4. 获取体重数据（如果有）
-                try:
-                    weight_data = garmin_client.get_body_composition(date_str)
-                    if weight_data and not (isinstance(weight_data, dict) and weight_data.get('privacyProtected')):
-                        # 只提取体重信息
-                        if weight_data.get('totalAverage'):
-                            day_data['weight'] = {
-                                'weight': weight_data['totalAverage'].get('weight'),
-                                'bmi': weight_data['totalAverage'].get('bmi')
-                            }
-                            logger.info(f"Weight data retrieved for {date_str}")
-                except Exception as weight_error:
-                    logger.warning(f"Could not fetch weight data for {date_str}: {weight_error}")
-                
-                # 5. 获取活动汇总（简化版本）
-                try:
-                    activities = garmin_client.get_activities_by_date(date_str, date_str)
-                    if activities and not (isinstance(activities, dict) and activities.get('privacyProtected')):
-                        # 只提取活动数量和类型
-                        day_data['activities_summary'] = {
-                            'total_activities': len(activities) if activities else 0,
-                            'activity_types': list(set([act.get('activityType', {}).get('typeKey', 'unknown') 
-                                                      for act in activities[:5]])) if activities else []  # 最多5个活动类型
-                        }
-                        logger.info(f"Activities summary retrieved for {date_str}: {day_data['activities_summary']['total_activities']} activities")
-                    else:
-                        logger.warning(f"Activities data privacy protected for {date_str}")
-                except Exception as activities_error:
-                    logger.warning(f"Could not fetch activities for {date_str}: {activities_error}")
-                
-                result_data.append(day_data)
-                logger.info(f"Successfully processed essential data for {date_str}")
-                
-            except Exception as e:
-                logger.error(f"Error fetching data for {date_str}: {e}")
-                
-                # 检查是否是隐私保护或认证错误
-                error_msg = str(e).lower()
-                if "privacy" in error_msg or "protected" in error_msg:
-                    logger.error("Privacy protection error - stopping sync")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Privacy protection activated. Please check your Garmin Connect privacy settings or try again later.',
-                        'partial_data': result_data if result_data else None
-                    }), 403
-                elif "authentication" in error_msg or "login" in error_msg:
-                    logger.error("Authentication error - need re-login")
-                    return jsonify({
-                        'success': False,
-                        'error': 'Authentication expired. Please re-login to Garmin Connect.',
-                        'partial_data': result_data if result_data else None
-                    }), 401
-                elif "too many" in error_msg or "rate limit" in error_msg:
-                    logger.error("Rate limit error - stopping sync")
-                    return jsonify({
-                        'success': False,
-                        'error': 'API rate limit exceeded. Please try again later.',
-                        'partial_data': result_data if result_data else None
-                    }), 429
-                
-                # 对于其他错误，记录但继续处理下一天
-                day_data = {
-                    'date': date_str,
-                    'error': str(e),
-                    'steps': None,
-                    'heart_rate': None,
-                    'sleep': None,
-                    'weight': None,
-                    'activities_summary': None
-                }
-                result_data.append(day_data)
-        
-        logger.info(f"Sync completed. Retrieved data for {len(result_data)} days")
-        
+        if not fmt:
+            return jsonify(batch_sync.run(data))
+        frames = batch_sync.stream(data, fmt)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid batch request: {str(e)}'
+        }), 400
+    return Response(
+        stream_with_context(frames),
+        mimetype=MIMETYPES[fmt],
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/api/garmin/profiles/<profile_id>', methods=['GET'])
+def garmin_profile_download(profile_id):
+    """下载性能分析文件（仅管理员）：cprofile 为 pstats 文件，sampling 为 folded 调用栈文本"""
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
         return jsonify({
-            'success': True,
-            'data': result_data,
-            'message': f'Successfully synced {len(result_data)} days of essential health data'
-        })
-        
-    except Exception as e:
-        logger.error(f"Garmin sync error: {e}")
-        logger.error(traceback.format_exc())
+            'success': False,
+            'error': 'Downloading profiles requires a valid X-Admin-Token'
+        }), 403
+    path, mimetype = profiling.profile_path(profile_id)
+    if path is None:
         return jsonify({
             'success': False,
-            'error': f'Sync error: {str(e)}'
-        }), 500
+            'error': 'Profile not found'
+        }), 404
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=os.path.basename(path))
 
 @app.route('/api/garmin/user-info', methods=['POST'])
 def garmin_user_info():
     """获取Garmin用户信息"""
-    global garmin_client
+    return service_response(garmin_service.user_info, request.get_json(silent=True) or {})
+
+@app.route('/api/garmin/backfill', methods=['POST'])
+def garmin_backfill_submit():
+    """提交历史数据回填任务（后台执行）"""
+    data = request.get_json(silent=True) or {}
+    try:
+        account, _ = garmin_service.require_client(data)
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
     
-    if not GARMIN_AVAILABLE:
+    start_date = data.get('start_date')
+    end_date = data.get('end_date') or datetime.now().strftime('%Y-%m-%d')
+    if not start_date:
+        return jsonify({
+            'success': False,
+            'error': 'start_date is required'
+        }), 400
+    
+    try:
+        job = backfill_jobs.submit(account, start_date, end_date)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid backfill range: {str(e)}. Use YYYY-MM-DD'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'data': job
+    }), 202
+
+@app.route('/api/garmin/backfill', methods=['GET'])
+def garmin_backfill_list():
+    """列出当前账户的回填任务（管理员列出所有任务，可用 ?email= 过滤）"""
+    try:
+        account = backfill_scope()
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
+    return jsonify({
+        'success': True,
+        'data': backfill_jobs.list(account or request.args.get('email'))
+    })
+
+def scoped_backfill_job(job_id):
+    """按访问范围查找回填任务：其他账户的任务与不存在的任务一样返回404"""
+    account = backfill_scope()
+    job = backfill_jobs.get(job_id)
+    if job is None or (account is not None and job['account'] != account):
+        raise ServiceError('Backfill job not found', 404)
+    return job
+
+@app.route('/api/garmin/backfill/<job_id>', methods=['GET'])
+def garmin_backfill_status(job_id):
+    """查询回填任务进度"""
+    try:
+        job = scoped_backfill_job(job_id)
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
+    return jsonify({
+        'success': True,
+        'data': job
+    })
+
+@app.route('/api/garmin/backfill/<job_id>/cancel', methods=['POST'])
+def garmin_backfill_cancel(job_id):
+    """取消回填任务"""
+    try:
+        scoped_backfill_job(job_id)
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
+    job = backfill_jobs.cancel(job_id)
+    if job is None:
         return jsonify({
             'success': False,
-            'error': 'garminconnect library not available'
-        }), 500
+            'error': 'Backfill job not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'data': job
+    })
+
+@app.route('/api/garmin/rate-limit', methods=['GET'])
+def garmin_rate_limit():
+    """查看共享限流器的令牌和退避状态，以及上游熔断器状态"""
+    return jsonify({
+        'success': True,
+        'data': {**rate_limiter.state(), 'circuit': breaker.state()}
+    })
+
+@app.route('/api/garmin/summary', methods=['GET'])
+def garmin_summary():
+    """基于已同步的每日指标历史做区间、滑动平均和按周/月汇总查询（不请求Garmin）"""
+    args = request.args
+    try:
+        account = request_account()
+    except ServiceError as e:
+        return jsonify(e.to_dict()), e.status
     
-    if not garmin_client:
+    op = args.get('op', 'range')
+    period = args.get('period', 'week')
+    how = args.get('aggregate', 'mean')
+    columns = [m.strip() for m in args.get('metrics', '').split(',') if m.strip()] or None
+    unknown = [m for m in columns or [] if m not in HISTORY_COLUMNS]
+    if op not in ('range', 'rolling', 'rollup') or period not in PERIODS or how not in AGGREGATES or unknown:
         return jsonify({
             'success': False,
-            'error': 'Not logged in. Please login first.'
-        }), 401
+            'error': f"Invalid query. op: range/rolling/rollup, period: {'/'.join(PERIODS)}, "
+                     f"aggregate: {'/'.join(AGGREGATES)}, metrics: {', '.join(HISTORY_COLUMNS)}"
+        }), 400
     
     try:
-        logger.info("Fetching Garmin user info")
-        
-        # 获取用户信息
-        user_profile = garmin_client.get_full_name()
-        user_settings = garmin_client.get_user_settings()
-        
+        window = max(1, min(int(args.get('window', 7)), 365))
+        end_obj = datetime.strptime(args['end'], '%Y-%m-%d') if args.get('end') else datetime.now()
+        start_obj = (datetime.strptime(args['start'], '%Y-%m-%d') if args.get('start')
+                     else end_obj - timedelta(days=config.HISTORY_DEFAULT_DAYS - 1))
+    except ValueError:
         return jsonify({
-            'success': True,
-            'data': {
-                'profile': user_profile,
-                'settings': user_settings
-            }
-        })
-        
-    except Exception as e:
-        logger.error(f"Error fetching user info: {e}")
-        logger.error(traceback.format_exc())
+            'success': False,
+            'error': 'Invalid date format. Use YYYY-MM-DD'
+        }), 400
+    if start_obj > end_obj:
         return jsonify({
             'success': False,
-            'error': f'Error fetching user info: {str(e)}'
-        }), 500
+            'error': '"start" must not be after "end"'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'data': metric_history.query(account, start_obj.strftime('%Y-%m-%d'), end_obj.strftime('%Y-%m-%d'),
+                                     metrics=columns, op=op, window=window, period=period, how=how)
+    })
 
 @app.errorhandler(404)
 def not_found(error):
@@ -428,6 +458,7 @@ def internal_error(error):
     }), 500
 
 if __name__ == '__main__':
+    # 开发服务器（单进程）；生产环境使用 gunicorn -c gunicorn.conf.py app:app
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
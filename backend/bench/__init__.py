@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+同步性能基准测试：本地模拟的 Garmin Connect（fake_garmin）、请求它的客户端（fake_client）
+以及驱动 Flask 后端和 Vercel 函数的测试脚本（run）
+"""
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+请求本地模拟 Garmin Connect（bench/fake_garmin.py）的 garminconnect 客户端
+FakeGarmin 是 garminconnect.Garmin 的子类，只把 garth 的 HTTP 请求改发到 GARMIN_FAKE_URL，
+其余逻辑（URL、参数、分页、隐私保护判断）与真实客户端相同。服务通过环境变量使用它：
+    GARMIN_CLIENT_CLASS=bench.fake_client:FakeGarmin GARMIN_FAKE_URL=http://127.0.0.1:8900 python app.py
+"""
+
+import os
+import json
+import base64
+
+import requests
+from requests import HTTPError
+from garth.exc import GarthHTTPError
+from garminconnect import Garmin
+
+
+def _fake_url():
+    return os.environ.get('GARMIN_FAKE_URL', 'http://127.0.0.1:8900').rstrip('/')
+
+
+class FakeGarth:
+    """garth.Client 的替身：只实现 garminconnect 和 garmin_core.auth 用到的部分"""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url or _fake_url()
+        self.sess = requests.Session()
+        self.token = None
+        self._profile = None
+
+    def _request(self, method, path, **kwargs):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        resp = self.sess.request(method, self.base_url + path, headers=headers, timeout=30, **kwargs)
+        try:
+            resp.raise_for_status()
+        except HTTPError as e:
+            raise GarthHTTPError(msg='Error in request', error=e)
+        return resp
+
+    def login(self, username, password):
+        data = self._request('POST', '/sso/login', json={'username': username, 'password': password}).json()
+        self.token = data['token']
+        self._profile = {'displayName': data['displayName'], 'fullName': data['fullName']}
+
+    def connectapi(self, path, method='GET', **kwargs):
+        resp = self._request(method, path, **kwargs)
+        return None if resp.status_code == 204 else resp.json()
+
+    @property
+    def profile(self):
+        if self._profile is None:
+            self._profile = self.connectapi('/userprofile-service/socialProfile')
+        return self._profile
+
+    def dumps(self):
+        return base64.b64encode(json.dumps({'token': self.token, 'base_url': self.base_url}).encode()).decode()
+
+    def loads(self, s):
+        data = json.loads(base64.b64decode(s))
+        self.token = data['token']
+        self.base_url = data.get('base_url') or self.base_url
+        self._profile = None
+
+    def load(self, path):
+        raise NotImplementedError('FakeGarth does not support token directories')
+
+
+class FakeGarmin(Garmin):
+    """请求 GARMIN_FAKE_URL 的 garminconnect.Garmin"""
+
+    def __init__(self, email=None, password=None, is_cn=False):
+        super().__init__(email, password, is_cn)
+        self.garth = FakeGarth()
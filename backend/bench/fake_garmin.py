@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟的 Garmin Connect
+FakeGarminServer 按 garminconnect 使用的路径返回确定性的假数据（登录、用户资料、每日汇总、步数、
+心率、睡眠、体重、活动），可配置延迟、隐私保护响应和 429 注入，并统计每个接口的请求次数；
+客户端见 bench/fake_client.py。
+
+单独运行（不依赖 garminconnect）：
+    python -m bench.fake_garmin --port 8900 --latency 0.05 --throttle-rate 0.1
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# 模拟服务的接口名 -> 路径（与 garminconnect 0.2.x 一致）
+ROUTES = [
+    ('login', 'POST', re.compile(r'^/sso/login$')),
+    ('user_profile', 'GET', re.compile(r'^/userprofile-service/socialProfile$')),
+    ('user_settings', 'GET', re.compile(r'^/userprofile-service/userprofile/user-settings$')),
+    ('daily_summary', 'GET', re.compile(r'^/usersummary-service/usersummary/daily/[^/]+$')),
+    ('daily_steps', 'GET', re.compile(r'^/usersummary-service/stats/steps/daily/(?P<start>[\d-]+)/(?P<end>[\d-]+)$')),
+    ('heart_rates', 'GET', re.compile(r'^/wellness-service/wellness/dailyHeartRate/[^/]+$')),
+    ('sleep', 'GET', re.compile(r'^/wellness-service/wellness/dailySleepData/[^/]+$')),
+    ('body_composition', 'GET', re.compile(r'^/weight-service/weight/dateRange$')),
+    ('activities', 'GET', re.compile(r'^/activitylist-service/activities/search/activities$')),
+]
+ENDPOINTS = tuple(name for name, _, _ in ROUTES)
+
+# 登录时使用此密码视为凭证错误
+INVALID_PASSWORD = 'invalid'
+
+
+def _seed(*parts):
+    """按日期等参数生成稳定的随机数，同一天的数据每次相同"""
+    return random.Random(int(hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()[:8], 16))
+
+
+def _dates(start, end):
+    start_obj = datetime.strptime(start, '%Y-%m-%d')
+    days = (datetime.strptime(end, '%Y-%m-%d') - start_obj).days + 1
+    return [(start_obj + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(max(days, 0))]
+
+
+def _timestamp_ms(date_str, seconds=0):
+    return int((datetime.strptime(date_str, '%Y-%m-%d').timestamp() + seconds) * 1000)
+
+
+def daily_summary(date_str):
+    rng = _seed('summary', date_str)
+    steps = rng.randint(2000, 16000)
+    bmr = rng.randint(1500, 1800)
+    active = rng.randint(200, 900)
+    return {
+        'calendarDate': date_str,
+        'privacyProtected': False,
+        'totalSteps': steps,
+        'dailyStepGoal': 8000,
+        'totalDistanceMeters': steps * 0.75,
+        'restingHeartRate': rng.randint(48, 62),
+        'maxHeartRate': rng.randint(140, 185),
+        'minHeartRate': rng.randint(42, 50),
+        'totalKilocalories': bmr + active,
+        'activeKilocalories': active,
+        'bmrKilocalories': bmr
+    }
+
+
+def daily_steps(date_str):
+    summary = daily_summary(date_str)
+    return {
+        'calendarDate': date_str,
+        'totalSteps': summary['totalSteps'],
+        'stepGoal': summary['dailyStepGoal'],
+        'totalDistance': summary['totalDistanceMeters']
+    }
+
+
+def heart_rates(date_str, interval=120):
+    summary = daily_summary(date_str)
+    rng = _seed('hr', date_str)
+    resting, peak = summary['restingHeartRate'], summary['maxHeartRate']
+    values = []
+    for i in range(0, 86400, interval):
+        hour = i / 3600
+        level = resting + (peak - resting) * (0.6 if 7 <= hour < 8 or 18 <= hour < 19 else 0.15 * (8 <= hour < 22))
+        values.append([_timestamp_ms(date_str, i), int(level + rng.randint(-4, 4))])
+    return {
+        'calendarDate': date_str,
+        'restingHeartRate': resting,
+        'maxHeartRate': peak,
+        'minHeartRate': summary['minHeartRate'],
+        'heartRateValues': values
+    }
+
+
+def sleep_data(date_str):
+    rng = _seed('sleep', date_str)
+    deep, light, rem, awake = (rng.randint(3600, 7200), rng.randint(10800, 16200),
+                               rng.randint(3600, 7200), rng.randint(300, 2400))
+    return {
+        'dailySleepDTO': {
+            'calendarDate': date_str,
+            'sleepTimeSeconds': deep + light + rem,
+            'deepSleepSeconds': deep,
+            'lightSleepSeconds': light,
+            'remSleepSeconds': rem,
+            'awakeSleepSeconds': awake,
+            'sleepScores': {'overall': {'value': rng.randint(50, 95)}}
+        }
+    }
+
+
+def body_composition(start, end):
+    weights = []
+    for date_str in _dates(start, end):
+        rng = _seed('weight', date_str)
+        if rng.random() < 0.5:
+            weights.append({'calendarDate': date_str, 'date': _timestamp_ms(date_str, 7 * 3600),
+                            'weight': rng.randint(68000, 72000), 'bmi': round(rng.uniform(21.5, 23.0), 1),
+                            'bodyFat': round(rng.uniform(15, 20), 1)})
+    average = {'weight': sum(w['weight'] for w in weights) / len(weights)} if weights else {}
+    return {'startDate': start, 'endDate': end, 'dateWeightList': weights, 'totalAverage': average}
+
+
+ACTIVITY_TYPES = (
+    ('running', 150, (3.0, 1.2)), ('cycling', 135, (2.8, 0.6)),
+    ('strength_training', 115, (1.2, 2.0)), ('walking', 100, (1.0, 0.0)),
+)
+
+
+def activities(start, end, per_day):
+    results = []
+    for date_str in _dates(start, end):
+        rng = _seed('activities', date_str)
+        for i in range(rng.randint(0, per_day)):
+            type_key, avg_hr, (aerobic, anaerobic) = rng.choice(ACTIVITY_TYPES)
+            duration = rng.randint(1200, 4800)
+            results.append({
+                'activityId': int(date_str.replace('-', '')) * 100 + i,
+                'activityName': type_key.replace('_', ' ').title(),
+                'activityType': {'typeKey': type_key},
+                'startTimeLocal': f'{date_str} {7 + i * 5:02d}:00:00',
+                'duration': duration,
+                'distance': duration * 2.5 if type_key != 'strength_training' else 0,
+                'calories': duration // 6,
+                'averageHR': avg_hr + rng.randint(-8, 8),
+                'aerobicTrainingEffect': aerobic,
+                'anaerobicTrainingEffect': anaerobic,
+                **{f'hrTimeInZone_{z}': duration * share for z, share in zip(range(1, 6), (0.1, 0.3, 0.4, 0.15, 0.05))}
+            })
+    return sorted(results, key=lambda a: a['startTimeLocal'], reverse=True)
+
+
+class FakeGarminServer:
+    """模拟的 Garmin Connect HTTP 服务
+
+    latency / jitter: 每个请求的延迟秒数和随机抖动
+    privacy: 返回 privacyProtected 的接口名集合（'all' 表示全部数据接口）
+    throttle_rate: 随机返回 429 的比例；throttle_rps: 超过每秒请求数时返回 429（0 表示不限制）
+    activities_per_day: 每天最多的活动数
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.0, privacy=(), throttle_rate=0.0,
+                 throttle_rps=0.0, activities_per_day=2):
+        self.options = {}
+        self._lock = threading.Lock()
+        self.configure(latency=latency, jitter=jitter, privacy=privacy, throttle_rate=throttle_rate,
+                       throttle_rps=throttle_rps, activities_per_day=activities_per_day)
+        self.reset()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def configure(self, **options):
+        with self._lock:
+            for key, value in options.items():
+                if key == 'privacy':
+                    value = set(ENDPOINTS[3:]) if value == 'all' or 'all' in (value or ()) else set(value or ())
+                self.options[key] = value
+
+    def reset(self):
+        """清空请求统计"""
+        with self._lock:
+            self.calls = Counter()
+            self.outcomes = Counter()
+            self._window = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'total': sum(self.calls.values()),
+                'outcomes': dict(self.outcomes),
+                'options': {k: sorted(v) if isinstance(v, set) else v for k, v in self.options.items()}
+            }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-garmin', daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Garmin Connect listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _record(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def _throttled(self):
+        """是否对这个请求返回 429（随机注入或超过每秒请求数）"""
+        now = time.monotonic()
+        with self._lock:
+            if self.options['throttle_rate'] and random.random() < self.options['throttle_rate']:
+                return True
+            rps = self.options['throttle_rps']
+            if rps:
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= rps:
+                    return True
+                self._window.append(now)
+        return False
+
+    def handle(self, method, path, query, body):
+        """返回 (状态码, 响应)"""
+        for name, route_method, pattern in ROUTES:
+            match = pattern.match(path)
+            if match and method == route_method:
+                break
+        else:
+            if path == '/__stats':
+                return 200, self.stats()
+            if path == '/__reset' and method == 'POST':
+                self.reset()
+                return 200, self.stats()
+            if path == '/__config' and method == 'POST':
+                self.configure(**body)
+                return 200, self.stats()
+            return 404, {'message': 'Not found'}
+
+        options = self.options
+        delay = options['latency'] + random.uniform(0, options['jitter'])
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls[name] += 1
+        if self._throttled():
+            self._record('rate_limited')
+            return 429, {'message': 'Too Many Requests'}
+
+        arg = lambda key, default=None: query.get(key, [default])[0]
+        if name == 'login':
+            if body.get('password') == INVALID_PASSWORD:
+                self._record('invalid_credentials')
+                return 401, {'message': 'Invalid username or password'}
+            self._record('success')
+            email = body.get('username') or 'user'
+            return 200, {'token': uuid.uuid4().hex, 'displayName': email.split('@')[0], 'fullName': 'Bench User'}
+        if name in options['privacy']:
+            self._record('privacy_protected')
+            return 200, {'privacyProtected': True}
+
+        self._record('success')
+        if name == 'user_profile':
+            return 200, {'displayName': 'bench', 'fullName': 'Bench User'}
+        if name == 'user_settings':
+            return 200, {'userData': {'measurementSystem': 'metric'}}
+        if name == 'daily_summary':
+            return 200, daily_summary(arg('calendarDate'))
+        if name == 'daily_steps':
+            return 200, [daily_steps(d) for d in _dates(match.group('start'), match.group('end'))]
+        if name == 'heart_rates':
+            return 200, heart_rates(arg('date'))
+        if name == 'sleep':
+            return 200, sleep_data(arg('date'))
+        if name == 'body_composition':
+            return 200, body_composition(arg('startDate'), arg('endDate'))
+        # activities：与 Garmin 一样分页，翻到空页为止
+        start, limit = int(arg('start', 0)), int(arg('limit', 20))
+        return 200, activities(arg('startDate'), arg('endDate'), options['activities_per_day'])[start:start + limit]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                except ValueError:
+                    body = {}
+                status, payload = server.handle(method, parts.path, parse_qs(parts.query), body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake Garmin Connect server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency (seconds)')
+    parser.add_argument('--privacy', default='', help='comma-separated endpoints (or "all") answering privacyProtected')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--throttle-rps', type=float, default=0.0, help='answer 429 above this many requests/second')
+    parser.add_argument('--activities-per-day', type=int, default=2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeGarminServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                              privacy=[p for p in args.privacy.split(',') if p], throttle_rate=args.throttle_rate,
+                              throttle_rps=args.throttle_rps, activities_per_day=args.activities_per_day)
+    logger.info(f"Endpoints: {', '.join(ENDPOINTS)}; control: GET /__stats, POST /__reset, POST /__config")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
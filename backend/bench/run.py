@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+同步性能基准测试
+启动本地模拟的 Garmin Connect，再分别以子进程启动 Flask 后端（app.py）和 Vercel 函数（api/garmin.py），
+按场景并发发送同步请求，报告吞吐量、p50/p95 延迟和每个场景的上游请求次数：
+
+    python -m bench.run --requests 20 --concurrency 4 --latency 0.05
+    python -m bench.run --targets flask --scenarios cold,warm --env GARMIN_RATE_LIMIT_RPS=50 --json result.json
+
+每个 (目标, 场景) 使用全新的数据目录和进程，缓存、令牌和限流状态互不影响
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .fake_garmin import FakeGarminServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = 'bench-password'
+
+# 场景：accounts 为 unique（每个请求一个新账户：登录 + 全部从上游获取）或 shared（同一账户，预热后主要命中缓存）
+SCENARIOS = {
+    'cold': {'accounts': 'unique', 'server': {}},
+    'warm': {'accounts': 'shared', 'warmup': True, 'server': {}},
+    'privacy': {'accounts': 'unique', 'server': {'privacy': ['sleep', 'daily_summary']}},
+    'throttled': {'accounts': 'unique', 'server': {'throttle_rate': 0.2}},
+}
+
+
+class Target:
+    """被测服务：启动命令、就绪检查和同步请求的格式"""
+
+    def __init__(self, name, command, path, ready_path, ready_body=None, action=None):
+        self.name = name
+        self.command = command
+        self.path = path
+        self.ready_path = ready_path
+        self.ready_body = ready_body
+        self.action = action
+
+    def sync_body(self, **body):
+        return {'action': self.action, **body} if self.action else body
+
+
+TARGETS = {
+    'flask': Target('flask', [sys.executable, 'app.py'], '/api/garmin/sync', '/health'),
+    'vercel': Target('vercel', [sys.executable, '-m', 'bench.vercel_server'], '/', '/',
+                     ready_body={'action': 'timing'}, action='sync'),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request_json(url, body=None, timeout=120):
+    """发送请求，返回 (状态码, JSON)；连接失败时抛出 URLError"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b'{}')
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b'{}')
+        except ValueError:
+            return e.code, {}
+
+
+def percentile(values, pct):
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def start_target(target, fake_url, extra_env, log_dir):
+    port = free_port()
+    env = {
+        **os.environ,
+        'PORT': str(port),
+        'GARMIN_DATA_DIR': tempfile.mkdtemp(prefix=f'bench-{target.name}-', dir=log_dir),
+        'GARMIN_CLIENT_CLASS': 'bench.fake_client:FakeGarmin',
+        'GARMIN_FAKE_URL': fake_url,
+        'GARMIN_PREFETCH_INTERVAL': '0',  # 预取会在测量期间产生额外的上游请求
+        **extra_env
+    }
+    command = target.command + (['--port', str(port)] if target.action else [])
+    log = open(os.path.join(env['GARMIN_DATA_DIR'], 'server.log'), 'w')
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            request_json(base_url + target.ready_path, target.ready_body, timeout=2)
+            return process, base_url, log
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    process.kill()
+    log.close()
+    raise RuntimeError(f'{target.name} did not start, see {log.name}')
+
+
+def stop_target(process, log):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    log.close()
+
+
+def run_scenario(target, name, scenario, fake, args, extra_env, log_dir):
+    fake.configure(latency=args.latency, jitter=args.jitter, privacy=(), throttle_rate=0.0, throttle_rps=0.0)
+    fake.configure(**scenario['server'])
+    process, base_url, log = start_target(target, fake.url, extra_env, log_dir)
+    try:
+        def body(i):
+            email = 'bench@example.com' if scenario['accounts'] == 'shared' else f'bench{i}@example.com'
+            return target.sync_body(email=email, password=PASSWORD, days=args.days, date=args.date)
+
+        if scenario.get('warmup'):
+            request_json(base_url + target.path, body(-1))
+        fake.reset()
+
+        def one(i):
+            started = time.perf_counter()
+            try:
+                status, payload = request_json(base_url + target.path, body(i))
+            except (urllib.error.URLError, OSError) as e:
+                status, payload = None, {'error': str(e)}
+            elapsed = time.perf_counter() - started
+            day_errors = sum(1 for day in payload.get('data') or [] if isinstance(day, dict)
+                             and (day.get('error') or (day.get('cache') or {}).get('failed')))
+            return elapsed, status == 200 and payload.get('success') is True, day_errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(one, range(args.requests)))
+        wall = time.perf_counter() - started
+    finally:
+        stop_target(process, log)
+
+    latencies = [r[0] for r in results]
+    upstream = fake.stats()
+    return {
+        'target': target.name,
+        'scenario': name,
+        'requests': len(results),
+        'ok': sum(1 for r in results if r[1]),
+        'days_with_errors': sum(r[2] for r in results),
+        'seconds': round(wall, 3),
+        'throughput_rps': round(len(results) / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'upstream_calls': upstream['total'],
+        'upstream_per_request': round(upstream['total'] / len(results), 2),
+        'upstream_by_endpoint': upstream['calls'],
+        'upstream_outcomes': upstream['outcomes'],
+    }
+
+
+def print_report(rows):
+    columns = [('target', 8), ('scenario', 10), ('requests', 8), ('ok', 5), ('days_with_errors', 16),
+               ('throughput_rps', 14), ('p50_ms', 9), ('p95_ms', 9), ('upstream_calls', 14),
+               ('upstream_per_request', 20)]
+    print(' '.join(name.rjust(width) for name, width in columns))
+    for row in rows:
+        print(' '.join(str(row[name]).rjust(width) for name, width in columns))
+    print()
+    for row in rows:
+        throttled = row['upstream_outcomes'].get('rate_limited', 0)
+        privacy = row['upstream_outcomes'].get('privacy_protected', 0)
+        calls = ', '.join(f'{k}={v}' for k, v in sorted(row['upstream_by_endpoint'].items()))
+        print(f"{row['target']}/{row['scenario']}: {calls} (429: {throttled}, privacy: {privacy})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync benchmark against a local fake Garmin Connect')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='comma-separated: ' + ', '.join(TARGETS))
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=10, help='sync requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'), help='last day to sync')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake upstream latency (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='fake upstream random extra latency')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra environment for the target processes, e.g. GARMIN_RATE_LIMIT_RPS=50')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    targets = [t for t in args.targets.split(',') if t]
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = [t for t in targets if t not in TARGETS] + [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown targets/scenarios: {', '.join(unknown)}")
+    extra_env = dict(item.split('=', 1) for item in args.env)
+
+    log_dir = tempfile.mkdtemp(prefix='garmin-bench-')
+    fake = FakeGarminServer(latency=args.latency, jitter=args.jitter).start()
+    rows = []
+    try:
+        for target_name in targets:
+            for name in scenarios:
+                print(f"Running {target_name}/{name} ...", file=sys.stderr)
+                rows.append(run_scenario(TARGETS[target_name], name, SCENARIOS[name], fake, args,
+                                         extra_env, log_dir))
+    finally:
+        fake.stop()
+
+    print_report(rows)
+    print(f"\nServer logs: {log_dir}", file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+在本地运行 zhiji-app/api/garmin.py 的 handler（与 Vercel 一样每个请求交给 BaseHTTPRequestHandler）
+    python -m bench.vercel_server --port 8901
+"""
+
+import os
+import argparse
+import importlib.util
+from http.server import ThreadingHTTPServer
+
+API_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'zhiji-app', 'api', 'garmin.py')
+
+
+def load_handler(path=API_PATH):
+    spec = importlib.util.spec_from_file_location('api_garmin', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve api/garmin.py locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8901)))
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), load_handler())
+    httpd.daemon_threads = True
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
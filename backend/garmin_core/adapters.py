@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+GarminService 的部署适配
+BaseHTTPRequestHandler（Vercel Serverless Function）和 stdin 命令行共用同一个 GarminService，
+请求体中的 action 决定执行 login / sync / user_info；Flask 适配见 backend/app.py
+"""
+
+import json
+import sys
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler
+
+from .service import ServiceError
+from .http_cache import compress
+from .metrics import record_sync_payload
+from . import jsoncodec
+from .streaming import stream_format, MIMETYPES
+from .timing import startup
+
+
+def make_request_handler(service):
+    """为 service 创建 BaseHTTPRequestHandler 子类"""
+
+    class GarminRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                # 读取请求体
+                content_length = int(self.headers.get('Content-Length', 0))
+                post_data = self.rfile.read(content_length)
+                try:
+                    data = json.loads(post_data.decode('utf-8'))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    self.send_json(400, {'success': False, 'error': 'Invalid JSON'})
+                    return
+
+                # 同步请求可选流式输出：每天就绪后立即写出一帧
+                if data.get('action') == 'sync':
+                    fmt = stream_format(data.get('stream'), self.headers.get('Accept'))
+                    if fmt:
+                        self.write_stream(data, fmt)
+                        return
+                    if self.headers.get('If-None-Match') and not data.get('if_none_match'):
+                        data['if_none_match'] = self.headers.get('If-None-Match')
+
+                status, result = service.dispatch(data)
+                if status == 304:
+                    self.send_response(304)
+                    self.send_header('ETag', result['etag'])
+                    self.end_headers()
+                    return
+                self.send_json(status, result)
+
+            except Exception as e:
+                self.send_json(500, {'success': False, 'error': f'Handler error: {str(e)}'})
+
+        def write_stream(self, data, fmt):
+            """把同步结果按 NDJSON / SSE 逐帧写入响应"""
+            started = time.perf_counter()
+            try:
+                frames = service.stream_sync(data, fmt)
+            except ServiceError as e:
+                self.send_json(e.status, e.to_dict())
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', MIMETYPES[fmt])
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            for frame in frames:
+                self.wfile.write(frame.encode('utf-8'))
+                self.wfile.flush()
+            startup.record_request('sync_stream', time.perf_counter() - started)
+
+        def send_json(self, status_code, body):
+            """写出 JSON 响应：带上同步数据的 ETag 和未压缩大小，按 Accept-Encoding 压缩较大的响应"""
+            raw = jsoncodec.dumps_bytes(body)
+            payload, encoding = compress(raw, self.headers.get('Accept-Encoding'))
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('X-Payload-Bytes', str(len(raw)))
+            self.send_header('Vary', 'Accept-Encoding')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            if isinstance(body, dict) and body.get('etag'):
+                self.send_header('ETag', body['etag'])
+                if status_code == 200:
+                    record_sync_payload(body.get('format', 'full'), len(raw))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return GarminRequestHandler
+
+
+def run_stdin(service, stdin=None, stdout=None):
+    """从 stdin 读取一个 JSON 请求，把结果 JSON 打印到 stdout（本地开发和脚本调用）"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    try:
+        input_data = stdin.read()
+        if not input_data:
+            result = {
+                'success': False,
+                'error': 'No input data provided'
+            }
+        else:
+            _, result = service.dispatch(json.loads(input_data))
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': f'Script error: {str(e)}',
+            'traceback': traceback.format_exc()
+        }
+    print(jsoncodec.dumps(result), file=stdout)
+    return result
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑的列式同步结果
+只返回规范化的每日指标：dates 数组加上每个指标一个数组（与 dates 一一对应，缺失为 null），
+没有原始的 daily_summary / 活动列表，体积远小于逐天的完整数据。列定义与指标历史（history）共用
+"""
+
+from collections import OrderedDict
+
+# 列名 -> (同步字段, 字段中的键)
+COLUMNS = OrderedDict([
+    ('total_steps', ('steps', 'total_steps')),
+    ('step_goal', ('steps', 'step_goal')),
+    ('distance', ('steps', 'distance')),
+    ('resting_hr', ('heart_rate', 'resting_hr')),
+    ('max_hr', ('heart_rate', 'max_hr')),
+    ('min_hr', ('heart_rate', 'min_hr')),
+    ('total_sleep_time', ('sleep', 'total_sleep_time')),
+    ('deep_sleep_time', ('sleep', 'deep_sleep_time')),
+    ('light_sleep_time', ('sleep', 'light_sleep_time')),
+    ('rem_sleep_time', ('sleep', 'rem_sleep_time')),
+    ('sleep_score', ('sleep', 'sleep_score')),
+    ('weight', ('weight', 'weight')),
+    ('bmi', ('weight', 'bmi')),
+    ('total_activities', ('activities_summary', 'total_activities')),
+    ('total_calories', ('calories', 'total_calories')),
+    ('active_calories', ('calories', 'active_calories')),
+    ('bmr_calories', ('calories', 'bmr_calories')),
+])
+
+# 紧凑模式未指定 fields 时同步的字段（覆盖所有列）
+COMPACT_FIELDS = tuple(OrderedDict.fromkeys(field for field, _ in COLUMNS.values()))
+
+
+def column_value(day_data, column):
+    """一天中某一列的数值，没有时返回None"""
+    field, key = COLUMNS[column]
+    field_value = day_data.get(field)
+    value = field_value.get(key) if isinstance(field_value, dict) else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def flatten_day(day_data):
+    """把同步结果中的一天展开为 {列名: 数值}，只包含实际获取到的值"""
+    row = {}
+    for column in COLUMNS:
+        value = column_value(day_data, column)
+        if value is not None:
+            row[column] = float(value)
+    return row
+
+
+def columns_for(fields):
+    """fields 能提供的列"""
+    return [column for column, (field, _) in COLUMNS.items() if field in fields]
+
+
+def to_columns(days, fields):
+    """逐天的同步结果 -> {'dates': [...], 'metrics': {列名: [...]}, 'errors': {date: {...}}, 'stale_dates': [...]}"""
+    columns = columns_for(fields)
+    result = {
+        'dates': [day_data['date'] for day_data in days],
+        'metrics': {column: [column_value(day_data, column) for day_data in days] for column in columns}
+    }
+    errors = {}
+    for day_data in days:
+        day_errors = dict(day_data.get('cache', {}).get('errors', {}))
+        if day_data.get('error'):
+            day_errors['day'] = day_data['error']
+        if day_errors:
+            errors[day_data['date']] = day_errors
+    if errors:
+        result['errors'] = errors
+    stale_dates = [day_data['date'] for day_data in days if day_data.get('stale')]
+    if stale_dates:
+        result['stale_dates'] = stale_dates
+    return result
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 核心模块配置
+所有参数均可通过环境变量覆盖
+"""
+
+import os
+import tempfile
+
+
+def env_int(name, default):
+    """读取整数类型的环境变量"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    """读取浮点类型的环境变量"""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name, default=False):
+    """读取布尔类型的环境变量"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+# 会话池配置
+SESSION_POOL_SIZE = env_int('GARMIN_SESSION_POOL_SIZE', 100)  # 最多缓存的账户会话数
+SESSION_IDLE_TTL = env_int('GARMIN_SESSION_IDLE_TTL', 3600)   # 会话空闲多少秒后被回收
+
+# 本地数据目录（令牌、缓存等），Vercel等只读环境下默认使用临时目录
+DATA_DIR = os.environ.get('GARMIN_DATA_DIR') or os.path.join(tempfile.gettempdir(), 'zhiji-garmin')
+
+# 令牌存储配置
+TOKEN_STORE = os.environ.get('GARMIN_TOKEN_STORE', 'file')  # file 或 kv
+TOKEN_DIR = os.environ.get('GARMIN_TOKEN_DIR') or os.path.join(DATA_DIR, 'tokens')
+TOKEN_TTL = env_int('GARMIN_TOKEN_TTL', 90 * 24 * 3600)  # 令牌最长复用时间（秒）
+SESSION_TOKENS_PER_ACCOUNT = env_int('GARMIN_SESSION_TOKENS_PER_ACCOUNT', 5)  # 每个账户保留的登录会话密钥数
+
+# Garmin 客户端类（"模块:类名"），替代 garminconnect.Garmin，例如本地基准测试用 bench.fake_garmin:FakeGarmin
+CLIENT_CLASS = os.environ.get('GARMIN_CLIENT_CLASS')
+
+# 同步引擎并发配置
+SYNC_WORKERS = env_int('GARMIN_SYNC_WORKERS', 8)            # 同步线程池大小
+MAX_CONCURRENCY = env_int('GARMIN_MAX_CONCURRENCY', 6)      # 全进程同时进行的上游请求上限
+RANGE_CHUNK_DAYS = env_int('GARMIN_RANGE_CHUNK_DAYS', 28)   # 范围查询单次最多覆盖的天数
+
+# 共享限流器配置（令牌桶 + 指数退避）
+RATE_LIMIT_RPS = env_float('GARMIN_RATE_LIMIT_RPS', 4.0)            # 稳定状态下每秒允许的上游请求数
+RATE_LIMIT_BURST = env_float('GARMIN_RATE_LIMIT_BURST', 10)         # 令牌桶容量（允许的突发请求数）
+RATE_LIMIT_MIN_RPS = env_float('GARMIN_RATE_LIMIT_MIN_RPS', 0.2)    # 被限流后速率下限
+RATE_LIMIT_RECOVERY = env_float('GARMIN_RATE_LIMIT_RECOVERY', 0.05)  # 每次成功请求恢复的速率
+BACKOFF_BASE = env_float('GARMIN_BACKOFF_BASE', 2.0)                # 首次退避秒数
+BACKOFF_MAX = env_float('GARMIN_BACKOFF_MAX', 300.0)                # 最长退避秒数
+RATE_LIMIT_MAX_WAIT = env_float('GARMIN_RATE_LIMIT_MAX_WAIT', 30.0)  # 单次请求最多等待令牌的秒数
+RATE_LIMIT_RETRIES = env_int('GARMIN_RATE_LIMIT_RETRIES', 2)        # 被限流后的重试次数
+# 限流状态存储：memory（进程内）或 sqlite（同一台机器上的多个 worker 进程共享速率预算）
+RATE_LIMIT_BACKEND = os.environ.get('GARMIN_RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_PATH = os.environ.get('GARMIN_RATE_LIMIT_PATH') or os.path.join(DATA_DIR, 'rate_limit.sqlite3')
+
+# 上游熔断：连续失败多少次后打开，打开后冷却多少秒，冷却结束后放行多少个探测请求
+CIRCUIT_FAILURE_THRESHOLD = env_int('GARMIN_CIRCUIT_FAILURE_THRESHOLD', 5)
+CIRCUIT_COOLDOWN = env_float('GARMIN_CIRCUIT_COOLDOWN', 30.0)
+CIRCUIT_HALF_OPEN_PROBES = env_int('GARMIN_CIRCUIT_HALF_OPEN_PROBES', 1)
+
+# 定时预取：每隔多少秒刷新所有已知账户最近几天的数据（0 表示关闭，应小于 GARMIN_CACHE_TTL_TODAY 以保持缓存始终有效）
+PREFETCH_INTERVAL = env_float('GARMIN_PREFETCH_INTERVAL', 240.0)
+PREFETCH_DAYS = env_int('GARMIN_PREFETCH_DAYS', 2)                        # 今天和昨天
+PREFETCH_INITIAL_DELAY = env_float('GARMIN_PREFETCH_INITIAL_DELAY', 30.0)  # 启动后第一轮预取前等待的秒数
+PREFETCH_ACTIVE_WINDOW = env_float('GARMIN_PREFETCH_ACTIVE_WINDOW', 6 * 3600.0)  # 只预取最近多少秒内有过用户请求的账户
+
+# 批量同步：同时执行的日期块上限、每块天数、每次最多账户数和每个账户最多天数
+BATCH_CONCURRENCY = env_int('GARMIN_BATCH_CONCURRENCY', 3)
+BATCH_CHUNK_DAYS = env_int('GARMIN_BATCH_CHUNK_DAYS', 7)
+BATCH_MAX_ACCOUNTS = env_int('GARMIN_BATCH_MAX_ACCOUNTS', 50)
+BATCH_MAX_DAYS = env_int('GARMIN_BATCH_MAX_DAYS', 366)
+
+# 多进程部署：跨进程锁目录和 leader 选举（后台线程只在 leader 进程中运行）
+LOCK_DIR = os.environ.get('GARMIN_LOCK_DIR') or os.path.join(DATA_DIR, 'locks')
+LEADER_RETRY_INTERVAL = env_float('GARMIN_LEADER_RETRY_INTERVAL', 15.0)  # 非 leader 进程尝试接管的间隔秒数
+
+# 每日指标缓存配置
+CACHE_PATH = os.environ.get('GARMIN_CACHE_PATH') or os.path.join(DATA_DIR, 'cache.sqlite3')
+CACHE_MEMORY_SIZE = env_int('GARMIN_CACHE_MEMORY_SIZE', 4096)     # 内存LRU条目数
+CACHE_TTL_TODAY = env_int('GARMIN_CACHE_TTL_TODAY', 300)          # 当天数据缓存秒数
+CACHE_TTL_RECENT = env_int('GARMIN_CACHE_TTL_RECENT', 3600)       # 最近几天数据缓存秒数
+CACHE_IMMUTABLE_DAYS = env_int('GARMIN_CACHE_IMMUTABLE_DAYS', 3)  # 超过多少天的数据视为不再变化（永久缓存）
+
+# 训练类型分类结果的内存LRU条目数（全部结果持久化在缓存的SQLite文件中）
+TRAINING_MEMORY_SIZE = env_int('GARMIN_TRAINING_MEMORY_SIZE', 4096)
+
+# 每日指标历史（列式存储）配置
+HISTORY_DIR = os.environ.get('GARMIN_HISTORY_DIR') or os.path.join(DATA_DIR, 'history')
+HISTORY_DEFAULT_DAYS = env_int('GARMIN_HISTORY_DEFAULT_DAYS', 30)  # summary 未指定起始日期时查询的天数
+
+# 日内心率配置
+INTRADAY_DEFAULT_RESOLUTION = env_int('GARMIN_INTRADAY_RESOLUTION', 300)  # 默认降采样间隔秒数
+INTRADAY_DEFAULT_MAX_HR = env_int('GARMIN_INTRADAY_MAX_HR', 190)          # 未提供最大心率时用于划分心率区间
+INTRADAY_MAX_GAP = env_int('GARMIN_INTRADAY_MAX_GAP', 600)                # 相邻采样间隔超过此秒数视为佩戴中断
+
+# JSON 编码器：auto（依次尝试 orjson、ujson、标准库 json）或指定 orjson / ujson / json
+JSON_ENCODER = os.environ.get('GARMIN_JSON_ENCODER', 'auto')
+
+# 响应压缩配置（brotli 需要安装 brotli 包，否则只用 gzip）
+COMPRESS_MIN_BYTES = env_int('GARMIN_COMPRESS_MIN_BYTES', 1024)  # 小于此字节数的响应不压缩
+COMPRESS_GZIP_LEVEL = env_int('GARMIN_COMPRESS_GZIP_LEVEL', 6)
+COMPRESS_BROTLI_QUALITY = env_int('GARMIN_COMPRESS_BROTLI_QUALITY', 5)
+
+# 调试与性能分析配置
+ADMIN_TOKEN = os.environ.get('GARMIN_ADMIN_TOKEN')  # 管理接口（性能分析）令牌，未设置时禁用
+PROFILE_DIR = os.environ.get('GARMIN_PROFILE_DIR') or os.path.join(DATA_DIR, 'profiles')
+PROFILE_SAMPLE_INTERVAL = env_float('GARMIN_PROFILE_SAMPLE_INTERVAL', 0.005)  # 采样分析间隔秒数
+PROFILE_KEEP = env_int('GARMIN_PROFILE_KEEP', 20)  # 最多保留的分析文件数
+
+# 增量同步配置
+SYNC_MAX_DAYS = env_int('GARMIN_SYNC_MAX_DAYS', 31)  # 使用 since 时单次同步最多覆盖的天数
+
+# 历史数据回填任务配置
+BACKFILL_WORKERS = env_int('GARMIN_BACKFILL_WORKERS', 1)          # 后台回填线程数
+BACKFILL_MAX_DAYS = env_int('GARMIN_BACKFILL_MAX_DAYS', 3650)     # 单个任务最多覆盖的天数
+BACKFILL_RETRY_DELAY = env_float('GARMIN_BACKFILL_RETRY_DELAY', 60.0)  # 被限流后第一次重试同一天前的等待秒数（之后每次加倍）
+BACKFILL_RETRY_MAX_DELAY = env_float('GARMIN_BACKFILL_RETRY_MAX_DELAY', 900.0)  # 重试等待的上限秒数
+BACKFILL_MAX_RETRIES = env_int('GARMIN_BACKFILL_MAX_RETRIES', 5)  # 同一天连续被限流多少次后任务失败
+BACKFILL_CHECKPOINT_DAYS = env_int('GARMIN_BACKFILL_CHECKPOINT_DAYS', 7)  # 每完成多少天写一次检查点（同时批量写入同步状态和指标历史）
+BACKFILL_POLL_INTERVAL = env_float('GARMIN_BACKFILL_POLL_INTERVAL', 5.0)  # leader 检查其他进程提交的任务的间隔秒数
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+历史数据回填任务
+在后台线程中按天同步任意日期范围，每完成 BACKFILL_CHECKPOINT_DAYS 天写一次检查点（同时批量写入同步状态和指标历史），
+进程重启后从最后的检查点继续（检查点之后已获取的日期命中缓存，不会重复请求Garmin）；所有请求仍经过共享限流器。
+多个 worker 进程时只有 leader 进程执行任务，其他进程提交的任务由 leader 从数据库中领取
+"""
+
+import os
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timedelta
+
+from . import config
+from .errors import RATE_LIMITED, AUTH_EXPIRED, CIRCUIT_OPEN
+from .sync_engine import fetch_day, is_day_complete, day_error_types
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+STATUS_CANCELLING = 'cancelling'  # 运行中的任务已请求取消（可能由其他进程请求），当前这一天完成后停止
+
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING, STATUS_CANCELLING)
+
+_COLUMNS = ('id', 'account', 'start_date', 'end_date', 'status', 'checkpoint', 'days_total',
+            'days_done', 'days_incomplete', 'error', 'created_at', 'updated_at')
+
+
+class BackfillJobManager:
+    """回填任务的提交、查询、取消和后台执行"""
+
+    def __init__(self, client_provider, cache=None, sync_state=None, path=None, workers=None, history=None,
+                 leader=None):
+        self.client_provider = client_provider  # account -> 已登录的客户端或None
+        self.leader = leader  # locks.LeaderLock，多进程部署时只在 leader 进程中执行任务
+        self.cache = cache
+        self.sync_state = sync_state
+        self.history = history
+        self.path = path or config.CACHE_PATH
+        self.workers = workers if workers is not None else config.BACKFILL_WORKERS
+        self._lock = threading.RLock()
+        self._conn = None
+        self._queue = queue.Queue()
+        self._cancelled = set()
+        self._wakeups = {}  # job_id -> threading.Event，取消时打断重试等待
+        self._enqueued = set()  # 已放入本进程队列、尚未执行完的任务
+        self._threads = []
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS backfill_jobs (
+                    id TEXT PRIMARY KEY,
+                    account TEXT NOT NULL,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    checkpoint TEXT,
+                    days_total INTEGER NOT NULL,
+                    days_done INTEGER NOT NULL DEFAULT 0,
+                    days_incomplete INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job['progress'] = round(job['days_done'] / job['days_total'], 4) if job['days_total'] else 1.0
+        return job
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{k}=?' for k in fields)
+        with self._lock:
+            db = self._db()
+            db.execute(f'UPDATE backfill_jobs SET {assignments} WHERE id=?', tuple(fields.values()) + (job_id,))
+            db.commit()
+
+    @property
+    def is_runner(self):
+        """本进程是否执行任务（单进程或 leader 进程）"""
+        return self.leader is None or self.leader.is_leader
+
+    def start(self):
+        """启动后台线程，并把上次未完成的任务重新排队（有 leader 锁时，成为 leader 后才启动）"""
+        if self.leader is not None:
+            self.leader.run_as_leader(self._start_workers)
+        else:
+            self._start_workers()
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            rows = self._db().execute(
+                f'SELECT id, status FROM backfill_jobs WHERE status IN ({",".join("?" * len(ACTIVE_STATUSES))}) '
+                'ORDER BY created_at', ACTIVE_STATUSES
+            ).fetchall()
+            for job_id, status in rows:
+                if status == STATUS_CANCELLING:
+                    self._update(job_id, status=STATUS_CANCELLED)
+                    continue
+                logger.info(f"Resuming backfill job {job_id} from checkpoint")
+                self._update(job_id, status=STATUS_QUEUED)
+                self._enqueue(job_id)
+            for i in range(max(1, self.workers)):
+                thread = threading.Thread(target=self._worker, name=f'garmin-backfill-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, account, start_date, end_date):
+        """提交回填任务，日期格式 YYYY-MM-DD，返回任务信息"""
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        if start > end:
+            raise ValueError('start_date must not be after end_date')
+        days_total = (end - start).days + 1
+        if days_total > config.BACKFILL_MAX_DAYS:
+            raise ValueError(f'Backfill range too large (max {config.BACKFILL_MAX_DAYS} days)')
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                'INSERT INTO backfill_jobs (id, account, start_date, end_date, status, checkpoint, days_total, '
+                'days_done, days_incomplete, error, created_at, updated_at) VALUES (?, ?, ?, ?, ?, NULL, ?, 0, 0, NULL, ?, ?)',
+                (job_id, (account or '').strip().lower(), start_date, end_date, STATUS_QUEUED, days_total, now, now)
+            )
+            db.commit()
+        self.start()
+        if self.is_runner:
+            self._enqueue(job_id)
+        logger.info(f"Backfill job {job_id} queued for {account}: {start_date} ~ {end_date}")
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db().execute(
+                f'SELECT {", ".join(_COLUMNS)} FROM backfill_jobs WHERE id=?', (job_id,)
+            ).fetchone()
+        return self._row_to_job(row)
+
+    def list(self, account=None):
+        with self._lock:
+            if account:
+                rows = self._db().execute(
+                    f'SELECT {", ".join(_COLUMNS)} FROM backfill_jobs WHERE account=? ORDER BY created_at DESC',
+                    ((account or '').strip().lower(),)
+                ).fetchall()
+            else:
+                rows = self._db().execute(
+                    f'SELECT {", ".join(_COLUMNS)} FROM backfill_jobs ORDER BY created_at DESC'
+                ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id):
+        """取消任务：排队中的任务直接取消，运行中的任务在当前这一天完成后停止"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in ACTIVE_STATUSES:
+            self._cancelled.add(job_id)
+            with self._lock:
+                wakeup = self._wakeups.get(job_id)
+            if wakeup is not None:
+                wakeup.set()
+            if job['status'] == STATUS_QUEUED:
+                self._update(job_id, status=STATUS_CANCELLED)
+            else:
+                self._update(job_id, status=STATUS_CANCELLING)
+        return self.get(job_id)
+
+    def _cancel_requested(self, job_id):
+        if job_id in self._cancelled:
+            return True
+        job = self.get(job_id)
+        return job is None or job['status'] in (STATUS_CANCELLING, STATUS_CANCELLED)
+
+    def _wait_retry(self, job_id, delay):
+        """等待 delay 秒后重试；本进程取消任务时立即返回，其他进程的取消请求（只写数据库）每 BACKFILL_POLL_INTERVAL 秒检查一次"""
+        with self._lock:
+            wakeup = self._wakeups.setdefault(job_id, threading.Event())
+        deadline = time.monotonic() + delay
+        while not self._cancel_requested(job_id):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or wakeup.wait(min(remaining, config.BACKFILL_POLL_INTERVAL)):
+                return
+
+    def active_count(self):
+        with self._lock:
+            row = self._db().execute(
+                f'SELECT COUNT(*) FROM backfill_jobs WHERE status IN ({",".join("?" * len(ACTIVE_STATUSES))})',
+                ACTIVE_STATUSES
+            ).fetchone()
+        return row[0]
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            if job_id in self._enqueued:
+                return
+            self._enqueued.add(job_id)
+        self._queue.put(job_id)
+
+    def _enqueue_pending(self):
+        """领取其他进程提交的排队任务"""
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT id FROM backfill_jobs WHERE status=? ORDER BY created_at', (STATUS_QUEUED,)
+            ).fetchall()
+        for (job_id,) in rows:
+            self._enqueue(job_id)
+
+    def _worker(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=config.BACKFILL_POLL_INTERVAL)
+            except queue.Empty:
+                self._enqueue_pending()
+                continue
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.exception(f"Backfill job {job_id} crashed: {e}")
+                self._update(job_id, status=STATUS_FAILED, error=str(e))
+            finally:
+                with self._lock:
+                    self._enqueued.discard(job_id)
+                    self._wakeups.pop(job_id, None)
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        job = self.get(job_id)
+        if job is None or job['status'] not in ACTIVE_STATUSES:
+            return
+        if job_id in self._cancelled or job['status'] == STATUS_CANCELLING:
+            self._update(job_id, status=STATUS_CANCELLED)
+            return
+
+        account = job['account']
+        client = self.client_provider(account)
+        if client is None:
+            self._update(job_id, status=STATUS_FAILED, error='Not logged in. Please login first.')
+            return
+
+        self._update(job_id, status=STATUS_RUNNING)
+        end = datetime.strptime(job['end_date'], '%Y-%m-%d')
+        if job['checkpoint']:
+            current = datetime.strptime(job['checkpoint'], '%Y-%m-%d') + timedelta(days=1)
+        else:
+            current = datetime.strptime(job['start_date'], '%Y-%m-%d')
+        days_done = job['days_done']
+        days_incomplete = job['days_incomplete']
+        pending = []  # 检查点之后已完成的 (日期, 当天数据, 是否完整)
+        retries = 0   # 当前这一天连续被限流的次数
+
+        def checkpoint(**fields):
+            """批量写入已完成日期的同步状态和指标历史，并推进检查点"""
+            if pending:
+                if self.sync_state is not None:
+                    self.sync_state.record_days(account, {date_str: complete for date_str, _, complete in pending})
+                fetched = [day_data for _, day_data, _ in pending if day_data.get('cache', {}).get('miss')]
+                if self.history is not None and fetched:
+                    self.history.record_days(account, fetched)
+                fields.update(checkpoint=pending[-1][0], days_done=days_done, days_incomplete=days_incomplete)
+                pending.clear()
+            if fields:
+                self._update(job_id, **fields)
+
+        while current <= end:
+            if self._cancel_requested(job_id):
+                checkpoint(status=STATUS_CANCELLED)
+                logger.info(f"Backfill job {job_id} cancelled at {current.strftime('%Y-%m-%d')}")
+                return
+
+            date_str = current.strftime('%Y-%m-%d')
+            day_data = fetch_day(client, date_str, account=account, cache=self.cache)
+            error_types = day_error_types(day_data)
+
+            if AUTH_EXPIRED in error_types:
+                checkpoint(status=STATUS_FAILED, error='Authentication expired. Please re-login to Garmin Connect.')
+                return
+            if RATE_LIMITED in error_types or CIRCUIT_OPEN in error_types:
+                # 不推进检查点，指数退避后重试同一天；连续失败太多次时任务失败（可以重新提交，从检查点继续）
+                retries += 1
+                if retries > config.BACKFILL_MAX_RETRIES:
+                    logger.warning(f"Backfill job {job_id} gave up on {date_str} "
+                                   f"after {config.BACKFILL_MAX_RETRIES} retries")
+                    checkpoint(status=STATUS_FAILED,
+                               error=f'Garmin rate limited or unavailable on {date_str}. Please try again later.')
+                    return
+                delay = min(config.BACKFILL_RETRY_MAX_DELAY, config.BACKFILL_RETRY_DELAY * 2 ** (retries - 1))
+                logger.warning(f"Backfill job {job_id} rate limited on {date_str}, retrying in {delay:.0f}s")
+                checkpoint()
+                self._wait_retry(job_id, delay)
+                continue
+            retries = 0
+
+            complete = is_day_complete(day_data)
+            days_done += 1
+            if not complete:
+                days_incomplete += 1
+            pending.append((date_str, day_data, complete))
+            if len(pending) >= max(1, config.BACKFILL_CHECKPOINT_DAYS):
+                checkpoint()
+            current += timedelta(days=1)
+
+        checkpoint(status=STATUS_COMPLETED)
+        logger.info(f"Backfill job {job_id} completed: {days_done} days ({days_incomplete} incomplete)")
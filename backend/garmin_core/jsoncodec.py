@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+可插拔的 JSON 编码器
+已安装 orjson 或 ujson 时使用（比标准库 json 快数倍），否则使用标准库；
+GARMIN_JSON_ENCODER 可指定 orjson / ujson / json，默认 auto。输出均为不转义非 ASCII 字符的 UTF-8
+"""
+
+import json
+import logging
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _load(name):
+    """返回 obj -> bytes 的编码函数，库未安装时抛出 ImportError"""
+    if name == 'orjson':
+        import orjson
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        return lambda obj: orjson.dumps(obj, default=str, option=options)
+    if name == 'ujson':
+        import ujson
+        return lambda obj: ujson.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+    return _stdlib_dumps
+
+
+def _select(preferred):
+    preferred = (preferred or 'auto').lower()
+    candidates = ('orjson', 'ujson', 'json') if preferred == 'auto' else (preferred, 'json')
+    for name in candidates:
+        try:
+            return name, _load(name)
+        except ImportError:
+            if preferred != 'auto':
+                logger.warning(f"JSON encoder {name} not available, falling back to json")
+    return 'json', _stdlib_dumps
+
+
+# 当前使用的编码器名称和编码函数
+ENCODER, _encode = _select(config.JSON_ENCODER)
+
+
+def dumps_bytes(obj):
+    """编码为 UTF-8 字节；快速编码器不支持的数据（例如超过64位的整数）回退到标准库"""
+    try:
+        return _encode(obj)
+    except TypeError:
+        return _stdlib_dumps(obj)
+
+
+def dumps(obj):
+    return dumps_bytes(obj).decode('utf-8')
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标（Prometheus 文本格式）
+上游 Garmin 请求的耗时直方图和结果计数由 upstream.call() 记录，
+缓存命中率、会话数、进行中的同步等瞬时值在导出时通过回调读取
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+# 耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 上游请求结果（错误时为 errors.classify_error 的分类）
+OUTCOME_SUCCESS = 'success'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """计数器、直方图和回调式仪表的集合，线程安全"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = OrderedDict()     # 名称 -> (类型, 说明)
+        self._counters = {}            # (名称, 标签) -> 数值
+        self._histograms = {}          # (名称, 标签) -> [各桶计数, 总和, 总数]
+        self._gauges = OrderedDict()   # 名称 -> 回调，返回数值或 {标签元组: 数值}
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._help:
+            self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels=None, value=1, help_text=''):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._declare(name, 'counter', help_text)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, help_text=''):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._declare(name, 'histogram', help_text)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def gauge(self, name, callback, help_text=''):
+        """注册仪表：导出时调用 callback()"""
+        with self._lock:
+            self._declare(name, 'gauge', help_text)
+            self._gauges[name] = callback
+
+    def render(self):
+        """导出为 Prometheus 文本格式"""
+        with self._lock:
+            declared = list(self._help.items())
+            counters = dict(self._counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+            gauges = dict(self._gauges)
+
+        lines = []
+        for name, (kind, help_text) in declared:
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            elif kind == 'histogram':
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        bucket_labels = labels + (('le', _format_value(float(bound))),)
+                        lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {bucket_count}')
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+            else:
+                try:
+                    value = gauges[name]()
+                except Exception:
+                    value = None
+                if isinstance(value, dict):
+                    for labels, item in sorted(value.items()):
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(item)}')
+                else:
+                    lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """计数器和直方图的简要汇总（调试用）"""
+        with self._lock:
+            return {
+                'counters': {f'{n}{_format_labels(l)}': v for (n, l), v in self._counters.items()},
+                'histograms': {f'{n}{_format_labels(l)}': {'count': h[2], 'sum': round(h[1], 4)}
+                               for (n, l), h in self._histograms.items()}
+            }
+
+
+# 进程内共享的指标
+metrics = MetricsRegistry()
+
+
+def record_upstream_call(method, seconds, outcome):
+    """记录一次上游请求的耗时和结果"""
+    labels = {'method': method}
+    metrics.observe('garmin_upstream_request_duration_seconds', seconds, labels,
+                    'Latency of upstream Garmin Connect requests')
+    metrics.inc('garmin_upstream_requests_total', dict(labels, outcome=outcome),
+                help_text='Upstream Garmin Connect requests by outcome')
+
+
+def record_rate_limit_wait(seconds):
+    """记录在共享限流器上等待的时间"""
+    metrics.observe('garmin_rate_limit_wait_seconds', seconds, None,
+                    'Time spent waiting for the shared rate limiter before an upstream request')
+
+
+def record_sync_payload(fmt, size):
+    """记录一次同步响应（未压缩）的大小，fmt 为 full 或 compact"""
+    labels = {'format': fmt}
+    metrics.inc('garmin_sync_responses_total', labels, help_text='Sync responses by payload format')
+    metrics.inc('garmin_sync_response_bytes_total', labels, size,
+                help_text='Uncompressed sync response bytes by payload format')
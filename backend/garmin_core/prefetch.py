@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+定时预取
+在后台线程中按固定周期为最近活跃的账户（PREFETCH_ACTIVE_WINDOW 秒内有过同步或用户信息请求）刷新最近几天的数据，
+用户打开应用时同步请求直接命中缓存。当天的数据强制重新获取（刷新缓存的 TTL），更早的日期只获取已过期的字段。
+一个周期内的账户均匀错开，逐个执行，请求节奏仍由共享限流器控制；熔断打开时跳过。
+预取不更新会话池中会话的最近使用时间，不再活跃的账户的会话照常空闲回收，令牌失效的账户也不会被反复重新登录。
+多个 worker 进程时只在 leader 进程中运行（账户活跃时间记录在共享的同步状态库中）
+"""
+
+import time
+import threading
+import logging
+from datetime import datetime
+
+from . import config
+from .circuit_breaker import breaker
+from .errors import UNAVAILABLE_ERRORS
+from .metrics import metrics
+from .sync_engine import fetch_days, sync_dates, day_error_types
+
+logger = logging.getLogger(__name__)
+
+# 每个账户一次预取的结果
+OUTCOME_WARMED = 'warmed'
+OUTCOME_PARTIAL = 'partial'        # 部分字段获取失败
+OUTCOME_SKIPPED = 'skipped'        # 没有可用的会话或令牌，或熔断打开
+OUTCOME_FAILED = 'failed'
+
+
+class PrefetchScheduler:
+    """按周期预取所有已知账户最近 days 天的数据（interval 为 0 时不启动）"""
+
+    def __init__(self, service, interval=None, days=None, initial_delay=None, leader=None, active_window=None):
+        self.service = service  # GarminService：会话、令牌存储、缓存、同步状态和指标历史
+        self.interval = interval if interval is not None else config.PREFETCH_INTERVAL
+        self.days = days if days is not None else config.PREFETCH_DAYS
+        self.initial_delay = initial_delay if initial_delay is not None else config.PREFETCH_INITIAL_DELAY
+        self.active_window = active_window if active_window is not None else config.PREFETCH_ACTIVE_WINDOW
+        self.leader = leader  # locks.LeaderLock
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.outcomes = {}
+        self.last_cycle = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台线程（有 leader 锁时，成为 leader 后才启动）"""
+        if not self.enabled:
+            logger.info("Prefetch disabled (GARMIN_PREFETCH_INTERVAL=0)")
+            return
+        if self.leader is not None:
+            self.leader.run_as_leader(self._start_thread)
+        else:
+            self._start_thread()
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='garmin-prefetch', daemon=True)
+            self._thread.start()
+        logger.info(f"Prefetch scheduler started: every {self.interval:.0f}s, last {self.days} days")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        if self._stop.wait(self.initial_delay):
+            return
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.run_cycle()
+            except Exception as e:
+                logger.error(f"Prefetch cycle failed: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def accounts(self):
+        """最近 active_window 秒内有过用户请求的账户"""
+        return self.service.sync_state.active_accounts(time.time() - self.active_window)
+
+    def run_cycle(self):
+        """预取一轮：账户在整个周期内均匀错开，返回 {账户: 结果}
+
+        开始前清理会话池中空闲超时的会话（包括上一轮从令牌恢复、之后不再活跃的账户）
+        """
+        evicted = self.service.session_pool.evict_idle()
+        if evicted:
+            logger.info(f"Evicted {evicted} idle session(s) before prefetch")
+        accounts = self.accounts()
+        started = time.time()
+        spacing = self.interval / len(accounts) if accounts else 0.0
+        results = {}
+        for i, account in enumerate(accounts):
+            if i and self._stop.wait(spacing):
+                break
+            if breaker.is_open:
+                outcome = OUTCOME_SKIPPED
+            else:
+                try:
+                    outcome = self.prefetch_account(account)
+                except Exception as e:
+                    logger.warning(f"Prefetch failed for {account}: {e}")
+                    outcome = OUTCOME_FAILED
+            results[account] = outcome
+            metrics.inc('garmin_prefetch_accounts_total', {'outcome': outcome},
+                        help_text='Accounts processed by the prefetch scheduler by outcome')
+            with self._lock:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+        with self._lock:
+            self.cycles += 1
+            self.last_cycle = {
+                'started_at': datetime.fromtimestamp(started).isoformat(),
+                'seconds': round(time.time() - started, 3),
+                'accounts': len(accounts),
+                'outcomes': {o: sum(1 for r in results.values() if r == o) for o in set(results.values())}
+            }
+        return results
+
+    def prefetch_account(self, account):
+        """刷新一个账户最近 days 天的数据并记录同步状态和指标历史，返回结果分类"""
+        # 不更新会话的最近使用时间；leader 进程的会话池中没有时从令牌恢复（令牌被拒绝时会被删除，之后跳过该账户）
+        client = self.service.session_pool.peek(account) or self.service.session_client(account)
+        if client is None:
+            return OUTCOME_SKIPPED
+
+        today, *earlier = sync_dates(datetime.now(), self.days)
+        fields = self.service.default_fields
+        cache = self.service.cache
+        days_data = fetch_days(client, [today], fields=fields, account=account, cache=cache, force_refresh=True)
+        if earlier:
+            days_data.update(fetch_days(client, earlier, fields=fields, account=account, cache=cache))
+        result_data = list(days_data.values())
+        self.service.finish_sync(account, result_data, fields)
+
+        error_types = set().union(*(day_error_types(d) for d in result_data))
+        if error_types & set(UNAVAILABLE_ERRORS):
+            return OUTCOME_FAILED
+        return OUTCOME_PARTIAL if error_types else OUTCOME_WARMED
+
+    def state(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'running': self.is_running,
+                'interval': self.interval,
+                'days': self.days,
+                'active_window': self.active_window,
+                'cycles': self.cycles,
+                'outcomes': dict(self.outcomes),
+                'last_cycle': self.last_cycle
+            }
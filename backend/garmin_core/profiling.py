@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+同步请求的耗时分解和性能分析
+RequestTimings 记录各阶段、每个上游请求和每天每个字段的耗时（debug_timings）；
+capture() 用 cProfile 或采样分析器执行一次请求，把结果保存到 PROFILE_DIR 供管理员下载
+"""
+
+import os
+import sys
+import hmac
+import time
+import uuid
+import cProfile
+import threading
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+CPROFILE = 'cprofile'
+SAMPLING = 'sampling'
+
+# 分析方式 -> (文件扩展名, 下载时的 MIME 类型)
+PROFILE_FORMATS = {
+    CPROFILE: ('.prof', 'application/octet-stream'),
+    SAMPLING: ('.folded', 'text/plain'),
+}
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTimings:
+    """一次请求的耗时树：phases（阶段）、calls（上游请求）、days（每天每个字段的来源和耗时）"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.calls = []
+        self.days = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_cache_hit(self, date_str, field):
+        with self._lock:
+            self.days.setdefault(date_str, {})[field] = {'source': 'cache'}
+
+    def record_call(self, call, seconds, stats):
+        """记录一次规划好的上游请求，stats 为 upstream.tracking() 的统计"""
+        entry = {
+            'endpoint': call.endpoint.name,
+            'start': call.start,
+            'end': call.end,
+            'days': len(call.dates),
+            'ms': _ms(seconds),
+            'upstream_ms': _ms(stats['upstream']),
+            'rate_limit_wait_ms': _ms(stats['wait']),
+            'attempts': stats['calls']
+        }
+        shared = sum(len(fields) for fields in call.fields.values())
+        with self._lock:
+            self.calls.append(entry)
+            for date_str, fields in call.fields.items():
+                day = self.days.setdefault(date_str, {})
+                for field in fields:
+                    # 一次请求提供多个 (日期, 字段) 时耗时平均分摊
+                    day[field] = {'source': call.endpoint.name, 'ms': _ms(seconds / shared), 'call_ms': entry['ms']}
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'total_ms': _ms(time.perf_counter() - self.started),
+                'phases': {name: _ms(seconds) for name, seconds in self.phases.items()},
+                'upstream_calls': len(self.calls),
+                'calls': sorted(self.calls, key=lambda c: -c['ms']),
+                'days': {d: self.days[d] for d in sorted(self.days, reverse=True)}
+            }
+
+
+def is_admin(token):
+    """校验管理令牌；未配置 GARMIN_ADMIN_TOKEN 时一律拒绝"""
+    return bool(config.ADMIN_TOKEN and token and hmac.compare_digest(str(token), config.ADMIN_TOKEN))
+
+
+class SamplingProfiler:
+    """定时采样所有线程的调用栈（包括同步线程池），输出 flamegraph 使用的 folded 格式"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or config.PROFILE_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            names.update({t.ident: t.name for t in threading.enumerate()})
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='garmin-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def _prune(directory, keep):
+    files = sorted((os.path.join(directory, name) for name in os.listdir(directory)), key=os.path.getmtime)
+    for path in files[:-keep] if keep else []:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def capture(mode, fn, *args, **kwargs):
+    """在性能分析下执行 fn，返回 (结果, 分析信息)
+
+    cprofile 只覆盖调用线程（请求处理和结果组装），sampling 覆盖所有线程（包括并发请求的线程池）
+    """
+    if mode not in PROFILE_FORMATS:
+        raise ValueError(f"Unknown profile mode: {mode}. Use {' or '.join(PROFILE_FORMATS)}")
+    extension, _ = PROFILE_FORMATS[mode]
+    profile_id = f'{mode}-{uuid.uuid4().hex[:12]}'
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(config.PROFILE_DIR, profile_id + extension)
+
+    started = time.perf_counter()
+    if mode == CPROFILE:
+        profiler = cProfile.Profile()
+        try:
+            result = profiler.runcall(fn, *args, **kwargs)
+        finally:
+            profiler.dump_stats(path)
+        samples = None
+    else:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            profiler.dump(path)
+        samples = profiler.samples
+
+    _prune(config.PROFILE_DIR, config.PROFILE_KEEP)
+    logger.info(f"Captured {mode} profile {profile_id} ({_ms(time.perf_counter() - started)} ms)")
+    info = {'id': profile_id, 'mode': mode, 'ms': _ms(time.perf_counter() - started)}
+    if samples is not None:
+        info['samples'] = samples
+    return result, info
+
+
+def profile_path(profile_id):
+    """分析文件路径和 MIME 类型，不存在或 id 非法时返回 (None, None)"""
+    mode = profile_id.split('-', 1)[0]
+    if mode not in PROFILE_FORMATS or not all(c.isalnum() or c == '-' for c in profile_id):
+        return None, None
+    extension, mimetype = PROFILE_FORMATS[mode]
+    path = os.path.join(config.PROFILE_DIR, profile_id + extension)
+    return (path, mimetype) if os.path.exists(path) else (None, None)
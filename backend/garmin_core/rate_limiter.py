@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+进程级共享限流器
+令牌桶控制上游请求速率；遇到 429 / TooManyRequests 时指数退避（带抖动）并降低速率，
+之后随着请求成功缓慢恢复。多个 worker 进程时用 SQLiteRateLimiter 共享同一份速率预算
+"""
+
+import os
+import time
+import random
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """等待令牌超时（错误信息包含 rate limit，便于沿用现有错误判断）"""
+
+
+class AdaptiveRateLimiter:
+    """自适应令牌桶限流器（线程安全）"""
+
+    def __init__(self, rate=None, burst=None, min_rate=None, recovery_step=None,
+                 backoff_base=None, backoff_max=None, max_wait=None):
+        self.base_rate = rate if rate is not None else config.RATE_LIMIT_RPS
+        self.burst = burst if burst is not None else config.RATE_LIMIT_BURST
+        self.min_rate = min_rate if min_rate is not None else config.RATE_LIMIT_MIN_RPS
+        self.recovery_step = recovery_step if recovery_step is not None else config.RATE_LIMIT_RECOVERY
+        self.backoff_base = backoff_base if backoff_base is not None else config.BACKOFF_BASE
+        self.backoff_max = backoff_max if backoff_max is not None else config.BACKOFF_MAX
+        self.max_wait = max_wait if max_wait is not None else config.RATE_LIMIT_MAX_WAIT
+
+        self._lock = threading.Lock()
+        self._rate = self.base_rate
+        self._tokens = float(self.burst)
+        self._updated = self._now()
+        self._backoff_until = 0.0
+        self._failures = 0
+        self._total_rate_limited = 0
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    @contextmanager
+    def _state(self):
+        """独占访问令牌桶状态"""
+        with self._lock:
+            yield
+
+    def _refill_locked(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+            self._updated = now
+
+    def _wait_time_locked(self, now):
+        if now < self._backoff_until:
+            return self._backoff_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def acquire(self, max_wait=None):
+        """获取一个令牌，必要时阻塞等待；超过 max_wait 仍拿不到时抛出 RateLimitExceeded"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = self._now() + max_wait if max_wait else None
+        while True:
+            with self._state():
+                now = self._now()
+                self._refill_locked(now)
+                wait = self._wait_time_locked(now)
+                if wait <= 0:
+                    self._tokens -= 1
+                    return
+            if deadline is not None and now + wait > deadline:
+                raise RateLimitExceeded(f'Garmin rate limit budget exhausted, retry in {wait:.1f}s')
+            time.sleep(min(wait, 1.0))
+
+    def on_rate_limited(self):
+        """上游返回限流：指数退避 + 抖动，并把速率减半"""
+        with self._state():
+            self._failures += 1
+            self._total_rate_limited += 1
+            backoff = min(self.backoff_max, self.backoff_base * (2 ** (self._failures - 1)))
+            delay = random.uniform(backoff / 2, backoff)
+            now = self._now()
+            self._backoff_until = max(self._backoff_until, now + delay)
+            self._rate = max(self.min_rate, self._rate / 2)
+            self._tokens = 0.0
+            self._updated = now
+            logger.warning(f"Garmin rate limited, backing off {delay:.1f}s (rate now {self._rate:.2f}/s)")
+
+    def on_success(self):
+        """上游请求成功：重置退避并缓慢恢复速率"""
+        with self._state():
+            self._failures = 0
+            if self._rate < self.base_rate:
+                self._rate = min(self.base_rate, self._rate + self.recovery_step)
+
+    def state(self):
+        """当前令牌和退避状态"""
+        with self._state():
+            now = self._now()
+            self._refill_locked(now)
+            return {
+                'tokens': round(self._tokens, 2),
+                'burst': self.burst,
+                'rate': round(self._rate, 3),
+                'base_rate': self.base_rate,
+                'backoff_remaining': round(max(0.0, self._backoff_until - now), 2),
+                'consecutive_rate_limits': self._failures,
+                'total_rate_limits': self._total_rate_limited
+            }
+
+
+class SQLiteRateLimiter(AdaptiveRateLimiter):
+    """令牌桶状态保存在 SQLite 中，同一数据目录下的所有进程共享速率、令牌和退避状态
+
+    每次访问状态都在 BEGIN IMMEDIATE 事务中读-改-写，时间使用 time.time()（进程间可比较）
+    """
+
+    _FIELDS = ('_rate', '_tokens', '_updated', '_backoff_until', '_failures', '_total_rate_limited')
+
+    def __init__(self, path=None, name='garmin', **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or config.RATE_LIMIT_PATH
+        self.name = name
+        self._conn = None
+
+    @staticmethod
+    def _now():
+        return time.time()
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_state (
+                    name TEXT PRIMARY KEY,
+                    rate REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    backoff_until REAL NOT NULL,
+                    failures INTEGER NOT NULL,
+                    total_rate_limited INTEGER NOT NULL
+                )
+            ''')
+        return self._conn
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute(
+                    'SELECT rate, tokens, updated, backoff_until, failures, total_rate_limited '
+                    'FROM rate_limit_state WHERE name=?', (self.name,)
+                ).fetchone()
+                if row is not None:
+                    for field, value in zip(self._FIELDS, row):
+                        setattr(self, field, value)
+                yield
+                db.execute(
+                    'INSERT OR REPLACE INTO rate_limit_state '
+                    '(name, rate, tokens, updated, backoff_until, failures, total_rate_limited) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (self.name,) + tuple(getattr(self, field) for field in self._FIELDS)
+                )
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+
+def create_rate_limiter():
+    """按 GARMIN_RATE_LIMIT_BACKEND 创建限流器（memory / sqlite）"""
+    if config.RATE_LIMIT_BACKEND == 'sqlite':
+        logger.info(f"Using shared SQLite rate limiter at {config.RATE_LIMIT_PATH}")
+        return SQLiteRateLimiter()
+    return AdaptiveRateLimiter()
+
+
+# 所有上游Garmin请求共享的限流器（sqlite 时跨进程共享）
+rate_limiter = create_rate_limiter()
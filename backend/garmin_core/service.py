@@ -0,0 +1,692 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 同步服务
+登录、同步和用户信息的唯一实现：Flask 后端、Vercel 的 BaseHTTPRequestHandler
+和 stdin 命令行都只是把请求转交给这里，缓存、并发、限流和增量同步对所有部署方式一致
+"""
+
+import time
+import importlib
+import logging
+import threading
+import traceback
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from . import config
+from . import upstream
+from .session_pool import SessionPool
+from .token_store import create_token_store
+from .auth import login_client, resume_session
+from .sync_engine import (fetch_days, iter_fetch_days, empty_day, is_day_complete, is_day_unavailable,
+                          day_error_types, sync_dates)
+from .planner import DEFAULT_FIELDS, parse_fields
+from .streaming import encode_frame, summarize_days
+from .errors import classify_error, AUTH_EXPIRED, RATE_LIMITED, CIRCUIT_OPEN
+from .circuit_breaker import breaker
+from .singleflight import SingleFlight
+from .sync_state import SyncStateStore
+from .cache import DayMetricCache
+from .timing import startup
+from .metrics import metrics
+from .profiling import RequestTimings
+from .http_cache import content_etag, etag_matches
+from .compact import COMPACT_FIELDS, columns_for, to_columns
+from . import jsoncodec
+
+logger = logging.getLogger(__name__)
+
+
+def load_garmin_class():
+    """按需导入 garminconnect（冷启动中最重的依赖），不可用时返回None
+
+    设置了 GARMIN_CLIENT_CLASS 时改为导入指定的客户端类（例如本地的模拟 Garmin Connect）
+    """
+    try:
+        if config.CLIENT_CLASS:
+            module_name, _, class_name = config.CLIENT_CLASS.partition(':')
+            with startup.measure_import(module_name):
+                return getattr(importlib.import_module(module_name), class_name)
+        with startup.measure_import('garminconnect'):
+            from garminconnect import Garmin
+    except ImportError as e:
+        logger.error(f"garminconnect library not available: {e}")
+        return None
+    return Garmin
+
+
+def with_analysis(day_data, **options):
+    """附带日内心率分析（只有请求了该字段时才导入 NumPy）"""
+    if 'heart_rate_intraday' not in day_data:
+        return day_data
+    from .intraday import with_analysis as analyze_day
+    return analyze_day(day_data, **options)
+
+
+class ServiceError(Exception):
+    """请求无法完成：携带 HTTP 状态码和返回给客户端的错误信息"""
+
+    def __init__(self, message, status=400, error_type=None, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.error_type = error_type
+        self.extra = extra
+
+    def to_dict(self):
+        body = {'success': False, 'error': self.message}
+        if self.error_type:
+            body['error_type'] = self.error_type
+        body.update(self.extra)
+        return body
+
+
+class NotModified(Exception):
+    """条件请求（If-None-Match）命中：数据与客户端已有的版本相同"""
+
+    def __init__(self, etag):
+        super().__init__(etag)
+        self.etag = etag
+
+    def to_dict(self):
+        return {'success': True, 'not_modified': True, 'etag': self.etag}
+
+
+class SyncRequest:
+    """解析并校验后的同步参数"""
+
+    __slots__ = ('account', 'client', 'dates', 'fields', 'force_refresh', 'intraday_options', 'watermark',
+                 'timings', 'compact')
+
+    def __init__(self, account, client, dates, fields, force_refresh, intraday_options, watermark, timings=None,
+                 compact=False):
+        self.account = account
+        self.client = client
+        self.dates = dates
+        self.fields = fields
+        self.force_refresh = force_refresh
+        self.intraday_options = intraday_options
+        self.watermark = watermark
+        self.timings = timings  # profiling.RequestTimings（请求了 debug_timings 时）
+        self.compact = compact  # 紧凑的列式响应（format: "compact"）
+
+
+class GarminService:
+    """按账户管理会话，并通过共享的同步引擎完成登录、同步和用户信息请求"""
+
+    def __init__(self, garmin_cls=None, session_pool=None, token_store=None, cache=None, sync_state=None,
+                 history=None, flights=None, default_fields=None, default_days=3, max_days=7,
+                 garmin_loader=None):
+        # garminconnect.Garmin；提供 garmin_loader 时在第一次需要登录时才导入
+        self._garmin_cls = garmin_cls
+        self._garmin_loader = garmin_loader
+        self._lock = threading.Lock()
+        self.session_pool = session_pool if session_pool is not None else SessionPool()
+        self.token_store = token_store if token_store is not None else create_token_store()
+        self.cache = cache if cache is not None else DayMetricCache()
+        self.sync_state = sync_state if sync_state is not None else SyncStateStore()
+        self._history = history
+        self.flights = flights if flights is not None else SingleFlight()
+        self.default_fields = tuple(default_fields or DEFAULT_FIELDS)
+        self.default_days = default_days
+        self.max_days = max_days
+
+    @property
+    def garmin_cls(self):
+        """Garmin 客户端类，库不可用时为None"""
+        if self._garmin_loader is not None:
+            with self._lock:
+                if self._garmin_loader is not None:
+                    self._garmin_cls = self._garmin_loader()
+                    self._garmin_loader = None
+        return self._garmin_cls
+
+    @garmin_cls.setter
+    def garmin_cls(self, value):
+        self._garmin_cls = value
+        self._garmin_loader = None
+
+    @property
+    def history(self):
+        """每日指标历史（依赖 NumPy，第一次记录同步结果时才创建）；构造时传入 history=False 则不记录，返回None"""
+        if self._history is False:
+            return None
+        if self._history is None:
+            with self._lock:
+                if self._history is None:
+                    from .history import MetricHistoryStore
+                    self._history = MetricHistoryStore()
+        return self._history
+
+    # ---- 会话 ----
+
+    def _require_library(self):
+        if self.garmin_cls is None:
+            raise ServiceError('garminconnect library not available', 500)
+
+    def resolve_account(self, data):
+        """从请求中解析账户（email 或 account），未指定时返回None"""
+        account = (data or {}).get('email') or (data or {}).get('account')
+        return SessionPool.normalize(account) if account else None
+
+    def get_session_client(self, data):
+        """按请求查找已登录的Garmin客户端，返回 (account, client)
+
+        只有请求带有与保存时指纹一致的密码，或登录时签发的 session_token，才能使用会话池中的会话和
+        令牌存储中的令牌：此时返回会话池中的客户端，或从令牌按需恢复的无参函数（全部命中缓存时不请求Garmin）。
+        密码无法在本地验证（第一次使用或密码已更改）时立即向Garmin完整登录，失败时抛出 ServiceError；
+        没有凭据或会话密钥无效时 client 为None
+        """
+        data = data or {}
+        account = self.resolve_account(data)
+        if not account:
+            return None, None
+        password = data.get('password')
+        session_token = data.get('session_token')
+        if not self.token_store.verify_credentials(account, password, session_token):
+            if not password:
+                return account, None
+            self._require_library()
+            try:
+                client, _ = login_client(self.garmin_cls, account, password, self.token_store)
+            except Exception as e:
+                logger.error(f"Garmin login failed for {account}: {e}")
+                raise self._login_error(e)
+            self.session_pool.put(account, client)
+            return account, client
+
+        client = self.session_pool.get(account)
+        if client is not None:
+            return account, client
+
+        def resume():
+            self._require_library()
+            if password:
+                garmin, _ = login_client(self.garmin_cls, account, password, self.token_store)
+            else:
+                garmin = resume_session(self.garmin_cls, account, None, self.token_store,
+                                        session_token=session_token)
+                if garmin is None:
+                    raise ServiceError('Session expired. Please login again.', 401, AUTH_EXPIRED)
+            self.session_pool.put(account, garmin)
+            return garmin
+        return account, resume
+
+    def require_client(self, data):
+        """同 get_session_client，未登录或凭据无效时抛出 ServiceError(401)"""
+        account, client = self.get_session_client(data)
+        if not client:
+            self._require_library()
+            raise ServiceError('Not logged in. Please login first.', 401)
+        return account, client
+
+    def authenticate(self, data):
+        """只在本地验证请求的凭据（密码指纹或 session_token，不请求Garmin），返回账户
+
+        用于只读取本地数据的接口（指标历史、回填任务），账户未指定或凭据无效时抛出 ServiceError
+        """
+        account = self.resolve_account(data)
+        if not account:
+            raise ServiceError('Account not specified. Please provide email.', 400)
+        if not self.token_store.verify_credentials(account, (data or {}).get('password'),
+                                                   (data or {}).get('session_token')):
+            raise ServiceError('Invalid or missing credentials. Please login first.', 401, 'invalid_credentials')
+        return account
+
+    def session_client(self, account):
+        """服务内部后台任务（回填）使用的客户端：会话池中的会话，或从令牌存储恢复（提交任务时已验证过凭据）"""
+        client = self.session_pool.get(account)
+        if client is not None or self.garmin_cls is None:
+            return client
+        try:
+            client = resume_session(self.garmin_cls, account, None, self.token_store, trusted=True)
+        except Exception as e:
+            logger.warning(f"Could not resume Garmin session for {account}: {e}")
+            return None
+        if client is not None:
+            self.session_pool.put(account, client)
+        return client
+
+    def forget(self, account):
+        """会话失效：移出会话池并删除保存的令牌"""
+        self.session_pool.remove(account)
+        self.token_store.delete_tokens(account)
+
+    # ---- 登录 ----
+
+    def login(self, data):
+        """登录并把会话放入会话池（优先复用已保存的令牌）"""
+        self._require_library()
+        email = (data or {}).get('email')
+        password = (data or {}).get('password')
+        if not email or not password:
+            raise ServiceError('Email and password are required', 400)
+
+        logger.info(f"Attempting Garmin login for user: {email}")
+        try:
+            garmin_client, resumed = login_client(self.garmin_cls, email, password, self.token_store)
+        except Exception as login_error:
+            logger.error(f"Garmin login failed: {login_error}")
+            self.session_pool.remove(email)
+            raise self._login_error(login_error)
+
+        logger.info(f"Garmin login successful ({'resumed from token store' if resumed else 'full login'})")
+        self.session_pool.put(email, garmin_client)
+        result = self._login_result(email, garmin_client)
+
+        # 签发会话密钥：之后的同步等请求带上 session_token 即可复用会话，无需每次发送密码
+        try:
+            session_token = self.token_store.issue_session(email)
+        except Exception as e:
+            logger.warning(f"Could not issue session token for {email}: {e}")
+            session_token = None
+        if session_token:
+            result['session_token'] = session_token
+        return result
+
+    @staticmethod
+    def _login_result(email, garmin_client):
+        """登录成功的响应：简单验证登录状态 - 只获取基本用户信息"""
+        try:
+            user_profile = upstream.wrap(garmin_client).get_full_name()
+        except Exception as profile_error:
+            logger.warning(f"Could not retrieve user profile after login: {profile_error}")
+            # 对于其他错误，仍然认为登录成功（因为login()没有抛出异常）
+            error_msg = str(profile_error).lower()
+            if "privacy" in error_msg or "protected" in error_msg:
+                logger.info("Privacy protection detected, but login successful")
+                return {
+                    'success': True,
+                    'message': 'Successfully logged in to Garmin Connect (privacy protection active)',
+                    'user_info': {'email': email},
+                    'warning': 'Some data may be privacy protected. Please check your Garmin Connect privacy settings.'
+                }
+            return {
+                'success': True,
+                'message': 'Successfully logged in to Garmin Connect',
+                'user_info': {'email': email},
+                'warning': 'Could not verify user profile, but login appears successful.'
+            }
+
+        user_info = {'email': email}
+        if user_profile:
+            logger.info(f"Login verified - user: {user_profile}")
+            user_info['name'] = user_profile
+        else:
+            logger.warning("Could not retrieve user profile, but login appears successful")
+        return {
+            'success': True,
+            'message': 'Successfully logged in to Garmin Connect',
+            'user_info': user_info
+        }
+
+    @staticmethod
+    def _login_error(login_error):
+        """把登录异常转换为带状态码的 ServiceError"""
+        error_msg = str(login_error).lower()
+        if "privacy" in error_msg or "protected" in error_msg:
+            return ServiceError('Privacy protection is active on your Garmin account. Please check your Garmin Connect privacy settings and try again.',
+                                403, 'privacy_protected')
+        if "authentication" in error_msg or "credential" in error_msg or "password" in error_msg:
+            return ServiceError('Invalid email or password. Please check your Garmin Connect credentials.',
+                                401, 'invalid_credentials')
+        if "too many" in error_msg or "rate limit" in error_msg:
+            return ServiceError('Too many login attempts. Please wait a few minutes and try again.',
+                                429, 'rate_limited')
+        if "network" in error_msg or "connection" in error_msg:
+            return ServiceError('Network connection error. Please check your internet connection and try again.',
+                                503, 'network_error')
+        return ServiceError(f'Login failed: {str(login_error)}', 500, 'unknown_error')
+
+    # ---- 同步 ----
+
+    def prepare_sync(self, data, max_days=None):
+        """解析同步参数，参数无效或未登录时抛出 ServiceError
+
+        data['debug_timings'] 为真时附带 RequestTimings，响应中返回各阶段、每个上游请求和每天每个字段的耗时。
+        max_days 覆盖 days 和 since 允许的最多天数（批量同步使用）
+        """
+        data = data or {}
+        timings = RequestTimings() if data.get('debug_timings') else None
+        started = time.perf_counter()
+        account, client = self.require_client(data)
+        self.sync_state.touch(account)
+
+        days = data.get('days')
+        if isinstance(days, bool):
+            # int(True) == 1：布尔值不是有效的天数
+            raise ServiceError('"days" must be an integer', 400)
+        try:
+            days_count = int(days if days is not None else self.default_days)
+        except (TypeError, ValueError):
+            raise ServiceError('"days" must be an integer', 400)
+        if days_count < 1:
+            raise ServiceError('"days" must be a positive integer', 400)
+        days_count = min(days_count, max_days or self.max_days)
+        since = data.get('since')  # 可选：起始日期，或 "watermark" 表示从上次完整同步之后开始
+        force_refresh = bool(data.get('force_refresh', False))  # 跳过缓存强制重新获取
+
+        # 可选：只返回需要的字段（列表或逗号分隔字符串）
+        # 可选：日内心率 intraday: true 或 {"resolution": 秒, "max_hr": 最大心率}
+        # 可选：format: "compact" 只返回规范化指标的列式数据（dates + 每个指标一个数组）
+        intraday = data.get('intraday')
+        compact = data.get('format') == 'compact' or data.get('compact') is True
+        try:
+            if data.get('fields'):
+                fields = parse_fields(data.get('fields'))
+            else:
+                fields = COMPACT_FIELDS if compact else self.default_fields
+            if compact and not columns_for(fields):
+                raise ValueError(f"Compact format needs fields with metrics: {', '.join(COMPACT_FIELDS)}")
+            if intraday and not compact and 'heart_rate_intraday' not in fields:
+                fields += ('heart_rate_intraday',)
+            intraday = intraday if isinstance(intraday, dict) else {}
+            intraday_options = {
+                'resolution': int(intraday['resolution']) if intraday.get('resolution') else None,
+                'max_hr': int(intraday['max_hr']) if intraday.get('max_hr') else None
+            }
+        except (ValueError, TypeError) as e:
+            raise ServiceError(str(e), 400)
+
+        # 设置目标日期
+        try:
+            target_date = data.get('date')
+            date_obj = datetime.strptime(target_date, '%Y-%m-%d') if target_date else datetime.now()
+            watermark = self.sync_state.get_watermark(account)
+            since_obj = None
+            if since == 'watermark':
+                if watermark:
+                    since_obj = min(datetime.strptime(watermark, '%Y-%m-%d') + timedelta(days=1), date_obj)
+            elif since:
+                since_obj = datetime.strptime(since, '%Y-%m-%d')
+        except ValueError:
+            raise ServiceError('Invalid date format. Use YYYY-MM-DD', 400)
+
+        if since_obj is not None and since_obj > date_obj:
+            raise ServiceError('"since" must not be after "date"', 400)
+
+        dates = sync_dates(date_obj, days=days_count, since=since_obj, max_days=max_days)
+        logger.info(f"Syncing Garmin data for {len(dates)} days from {date_obj.strftime('%Y-%m-%d')} "
+                    f"(watermark: {watermark})")
+        if timings is not None:
+            timings.add_phase('prepare', time.perf_counter() - started)
+        return SyncRequest(account, client, dates, fields, force_refresh, intraday_options, watermark, timings,
+                           compact)
+
+    def finish_sync(self, account, result_data, fields=DEFAULT_FIELDS):
+        """同步结束：记录每天是否完整同步、推进水位线，返回缓存和增量同步信息
+
+        只请求了部分默认字段时不能说明当天已完整同步，此时不记录同步状态
+        """
+        if set(DEFAULT_FIELDS) <= set(fields):
+            watermark = self.sync_state.record_days(account, {d['date']: is_day_complete(d) for d in result_data})
+        else:
+            watermark = self.sync_state.get_watermark(account)
+        fetched_days = [d['date'] for d in result_data if d.get('cache', {}).get('miss')]
+        if self.history is not None and fetched_days:
+            # 全部命中缓存的日期已在获取时写入过历史，不再重写历史文件
+            self.history.record_days(account, [d for d in result_data if d['date'] in fetched_days])
+
+        cache_hits = sum(len(d.get('cache', {}).get('hit', [])) for d in result_data)
+        cache_misses = sum(len(d.get('cache', {}).get('miss', [])) for d in result_data)
+        logger.info(f"Sync completed. Retrieved data for {len(result_data)} days "
+                    f"(cache hits: {cache_hits}, misses: {cache_misses})")
+
+        return {
+            'cache': {
+                'hits': cache_hits,
+                'misses': cache_misses
+            },
+            'sync': {
+                'watermark': watermark,
+                'fetched_days': fetched_days,
+                'cached_days': [d['date'] for d in result_data if d['date'] not in fetched_days]
+            }
+        }
+
+    def etag(self, req, result_data):
+        """同步数据的 ETag（日内心率分析参数、紧凑格式不同时结果不同）"""
+        options = dict(req.intraday_options, format='compact') if req.compact else req.intraday_options
+        return content_etag(result_data, req.fields, options)
+
+    def cached_days(self, req):
+        """所有日期的所有字段都在缓存中且未过期时返回每天的数据，否则返回None（不请求上游）"""
+        days = []
+        for date_str in req.dates:
+            day_data = {'date': date_str}
+            for name in req.fields:
+                hit, value = self.cache.peek(req.account, date_str, name)
+                if not hit:
+                    return None
+                day_data[name] = value
+            days.append(day_data)
+        return days
+
+    @staticmethod
+    def _unavailable_error(result_data):
+        """所有日期都因上游不可用而没有任何数据（也没有过期缓存）时返回的错误"""
+        error_types = set().union(*(day_error_types(d) for d in result_data))
+        if CIRCUIT_OPEN in error_types:
+            return ServiceError('Garmin Connect is temporarily unavailable. Please try again later.',
+                                503, CIRCUIT_OPEN, retry_after=breaker.state()['retry_after'], partial_data=None)
+        if RATE_LIMITED in error_types:
+            return ServiceError('API rate limit exceeded. Please try again later.',
+                                429, partial_data=None)
+        return ServiceError('Network connection error. Please check your internet connection and try again.',
+                            503, 'network_error', partial_data=None)
+
+    def sync(self, data, if_none_match=None):
+        """同步并一次性返回所有日期的数据
+
+        if_none_match（或 data['if_none_match']）与数据的 ETag 相同时抛出 NotModified：
+        缓存能证明数据未变化时不请求Garmin，否则同步后再比较。
+        上游不可用（限流、连接错误、熔断打开）时获取失败的字段改用最近一次缓存的值，响应中 stale 为 true
+        """
+        req = self.prepare_sync(data)
+        dates, fields = req.dates, req.fields
+        started = time.perf_counter()
+
+        if_none_match = if_none_match or (data or {}).get('if_none_match')
+        if if_none_match and not req.force_refresh:
+            cached = self.cached_days(req)
+            etag = self.etag(req, cached) if cached is not None else None
+            if etag_matches(if_none_match, etag):
+                metrics.inc('garmin_sync_not_modified_total', {'source': 'cache'},
+                            help_text='Conditional sync requests answered with 304')
+                raise NotModified(etag)
+
+        # 获取数据 - 只获取核心健康数据
+        # 缓存中已有且未过期的指标直接返回，只请求缺失、不完整或仍可能变化的数据
+        result_data = []
+        coalesced = False
+
+        try:
+            logger.info(f"Fetching essential data for {dates[-1]} ~ {dates[0]}")
+
+            # 按字段规划最少的上游请求并发执行：一个接口提供多个字段时只请求一次，
+            # 支持范围查询的接口（步数、体重、活动）每个窗口只请求一次（请求节奏由共享限流器控制）
+            # 同一账户、日期范围、字段的同步正在进行时直接共享其结果（debug_timings 请求单独执行，耗时才准确）
+            if req.timings is not None:
+                with req.timings.phase('fetch'):
+                    days_data = fetch_days(req.client, dates, fields=fields, account=req.account, cache=self.cache,
+                                           force_refresh=req.force_refresh, timings=req.timings, serve_stale=True)
+            else:
+                flight_key = (req.account, tuple(dates), fields, req.force_refresh)
+                days_data, coalesced = self.flights.do(flight_key, lambda: fetch_days(
+                    req.client, dates, fields=fields, account=req.account, cache=self.cache,
+                    force_refresh=req.force_refresh, serve_stale=True))
+            result_data = [days_data[date_str] for date_str in dates]
+            if result_data and all(is_day_unavailable(d) for d in result_data):
+                raise self._unavailable_error(result_data)
+            logger.info(f"Successfully processed essential data for {len(result_data)} days")
+
+        except ServiceError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching data for {dates[-1]} ~ {dates[0]}: {e}")
+
+            # 检查是否是隐私保护或认证错误
+            error_msg = str(e).lower()
+            if "privacy" in error_msg or "protected" in error_msg:
+                logger.error("Privacy protection error - stopping sync")
+                raise ServiceError('Privacy protection activated. Please check your Garmin Connect privacy settings or try again later.',
+                                   403, partial_data=None)
+            elif "authentication" in error_msg or "login" in error_msg:
+                logger.error("Authentication error - need re-login")
+                self.forget(req.account)
+                raise ServiceError('Authentication expired. Please re-login to Garmin Connect.',
+                                   401, partial_data=None)
+            elif "too many" in error_msg or "rate limit" in error_msg:
+                logger.error("Rate limit error - stopping sync")
+                raise ServiceError('API rate limit exceeded. Please try again later.',
+                                   429, partial_data=None)
+
+            # 对于其他错误，记录到每一天
+            for date_str in dates:
+                day_data = empty_day(date_str, fields)
+                day_data['error'] = str(e)
+                result_data.append(day_data)
+
+        timings = req.timings
+        with timings.phase('analysis') if timings else nullcontext():
+            if req.compact:
+                payload = {'format': 'compact', **to_columns(result_data, fields)}
+            else:
+                payload = {'data': [with_analysis(day_data, **req.intraday_options) for day_data in result_data]}
+        with timings.phase('finish') if timings else nullcontext():
+            sync_info = self.finish_sync(req.account, result_data, fields)
+        metrics.observe('garmin_sync_duration_seconds', time.perf_counter() - started,
+                        {'coalesced': str(coalesced).lower()}, 'End-to-end sync duration')
+        etag = self.etag(req, result_data)
+        if etag_matches(if_none_match, etag):
+            metrics.inc('garmin_sync_not_modified_total', {'source': 'upstream'},
+                        help_text='Conditional sync requests answered with 304')
+            raise NotModified(etag)
+        response = {
+            'success': True,
+            **payload,
+            **sync_info,
+            'coalesced': coalesced,
+            'stale': any(d.get('stale') for d in result_data),
+            'etag': etag,
+            'message': f'Successfully synced {len(result_data)} days of essential health data'
+        }
+        if timings is not None:
+            # 序列化耗时按当前的 JSON 编码器编码一次估算
+            with timings.phase('serialize'):
+                payload_bytes = len(jsoncodec.dumps_bytes(response))
+            response['debug_timings'] = {**timings.to_dict(), 'payload_bytes': payload_bytes}
+        return response
+
+    def iter_sync(self, req):
+        """逐天产出 ('day', day_data)，最后产出 ('summary', 汇总)；同步中的错误写入汇总而不抛出"""
+        result_data = []
+        try:
+            for day_data in iter_fetch_days(req.client, req.dates, fields=req.fields, account=req.account,
+                                            cache=self.cache, force_refresh=req.force_refresh,
+                                            timings=req.timings, serve_stale=True):
+                result_data.append(day_data)
+                yield 'day', with_analysis(day_data, **req.intraday_options)
+            summary = {'success': True, **self.finish_sync(req.account, result_data, req.fields)}
+        except Exception as e:
+            logger.error(f"Garmin streaming sync error: {e}")
+            logger.error(traceback.format_exc())
+            summary = {
+                'success': False,
+                'error': f'Sync error: {str(e)}',
+                'error_type': classify_error(e)
+            }
+        summary.update(summarize_days(result_data, is_day_complete))
+        if req.timings is not None:
+            summary['debug_timings'] = req.timings.to_dict()
+        yield 'summary', summary
+
+    def stream_sync(self, data, fmt):
+        """校验参数（失败时立即抛出 ServiceError）后返回逐帧编码的生成器"""
+        req = self.prepare_sync(data)
+        return (encode_frame(fmt, frame_type, payload) for frame_type, payload in self.iter_sync(req))
+
+    # ---- 用户信息 ----
+
+    def user_info(self, data):
+        """获取Garmin用户信息"""
+        account, garmin_client = self.require_client(data)
+        self.sync_state.touch(account)
+        try:
+            logger.info(f"Fetching Garmin user info for {account}")
+            if callable(garmin_client):
+                garmin_client = garmin_client()
+            user_profile = garmin_client.get_full_name()
+            user_settings = self._user_settings(garmin_client)
+        except ServiceError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching user info: {e}")
+            logger.error(traceback.format_exc())
+            raise ServiceError(f'Error fetching user info: {str(e)}', 500)
+
+        return {
+            'success': True,
+            'data': {
+                'profile': user_profile,
+                'settings': user_settings
+            }
+        }
+
+    @staticmethod
+    def _user_settings(garmin_client):
+        """单位制和显示名称（garminconnect 0.2.8 的 Garmin.login 会读取用户设置，从令牌恢复的会话需要单独读取）"""
+        unit_system = getattr(garmin_client, 'unit_system', None)
+        if unit_system is None:
+            def get_user_settings():
+                return garmin_client.garth.connectapi('/userprofile-service/userprofile/user-settings')
+            settings = upstream.call(get_user_settings) or {}
+            unit_system = garmin_client.unit_system = settings.get('userData', {}).get('measurementSystem')
+        return {
+            'unit_system': unit_system,
+            'display_name': getattr(garmin_client, 'display_name', None)
+        }
+
+    # ---- 按 action 分发（BaseHTTPRequestHandler / stdin） ----
+
+    @staticmethod
+    def _with_call_timings(handle, data):
+        """执行 login / user_info 并附带总耗时、上游请求次数和限流等待（sync 自带完整的耗时树）"""
+        started = time.perf_counter()
+        with upstream.tracking() as stats:
+            result = handle(data)
+        result['debug_timings'] = {
+            'total_ms': round((time.perf_counter() - started) * 1000, 2),
+            'upstream_calls': stats['calls'],
+            'upstream_ms': round(stats['upstream'] * 1000, 2),
+            'rate_limit_wait_ms': round(stats['wait'] * 1000, 2)
+        }
+        return result
+
+    def dispatch(self, data):
+        """按 data['action'] 执行 login / sync / user_info / timing，返回 (HTTP状态码, 响应字典)"""
+        actions = {
+            'login': self.login,
+            'sync': self.sync,
+            'user_info': self.user_info,
+            'timing': lambda data: {'success': True, 'data': startup.report()},
+        }
+        action = (data or {}).get('action')
+        handle = actions.get(action)
+        if handle is None:
+            return 400, {'success': False, 'error': f'Unknown action: {action}'}
+        started = time.perf_counter()
+        try:
+            if action in ('login', 'user_info') and data.get('debug_timings'):
+                return 200, self._with_call_timings(handle, data)
+            return 200, handle(data)
+        except NotModified as e:
+            return 304, e.to_dict()
+        except ServiceError as e:
+            return e.status, e.to_dict()
+        except Exception as e:
+            logger.error(f"Garmin {action} error: {e}")
+            logger.error(traceback.format_exc())
+            return 500, {'success': False, 'error': f'{action} error: {str(e)}'}
+        finally:
+            startup.record_request(action, time.perf_counter() - started)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 会话令牌存储
+登录成功后保存 OAuth 令牌，之后的请求直接复用，避免每次都完整登录
+默认保存在本地文件目录，也可以使用兼容 Vercel KV / Upstash 的 REST 存储
+复用令牌的请求必须持有与保存时指纹一致的密码，或登录时签发的会话密钥（只保存摘要）
+"""
+
+import os
+import json
+import time
+import hashlib
+import hmac
+import secrets
+import logging
+import threading
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'garmin:tokens:'
+
+
+def account_key(account):
+    """账户对应的存储键"""
+    return KEY_PREFIX + (account or '').strip().lower()
+
+
+def password_fingerprint(account, password):
+    """密码指纹，用于确认复用令牌的请求持有相同的凭据"""
+    salt = (account or '').strip().lower().encode('utf-8')
+    return hashlib.pbkdf2_hmac('sha256', (password or '').encode('utf-8'), salt, 100000).hex()
+
+
+def session_digest(session_token):
+    """会话密钥的摘要（密钥本身是随机的高熵字符串，不需要慢哈希）"""
+    return hashlib.sha256((session_token or '').encode('utf-8')).hexdigest()
+
+
+class TokenStore:
+    """KV风格的存储接口：get / set / delete"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ex=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def keys(self):
+        """列出所有键（用于枚举已知账户），不支持时返回空列表"""
+        return []
+
+    def load_record(self, account):
+        """读取账户的令牌记录，不存在、损坏或已过期时返回None"""
+        raw = self.get(account_key(account))
+        if not raw:
+            return None
+        try:
+            record = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning(f"Corrupted token record for {account}, discarding")
+            self.delete_tokens(account)
+            return None
+
+        expires_at = record.get('expires_at')
+        if expires_at and expires_at < time.time():
+            logger.info(f"Stored tokens for {account} expired")
+            self.delete_tokens(account)
+            return None
+        return record
+
+    @staticmethod
+    def _matches(record, account, password=None, session_token=None):
+        if password and record.get('fingerprint') and hmac.compare_digest(
+                record['fingerprint'], password_fingerprint(account, password)):
+            return True
+        if session_token:
+            digest = session_digest(session_token)
+            return any(hmac.compare_digest(d, digest) for d in record.get('sessions', []))
+        return False
+
+    def verify_credentials(self, account, password=None, session_token=None):
+        """密码与保存时的指纹一致，或会话密钥是登录时签发的"""
+        record = self.load_record(account)
+        return record is not None and self._matches(record, account, password, session_token)
+
+    def load_tokens(self, account, password=None, session_token=None, trusted=False):
+        """读取账户令牌：必须给出与保存时指纹一致的密码或有效的会话密钥
+
+        trusted 只用于服务内部的后台任务（回填），它们的账户已在提交时验证过凭据
+        """
+        record = self.load_record(account)
+        if record is None:
+            return None
+        if not trusted and not self._matches(record, account, password, session_token):
+            logger.info(f"Stored tokens for {account} not released: credentials do not match")
+            return None
+        return record.get('tokens')
+
+    def save_tokens(self, account, tokens, password=None, ttl=None):
+        """保存账户令牌（密码未变时保留已签发的会话密钥）"""
+        ttl = ttl if ttl is not None else config.TOKEN_TTL
+        fingerprint = password_fingerprint(account, password) if password else ''
+        previous = self.load_record(account)
+        sessions = []
+        if previous is not None and fingerprint and hmac.compare_digest(previous.get('fingerprint', ''), fingerprint):
+            sessions = previous.get('sessions', [])
+        record = {
+            'account': (account or '').strip().lower(),
+            'tokens': tokens,
+            'fingerprint': fingerprint,
+            'sessions': sessions,
+            'saved_at': time.time(),
+            'expires_at': time.time() + ttl if ttl else None
+        }
+        self.set(account_key(account), json.dumps(record), ex=ttl or None)
+
+    def issue_session(self, account):
+        """为已保存令牌的账户签发新的会话密钥（只保存摘要，最多保留最近的 SESSION_TOKENS_PER_ACCOUNT 个），
+        没有令牌记录时返回None"""
+        record = self.load_record(account)
+        if record is None:
+            return None
+        session_token = secrets.token_urlsafe(32)
+        keep = max(1, config.SESSION_TOKENS_PER_ACCOUNT)
+        record['sessions'] = [session_digest(session_token)] + record.get('sessions', [])[:keep - 1]
+        expires_at = record.get('expires_at')
+        ttl = expires_at - time.time() if expires_at else None
+        self.set(account_key(account), json.dumps(record), ex=max(1, int(ttl)) if ttl else None)
+        return session_token
+
+    def delete_tokens(self, account):
+        self.delete(account_key(account))
+
+    def accounts(self):
+        """已保存令牌的账户列表"""
+        return [key[len(KEY_PREFIX):] for key in self.keys() if key.startswith(KEY_PREFIX)]
+
+
+class FileTokenStore(TokenStore):
+    """本地文件目录存储，每个键一个文件"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or config.TOKEN_DIR
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read token file for {key}: {e}")
+            return None
+        if entry.get('ex_at') and entry['ex_at'] < time.time():
+            self.delete(key)
+            return None
+        return entry.get('value')
+
+    def set(self, key, value, ex=None):
+        path = self._path(key)
+        entry = {'key': key, 'value': value, 'ex_at': time.time() + ex if ex else None}
+        with self._lock:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    result.append(json.load(f)['key'])
+            except (OSError, ValueError, KeyError):
+                continue
+        return result
+
+
+class KVTokenStore(TokenStore):
+    """Vercel KV / Upstash Redis REST 存储"""
+
+    def __init__(self, url=None, token=None, timeout=5):
+        self.url = (url or os.environ.get('KV_REST_API_URL', '')).rstrip('/')
+        self.token = token or os.environ.get('KV_REST_API_TOKEN', '')
+        self.timeout = timeout
+
+    def _command(self, *args):
+        import requests
+
+        response = requests.post(
+            self.url,
+            headers={'Authorization': f'Bearer {self.token}'},
+            json=[str(a) for a in args],
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json().get('result')
+
+    def get(self, key):
+        return self._command('GET', key)
+
+    def set(self, key, value, ex=None):
+        if ex:
+            self._command('SET', key, value, 'EX', int(ex))
+        else:
+            self._command('SET', key, value)
+
+    def delete(self, key):
+        self._command('DEL', key)
+
+    def keys(self):
+        return self._command('KEYS', KEY_PREFIX + '*') or []
+
+
+def create_token_store():
+    """根据环境变量创建令牌存储"""
+    if config.TOKEN_STORE == 'kv':
+        if os.environ.get('KV_REST_API_URL') and os.environ.get('KV_REST_API_TOKEN'):
+            return KVTokenStore()
+        logger.warning("GARMIN_TOKEN_STORE=kv but KV_REST_API_URL/KV_REST_API_TOKEN not set, using file store")
+    return FileTokenStore()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+训练类型识别（有氧 / 无氧 / 混合）
+根据活动的心率区间时间、Garmin 训练效果和活动类型综合打分（不使用平均心率：没有用户自己的最大心率时无法可靠地估计强度）。
+活动记录后不再变化，结果按 activityId 永久缓存（内存中只保留最近使用的条目），之后的同步不会重复计算
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+AEROBIC = 'aerobic'
+ANAEROBIC = 'anaerobic'
+MIXED = 'mixed'
+
+# 算法版本：修改打分规则后递增，旧的缓存结果自动失效
+CLASSIFIER_VERSION = 2
+
+# 无氧分数阈值（0~1）：低于 AEROBIC_MAX 为有氧，高于 ANAEROBIC_MIN 为无氧，之间为混合
+AEROBIC_MAX = 0.35
+ANAEROBIC_MIN = 0.6
+
+# 活动类型的先验无氧分数
+TYPE_PRIORS = {
+    'strength_training': 0.8,
+    'hiit': 0.8,
+    'indoor_climbing': 0.7,
+    'bouldering': 0.75,
+    'track_running': 0.55,
+    'running': 0.3,
+    'treadmill_running': 0.3,
+    'trail_running': 0.3,
+    'cycling': 0.25,
+    'indoor_cycling': 0.3,
+    'lap_swimming': 0.3,
+    'open_water_swimming': 0.25,
+    'hiking': 0.1,
+    'walking': 0.05,
+    'yoga': 0.05,
+}
+
+# 各项依据的权重
+WEIGHTS = OrderedDict([
+    ('training_effect', 3.0),
+    ('hr_zones', 2.0),
+    ('activity_type', 1.0),
+])
+
+
+def zone_score(activity):
+    """心率区间时间：区间 5 记满分、区间 4 记一半，按总时间归一化"""
+    zones = [activity.get(f'hrTimeInZone_{i}') or 0 for i in range(1, 6)]
+    total = sum(zones)
+    if total <= 0:
+        return None
+    return (0.5 * zones[3] + zones[4]) / total
+
+
+def training_effect_score(activity):
+    """Garmin 训练效果：无氧效果占两者之和的比例"""
+    aerobic = activity.get('aerobicTrainingEffect')
+    anaerobic = activity.get('anaerobicTrainingEffect')
+    if aerobic is None or anaerobic is None or aerobic + anaerobic <= 0:
+        return None
+    return anaerobic / (aerobic + anaerobic)
+
+
+def classify_activity(activity):
+    """给单个活动打分并分类，返回可 JSON 序列化的结果"""
+    type_key = (activity.get('activityType') or {}).get('typeKey', 'unknown')
+    signals = OrderedDict([
+        ('training_effect', training_effect_score(activity)),
+        ('hr_zones', zone_score(activity)),
+        ('activity_type', TYPE_PRIORS.get(type_key)),
+    ])
+    used = {name: value for name, value in signals.items() if value is not None}
+    if used:
+        score = sum(WEIGHTS[name] * value for name, value in used.items()) / sum(WEIGHTS[name] for name in used)
+        label = AEROBIC if score < AEROBIC_MAX else ANAEROBIC if score > ANAEROBIC_MIN else MIXED
+    else:
+        score, label = None, None
+    return {
+        'activity_id': activity.get('activityId'),
+        'activity_type': type_key,
+        'duration': activity.get('duration'),
+        'classification': label,
+        'score': round(score, 3) if score is not None else None,
+        'basis': sorted(used)
+    }
+
+
+class ActivityClassifier:
+    """按 activityId 缓存分类结果（内存LRU + 与缓存共用的SQLite文件）"""
+
+    def __init__(self, path=None, memory_size=None):
+        self.path = path or config.CACHE_PATH
+        self.memory_size = memory_size if memory_size is not None else config.TRAINING_MEMORY_SIZE
+        self._lock = threading.RLock()
+        self._conn = None
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS activity_classifications (
+                    activity_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (activity_id, version)
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key, result):
+        """写入内存LRU，超出容量时淘汰最久未使用的条目"""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def classify(self, activity):
+        """返回活动的分类结果，已缓存时直接返回；没有 activityId 的活动不缓存"""
+        activity_id = activity.get('activityId')
+        if activity_id is None:
+            return classify_activity(activity)
+        key = str(activity_id)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is None:
+                try:
+                    row = self._db().execute(
+                        'SELECT result FROM activity_classifications WHERE activity_id = ? AND version = ?',
+                        (key, CLASSIFIER_VERSION)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not read classification for activity {key}: {e}")
+                    row = None
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+            else:
+                self._memory.move_to_end(key)
+            if result is not None:
+                self.hits += 1
+                return result
+
+        result = classify_activity(activity)
+        with self._lock:
+            self.misses += 1
+            self._remember(key, result)
+            try:
+                self._db().execute(
+                    'INSERT OR REPLACE INTO activity_classifications VALUES (?, ?, ?, ?)',
+                    (key, CLASSIFIER_VERSION, json.dumps(result), time.time())
+                )
+                self._db().commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not save classification for activity {key}: {e}")
+        return result
+
+    def summarize(self, activities):
+        """一天所有活动的分类结果，以及按时长计的主要训练类型"""
+        results = [self.classify(activity) for activity in activities or []]
+        seconds = {AEROBIC: 0.0, ANAEROBIC: 0.0, MIXED: 0.0}
+        for result in results:
+            if result['classification']:
+                seconds[result['classification']] += result['duration'] or 0
+        dominant = max(seconds, key=seconds.get) if any(seconds.values()) else None
+        return {
+            'activities': results,
+            'seconds': {label: round(value) for label, value in seconds.items()},
+            'dominant': dominant
+        }
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'memory_entries': len(self._memory)
+            }
+
+
+# 进程内共享的分类器（planner 的 training 字段使用）
+classifier = ActivityClassifier()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 上游请求入口
+所有对 Garmin Connect 的调用都经过这里：熔断器 + 全局并发上限 + 共享限流器，
+并记录每个方法的耗时和结果（见 metrics）
+"""
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+from . import config
+from .errors import is_rate_limit_error, is_upstream_unavailable, classify_error, PRIVACY_PROTECTED
+from .rate_limiter import rate_limiter, RateLimitExceeded
+from .circuit_breaker import breaker, CircuitOpenError
+from .metrics import metrics, record_upstream_call, record_rate_limit_wait, OUTCOME_SUCCESS
+
+logger = logging.getLogger(__name__)
+
+# 全局并发上限：所有同步请求共享
+_upstream_slots = threading.BoundedSemaphore(config.MAX_CONCURRENCY)
+
+# 当前线程的请求计时（debug_timings 使用）
+_local = threading.local()
+
+
+@contextmanager
+def tracking():
+    """统计当前线程内上游请求的次数、请求耗时和限流等待时间（秒）"""
+    stats = {'calls': 0, 'upstream': 0.0, 'wait': 0.0}
+    previous = getattr(_local, 'stats', None)
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+def call(fn, *args, **kwargs):
+    """通过熔断器和限流器调用上游函数，被限流时退避后重试；熔断打开时立即抛出 CircuitOpenError"""
+    method = getattr(fn, '__name__', None) or 'other'
+    retries = config.RATE_LIMIT_RETRIES
+    while True:
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            metrics.inc('garmin_circuit_rejections_total', {'method': method},
+                        help_text='Upstream requests rejected while the circuit breaker was open')
+            raise
+        waiting = time.perf_counter()
+        try:
+            rate_limiter.acquire()
+        except RateLimitExceeded:
+            breaker.release()
+            metrics.inc('garmin_rate_limit_rejections_total',
+                        help_text='Upstream requests rejected locally because the rate limit budget was exhausted')
+            raise
+        waited = time.perf_counter() - waiting
+        record_rate_limit_wait(waited)
+        stats = getattr(_local, 'stats', None)
+        if stats is not None:
+            stats['wait'] += waited
+        try:
+            with _upstream_slots:
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    if stats is not None:
+                        stats['calls'] += 1
+                        stats['upstream'] += elapsed
+        except Exception as e:
+            record_upstream_call(method, elapsed, classify_error(e))
+            if is_upstream_unavailable(e):
+                breaker.on_failure()
+            else:
+                breaker.on_success()
+            if not is_rate_limit_error(e):
+                raise
+            rate_limiter.on_rate_limited()
+            if retries <= 0:
+                raise
+            retries -= 1
+            logger.info(f"Retrying {getattr(fn, '__name__', 'upstream call')} after rate limit")
+            continue
+        privacy = isinstance(result, dict) and result.get('privacyProtected')
+        record_upstream_call(method, elapsed, PRIVACY_PROTECTED if privacy else OUTCOME_SUCCESS)
+        breaker.on_success()
+        rate_limiter.on_success()
+        return result
+
+
+class UpstreamClient:
+    """Garmin 客户端代理：方法调用都经过 call()，其他属性直接透传"""
+
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or not name.startswith('get_'):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            return call(attr, *args, **kwargs)
+
+        wrapper.__name__ = name
+        return wrapper
+
+
+def wrap(client):
+    """包装客户端（已包装时直接返回）"""
+    if client is None or isinstance(client, UpstreamClient):
+        return client
+    return UpstreamClient(client)
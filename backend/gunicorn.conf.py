@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+生产环境的 gunicorn 配置：gunicorn -c gunicorn.conf.py app:app
+
+多个 worker 进程共用 $GARMIN_DATA_DIR：令牌（文件存储）、缓存、同步状态、回填任务和指标历史都在磁盘上共享，
+会话按账户在各 worker 中从令牌存储恢复；多于一个 worker 时限流器改为 SQLite 共享同一份速率预算，
+回填等后台线程只在 leader 进程中运行。
+同步请求合并（SingleFlight）和上游熔断器按进程维护，不在 worker 之间共享
+"""
+
+import os
+import multiprocessing
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# 每个 worker 是独立进程（用满多个CPU核心），进程内用线程处理并发的同步和流式请求（主要在等待上游）
+workers = _env_int('GARMIN_WORKERS', _env_int('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_class = 'gthread'
+threads = _env_int('GARMIN_WORKER_THREADS', 8)
+
+# 同步可能因为上游限流退避而较慢，流式输出时连接保持更久
+timeout = _env_int('GARMIN_WORKER_TIMEOUT', 120)
+graceful_timeout = 30
+keepalive = 5
+
+# 不预加载应用：每个 worker 在 fork 之后各自创建 SQLite 连接和后台线程
+preload_app = False
+
+# 定期重启 worker 以释放内存（加抖动避免同时重启）
+max_requests = _env_int('GARMIN_WORKER_MAX_REQUESTS', 1000)
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GARMIN_LOG_LEVEL', 'info')
+
+# 多个 worker 必须共享限流预算（必须在 worker 导入 garmin_core 之前设置）
+if workers > 1:
+    os.environ.setdefault('GARMIN_RATE_LIMIT_BACKEND', 'sqlite')
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置：数据目录指向临时目录（在导入 garmin_core 之前设置），关闭后台预取；
+服务相关的测试请求本地模拟的 Garmin Connect（bench/fake_garmin.py）
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault('GARMIN_DATA_DIR', tempfile.mkdtemp(prefix='zhiji-garmin-test-'))
+os.environ.setdefault('GARMIN_PREFETCH_INTERVAL', '0')
+os.environ.setdefault('GARMIN_RATE_LIMIT_RPS', '1000')  # 模拟服务没有真实的限流，不让共享限流器拖慢测试
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EMAIL = 'user@example.com'
+PASSWORD = 'secret'
+
+
+@pytest.fixture(scope='session')
+def server():
+    from bench.fake_garmin import FakeGarminServer
+
+    server = FakeGarminServer(latency=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(server, tmp_path, monkeypatch):
+    """请求模拟服务的 GarminService，所有状态保存在临时目录（不记录指标历史）"""
+    from bench.fake_client import FakeGarmin
+    from garmin_core import upstream
+    from garmin_core.cache import DayMetricCache
+    from garmin_core.service import GarminService
+    from garmin_core.session_pool import SessionPool
+    from garmin_core.sync_state import SyncStateStore
+    from garmin_core.token_store import FileTokenStore
+
+    monkeypatch.setenv('GARMIN_FAKE_URL', server.url)
+    server.reset()
+    upstream.breaker.reset()
+    return GarminService(garmin_cls=FakeGarmin, session_pool=SessionPool(max_size=10, idle_ttl=3600),
+                         token_store=FileTokenStore(str(tmp_path / 'tokens')),
+                         cache=DayMetricCache(str(tmp_path / 'cache.sqlite3'), memory_size=100),
+                         sync_state=SyncStateStore(str(tmp_path / 'sync_state.sqlite3')), history=False)
+
+
+@pytest.fixture
+def session_token(service):
+    """登录测试账户，返回签发的会话密钥"""
+    result = service.login({'email': EMAIL, 'password': PASSWORD})
+    assert result['success'] and result['session_token']
+    return result['session_token']
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from garmin_core import cache as cache_module, config
+from garmin_core.cache import DayMetricCache, ttl_for, is_immutable
+
+TODAY = date(2026, 7, 10)
+
+
+def test_ttl_by_date_age():
+    assert ttl_for('2026-07-10', TODAY) == config.CACHE_TTL_TODAY
+    assert ttl_for('2026-07-11', TODAY) == config.CACHE_TTL_TODAY
+    assert ttl_for('2026-07-09', TODAY) == config.CACHE_TTL_RECENT
+    assert ttl_for(f'2026-07-{10 - config.CACHE_IMMUTABLE_DAYS:02d}', TODAY) == config.CACHE_TTL_RECENT
+    assert ttl_for(f'2026-07-{9 - config.CACHE_IMMUTABLE_DAYS:02d}', TODAY) is None
+    assert ttl_for('not-a-date', TODAY) == config.CACHE_TTL_TODAY
+
+
+def test_old_days_are_immutable():
+    assert is_immutable('2025-01-01', TODAY)
+    assert not is_immutable('2026-07-10', TODAY)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_and_stay_available_as_stale(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'time', clock)
+    cache = DayMetricCache(str(tmp_path / 'cache.sqlite3'), memory_size=10)
+    cache.set('A@example.com', '2026-07-10', 'steps', {'total_steps': 1}, ttl=60)
+    assert cache.get('a@example.com', '2026-07-10', 'steps') == (True, {'total_steps': 1})
+    clock.now += 61
+    assert cache.get('a@example.com', '2026-07-10', 'steps') == (False, None)
+    hit, value, fetched_at = cache.get_stale('a@example.com', '2026-07-10', 'steps')
+    assert (hit, value, fetched_at) == (True, {'total_steps': 1}, clock.now - 61)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_permanent_entries_survive_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite3')
+    DayMetricCache(path, memory_size=10).set('a', '2020-01-01', 'steps', {'total_steps': 5})
+    # 写入后再拨快时钟（time.time 也影响 date.today，写入时必须是真实日期）
+    clock = Clock()
+    clock.now = cache_module.time.time() + 10 * 365 * 24 * 3600
+    monkeypatch.setattr(cache_module.time, 'time', clock)
+    assert DayMetricCache(path, memory_size=10).get('a', '2020-01-01', 'steps') == (True, {'total_steps': 5})
+
+
+def test_memory_is_bounded_and_backed_by_sqlite(tmp_path):
+    cache = DayMetricCache(str(tmp_path / 'cache.sqlite3'), memory_size=2)
+    for day in ('2020-01-01', '2020-01-02', '2020-01-03'):
+        cache.set('a', day, 'steps', day)
+    assert cache.stats()['memory_entries'] == 2
+    assert cache.get('a', '2020-01-01', 'steps') == (True, '2020-01-01')
+
+
+def test_sync_does_not_refetch_cached_days(service, server, session_token):
+    data = {'email': 'user@example.com', 'session_token': session_token, 'date': '2020-06-30', 'days': 2,
+            'fields': ['steps']}
+    service.sync(data)
+    server.reset()
+    result = service.sync(data)
+    assert server.stats()['total'] == 0
+    assert all(d['cache']['hit'] == ['steps'] for d in result['data'])
+
+
+def test_force_refresh_refetches_and_overwrites(service, server, session_token):
+    data = {'email': 'user@example.com', 'session_token': session_token, 'date': '2020-06-30', 'days': 1,
+            'fields': ['steps']}
+    service.sync(data)
+    server.reset()
+    result = service.sync({**data, 'force_refresh': True})
+    assert server.stats()['total'] == 1
+    assert result['data'][0]['cache']['miss'] == ['steps']
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from garmin_core.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(CircuitBreaker, '_now', staticmethod(clock))
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30, half_open_probes=1)
+    breaker.clock = clock
+    return breaker
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.on_failure()
+
+
+def test_opens_after_consecutive_failures(breaker):
+    fail(breaker, 2)
+    breaker.before_call()
+    breaker.on_success()
+    fail(breaker, 2)
+    assert breaker.state()['state'] == CLOSED
+    fail(breaker, 1)
+    assert breaker.state()['state'] == OPEN
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError) as e:
+        breaker.before_call()
+    assert e.value.retry_after == 30
+    assert breaker.state()['total_rejected'] == 1
+
+
+def test_half_open_probe_success_closes(breaker):
+    fail(breaker, 3)
+    breaker.clock.now += 31
+    assert not breaker.is_open
+    breaker.before_call()
+    assert breaker.state()['state'] == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.on_success()
+    assert breaker.state()['state'] == CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_half_open_probe_failure_reopens(breaker):
+    fail(breaker, 3)
+    breaker.clock.now += 31
+    breaker.before_call()
+    breaker.on_failure()
+    state = breaker.state()
+    assert state['state'] == OPEN
+    assert state['retry_after'] == 30
+    assert state['total_opened'] == 2
+
+
+def test_released_probe_frees_its_slot(breaker):
+    fail(breaker, 3)
+    breaker.clock.now += 31
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state()['state'] == HALF_OPEN
+
+
+def test_reset(breaker):
+    fail(breaker, 3)
+    breaker.reset()
+    assert breaker.state()['state'] == CLOSED
+    breaker.before_call()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+import pytest
+
+from garmin_core.history import MetricHistoryStore, aggregate, rolling_mean, rollup, to_date_str, to_day
+
+NAN = np.nan
+
+
+def test_day_conversion_round_trip():
+    assert to_day('1970-01-02') == 1
+    assert to_date_str([to_day('2026-07-10')]) == ['2026-07-10']
+
+
+def test_aggregate_ignores_missing_values():
+    values = np.array([1.0, NAN, 3.0])
+    assert aggregate(values, 'mean') == 2.0
+    assert aggregate(values, 'sum') == 4.0
+    assert aggregate(values, 'min') == 1.0
+    assert aggregate(values, 'max') == 3.0
+    assert aggregate(values, 'count') == 2.0
+    assert math.isnan(aggregate(np.array([NAN]), 'mean'))
+    assert aggregate(np.array([NAN]), 'count') == 0.0
+
+
+def test_rolling_mean():
+    result = rolling_mean(np.array([1.0, 2.0, NAN, 4.0, NAN, NAN]), 2)
+    assert result[:4].tolist() == [1.0, 1.5, 2.0, 4.0]
+    assert result[4] == 4.0
+    assert math.isnan(result[5])
+
+
+def test_rollup_by_week_and_month():
+    # 2026-06-28 是周日，2026-06-29 是周一
+    days = np.array([to_day(d) for d in ('2026-06-28', '2026-06-29', '2026-06-30', '2026-07-01')])
+    values = np.array([1.0, 2.0, NAN, 6.0])
+    keys, sums = rollup(days, values, 'week', 'sum')
+    assert to_date_str(keys) == ['2026-06-22', '2026-06-29']
+    assert sums.tolist() == [1.0, 8.0]
+    keys, means = rollup(days, values, 'month', 'mean')
+    assert to_date_str(keys) == ['2026-06-01', '2026-07-01']
+    assert means.tolist() == [1.5, 6.0]
+    keys, counts = rollup(days, np.array([NAN, NAN, NAN, 1.0]), 'month', 'max')
+    assert math.isnan(counts[0]) and counts[1] == 1.0
+
+
+def day(date_str, steps=None, resting_hr=None):
+    data = {'date': date_str}
+    if steps is not None:
+        data['steps'] = {'total_steps': steps}
+    if resting_hr is not None:
+        data['heart_rate'] = {'resting_hr': resting_hr}
+    return data
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricHistoryStore(str(tmp_path / 'history'))
+    store.record_days('a@example.com', [day('2026-07-01', 1000, 60), day('2026-07-02', 3000),
+                                         day('2026-07-04', 5000, 58)])
+    return store
+
+
+def test_query_range(store):
+    result = store.query('a@example.com', '2026-07-01', '2026-07-04', metrics=['total_steps', 'resting_hr'])
+    assert result['dates'] == ['2026-07-01', '2026-07-02', '2026-07-04']
+    assert result['metrics']['resting_hr'] == [60.0, None, 58.0]
+    assert result['aggregates']['total_steps'] == {'mean': 3000.0, 'sum': 9000.0, 'min': 1000.0, 'max': 5000.0,
+                                                   'count': 3.0}
+    assert result['history_days'] == 3
+
+
+def test_query_rolling_uses_calendar_days(store):
+    result = store.query('a@example.com', '2026-07-02', '2026-07-04', metrics=['total_steps'], op='rolling',
+                         window=2)
+    assert result['dates'] == ['2026-07-02', '2026-07-03', '2026-07-04']
+    assert result['metrics']['total_steps'] == [2000.0, 3000.0, 5000.0]
+
+
+def test_record_days_merges_and_persists(store, tmp_path):
+    store.record_days('a@example.com', [day('2026-07-02', resting_hr=61), day('2026-07-03', 4000)])
+    reloaded = MetricHistoryStore(str(tmp_path / 'history'))
+    result = reloaded.query('a@example.com', '2026-07-01', '2026-07-04', metrics=['total_steps', 'resting_hr'],
+                            op='rollup', period='week', how='sum')
+    assert result['periods'] == ['2026-06-29']
+    assert result['metrics'] == {'total_steps': [13000.0], 'resting_hr': [179.0]}
+    assert reloaded.query('b@example.com', '2026-07-01', '2026-07-04')['dates'] == []
+
+
+class RecordingHistory:
+    def __init__(self):
+        self.calls = []
+
+    def record_days(self, account, days):
+        self.calls.append([d['date'] for d in days])
+        return len(days)
+
+
+class Follower:
+    """不会成为 leader：任务只由测试直接执行"""
+    is_leader = False
+
+    def run_as_leader(self, fn):
+        pass
+
+
+def test_sync_records_only_fetched_days(service, session_token):
+    service._history = RecordingHistory()
+    data = {'email': 'user@example.com', 'session_token': session_token, 'date': '2020-06-30', 'days': 2,
+            'fields': ['steps']}
+    service.sync(data)
+    service.sync(data)
+    service.sync({**data, 'days': 3})
+    assert service.history.calls == [['2020-06-30', '2020-06-29'], ['2020-06-28']]
+
+
+def test_backfill_writes_history_in_batches(service, session_token, tmp_path, monkeypatch):
+    from garmin_core import config
+    from garmin_core.jobs import BackfillJobManager, STATUS_COMPLETED
+
+    monkeypatch.setattr(config, 'BACKFILL_CHECKPOINT_DAYS', 3)
+    history = RecordingHistory()
+    jobs = BackfillJobManager(service.session_client, cache=service.cache, sync_state=service.sync_state,
+                              path=str(tmp_path / 'jobs.sqlite3'), history=history, leader=Follower())
+    job = jobs.submit('user@example.com', '2020-06-01', '2020-06-07')
+    jobs._run(job['id'])
+    job = jobs.get(job['id'])
+    assert (job['status'], job['checkpoint'], job['days_done']) == (STATUS_COMPLETED, '2020-06-07', 7)
+    assert [len(days) for days in history.calls] == [3, 3, 1]
+
+
+def test_summary_endpoint_takes_session_token_from_header_only():
+    import app as backend_app
+
+    store = backend_app.garmin_service.token_store
+    store.save_tokens('summary@example.com', 'tokens', password='secret')
+    session_token = store.issue_session('summary@example.com')
+    client = backend_app.app.test_client()
+    url = '/api/garmin/summary?email=summary@example.com&start=2020-06-01&end=2020-06-07'
+    assert client.get(f'{url}&session_token={session_token}').status_code == 401
+    response = client.get(url, headers={'X-Session-Token': session_token})
+    assert response.status_code == 200
+    assert response.get_json()['success']
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from garmin_core import config, jobs as jobs_module
+from garmin_core.errors import RATE_LIMITED
+from garmin_core.jobs import BackfillJobManager, STATUS_CANCELLED, STATUS_COMPLETED, STATUS_FAILED
+
+
+class Follower:
+    """不会成为 leader：任务只由测试直接执行"""
+    is_leader = False
+
+    def run_as_leader(self, fn):
+        pass
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return BackfillJobManager(lambda account: object(), path=str(tmp_path / 'jobs.sqlite3'), leader=Follower())
+
+
+def rate_limited_fetch(calls):
+    def fetch_day(client, date_str, **kwargs):
+        calls.append(date_str)
+        return {'date': date_str, 'cache': {'hit': [], 'miss': [], 'failed': ['steps'],
+                                            'errors': {'steps': RATE_LIMITED}}}
+    return fetch_day
+
+
+def test_job_completes_and_checkpoints(manager, monkeypatch):
+    monkeypatch.setattr(jobs_module, 'fetch_day', lambda client, date_str, **kwargs: {
+        'date': date_str, 'cache': {'hit': [], 'miss': ['steps'], 'failed': [], 'errors': {}}})
+    job = manager.submit('User@Example.com', '2020-06-01', '2020-06-03')
+    manager._run(job['id'])
+    job = manager.get(job['id'])
+    assert (job['status'], job['checkpoint'], job['days_done'], job['progress']) == \
+        (STATUS_COMPLETED, '2020-06-03', 3, 1.0)
+    assert [j['id'] for j in manager.list('user@example.com')] == [job['id']]
+
+
+def test_persistently_throttled_day_fails_after_retries(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(jobs_module, 'fetch_day', rate_limited_fetch(calls))
+    monkeypatch.setattr(config, 'BACKFILL_RETRY_DELAY', 0.001)
+    monkeypatch.setattr(config, 'BACKFILL_MAX_RETRIES', 2)
+    job = manager.submit('a@example.com', '2020-06-01', '2020-06-03')
+    manager._run(job['id'])
+    job = manager.get(job['id'])
+    assert job['status'] == STATUS_FAILED
+    assert '2020-06-01' in job['error']
+    assert calls == ['2020-06-01'] * 3
+
+
+def test_cancel_interrupts_retry_wait(manager, monkeypatch):
+    calls = []
+    monkeypatch.setattr(jobs_module, 'fetch_day', rate_limited_fetch(calls))
+    monkeypatch.setattr(config, 'BACKFILL_RETRY_DELAY', 60.0)
+    job = manager.submit('a@example.com', '2020-06-01', '2020-06-03')
+    runner = threading.Thread(target=manager._run, args=(job['id'],))
+    runner.start()
+    while not calls:
+        pass
+    manager.cancel(job['id'])
+    runner.join(5)
+    assert not runner.is_alive()
+    assert manager.get(job['id'])['status'] == STATUS_CANCELLED
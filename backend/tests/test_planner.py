@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from garmin_core.planner import DEFAULT_FIELDS, parse_fields, plan_calls
+
+DATES = ['2026-07-03', '2026-07-02', '2026-07-01']
+
+
+def summarize(calls):
+    return sorted((c.endpoint.name, c.start, c.end) for c in calls)
+
+
+def test_range_endpoints_request_each_window_once():
+    calls = plan_calls({'steps': DATES, 'weight': DATES, 'activities_summary': DATES})
+    assert summarize(calls) == [
+        ('activities', '2026-07-01', '2026-07-03'),
+        ('body_composition', '2026-07-01', '2026-07-03'),
+        ('daily_steps', '2026-07-01', '2026-07-03'),
+    ]
+
+
+def test_daily_summary_covers_several_fields():
+    calls = plan_calls({'steps': DATES, 'heart_rate': DATES, 'calories': DATES})
+    assert summarize(calls) == [
+        ('daily_steps', '2026-07-01', '2026-07-03'),
+        ('daily_summary', '2026-07-01', '2026-07-01'),
+        ('daily_summary', '2026-07-02', '2026-07-02'),
+        ('daily_summary', '2026-07-03', '2026-07-03'),
+    ]
+    summaries = [c for c in calls if c.endpoint.name == 'daily_summary']
+    assert all(sorted(c.fields[c.start]) == ['calories', 'heart_rate'] for c in summaries)
+
+
+def test_one_endpoint_serves_fields_of_the_same_day():
+    calls = plan_calls({'activities_summary': DATES, 'training': DATES[:1]})
+    assert summarize(calls) == [('activities', '2026-07-01', '2026-07-03')]
+    assert sorted(calls[0].fields['2026-07-03']) == ['activities_summary', 'training']
+    assert calls[0].fields['2026-07-01'] == ['activities_summary']
+
+
+def test_every_pending_field_is_covered():
+    pending = {field: DATES for field in DEFAULT_FIELDS}
+    covered = {(f, d) for c in plan_calls(pending) for d, fields in c.fields.items() for f in fields}
+    assert covered == {(f, d) for f in DEFAULT_FIELDS for d in DATES}
+
+
+def test_parse_fields():
+    assert parse_fields(None) == DEFAULT_FIELDS
+    assert parse_fields('steps, sleep,steps') == ('steps', 'sleep')
+    assert 'training' not in DEFAULT_FIELDS
+    with pytest.raises(ValueError):
+        parse_fields(['steps', 'nope'])
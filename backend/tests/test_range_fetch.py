@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from bench.fake_client import FakeGarmin
+from garmin_core.planner import date_windows
+
+EMAIL = 'user@example.com'
+
+
+def test_date_windows_merge_consecutive_days():
+    dates = ['2026-07-05', '2026-07-01', '2026-07-02', '2026-07-03', '2026-07-02']
+    assert date_windows(dates, max_days=7) == [
+        ('2026-07-01', '2026-07-03', ['2026-07-01', '2026-07-02', '2026-07-03']),
+        ('2026-07-05', '2026-07-05', ['2026-07-05']),
+    ]
+
+
+def test_date_windows_respect_max_days():
+    dates = [f'2026-07-{d:02d}' for d in range(1, 6)]
+    assert [(s, e) for s, e, _ in date_windows(dates, max_days=2)] == [
+        ('2026-07-01', '2026-07-02'), ('2026-07-03', '2026-07-04'), ('2026-07-05', '2026-07-05')]
+
+
+def test_one_request_per_range(service, server, session_token):
+    server.reset()
+    service.sync({'email': EMAIL, 'session_token': session_token, 'date': '2020-06-30', 'days': 5,
+                  'fields': ['steps', 'weight', 'activities_summary']})
+    calls = server.stats()['calls']
+    assert calls['daily_steps'] == 1
+    assert calls['body_composition'] == 1
+    assert 'daily_summary' not in calls
+
+
+class MissingDayGarmin(FakeGarmin):
+    """步数范围响应中缺少最早的一天"""
+
+    def get_daily_steps(self, start, end):
+        return [item for item in super().get_daily_steps(start, end) if item.get('calendarDate') != start]
+
+
+def test_day_missing_from_range_response_is_not_cached(service, session_token):
+    service.garmin_cls = MissingDayGarmin
+    service.session_pool.remove(EMAIL)
+    service.sync({'email': EMAIL, 'session_token': session_token, 'date': '2020-06-30', 'days': 2,
+                  'fields': ['steps']})
+    assert service.cache.peek(EMAIL, '2020-06-30', 'steps')[0]
+    assert not service.cache.peek(EMAIL, '2020-06-29', 'steps')[0]
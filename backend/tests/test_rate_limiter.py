@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from garmin_core.rate_limiter import AdaptiveRateLimiter, RateLimitExceeded, SQLiteRateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(monkeypatch, cls=AdaptiveRateLimiter, **kwargs):
+    # 时钟不走，max_wait 必须小于补充一个令牌的时间，否则 acquire 会一直等待
+    clock = Clock()
+    monkeypatch.setattr(cls, '_now', staticmethod(clock))
+    options = dict(rate=2.0, burst=3, min_rate=0.5, recovery_step=0.5, backoff_base=4.0, backoff_max=60.0,
+                   max_wait=0.1)
+    options.update(kwargs)
+    return cls(**options), clock
+
+
+def test_burst_then_refill(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch)
+    for _ in range(3):
+        limiter.acquire()
+    with pytest.raises(RateLimitExceeded, match='rate limit'):
+        limiter.acquire()
+    clock.now += 0.5
+    limiter.acquire()
+    clock.now += 10
+    assert limiter.state()['tokens'] == 3
+
+
+def test_rate_limited_backs_off_and_recovers(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch)
+    limiter.on_rate_limited()
+    state = limiter.state()
+    assert state['rate'] == 1.0
+    assert 2.0 <= state['backoff_remaining'] <= 4.0
+    assert state['consecutive_rate_limits'] == 1
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()
+
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.state()['rate'] == 0.5
+
+    clock.now += 60
+    limiter.acquire()
+    limiter.on_success()
+    limiter.on_success()
+    state = limiter.state()
+    assert state['rate'] == 1.5
+    assert state['consecutive_rate_limits'] == 0
+    assert state['total_rate_limits'] == 3
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.state()['rate'] == 2.0
+
+
+def test_sqlite_limiter_shares_budget(tmp_path, monkeypatch):
+    path = str(tmp_path / 'rate_limit.sqlite3')
+    first, clock = make_limiter(monkeypatch, SQLiteRateLimiter, path=path)
+    second = SQLiteRateLimiter(path=path, rate=2.0, burst=3, min_rate=0.5, recovery_step=0.5, backoff_base=4.0,
+                               backoff_max=60.0, max_wait=0.1)
+    first.acquire()
+    first.acquire()
+    second.acquire()
+    with pytest.raises(RateLimitExceeded):
+        second.acquire()
+    first.on_rate_limited()
+    assert second.state()['rate'] == 1.0
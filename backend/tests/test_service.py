@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+登录和凭据校验：请求本地模拟的 Garmin Connect（bench/fake_garmin.py）
+"""
+
+import pytest
+
+from bench.fake_garmin import INVALID_PASSWORD
+from garmin_core.service import ServiceError
+
+EMAIL = 'user@example.com'
+
+
+def sync(service, **data):
+    return service.sync({'email': EMAIL, 'date': '2020-06-30', 'days': 2, 'fields': ['steps'], **data})
+
+
+def test_login_rejects_invalid_password(service):
+    with pytest.raises(ServiceError):
+        service.login({'email': EMAIL, 'password': INVALID_PASSWORD})
+    assert service.token_store.load_record(EMAIL) is None
+    assert service.session_pool.get(EMAIL) is None
+
+
+def test_sync_requires_credentials(service, session_token):
+    with pytest.raises(ServiceError) as e:
+        sync(service)
+    assert e.value.status == 401
+    with pytest.raises(ServiceError) as e:
+        sync(service, session_token='forged')
+    assert e.value.status == 401
+    assert sync(service, session_token=session_token)['success']
+
+
+def test_session_token_resumes_without_login(service, server, session_token):
+    service.session_pool.remove(EMAIL)
+    server.reset()
+    result = sync(service, session_token=session_token)
+    assert [d['steps']['total_steps'] > 0 for d in result['data']] == [True, True]
+    assert 'login' not in server.stats()['calls']
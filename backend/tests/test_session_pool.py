@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from garmin_core import session_pool as session_pool_module
+from garmin_core.session_pool import SessionPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(session_pool_module.time, 'monotonic', clock)
+    return SessionPool(**kwargs), clock
+
+
+def test_accounts_are_case_insensitive(monkeypatch):
+    pool, _ = make_pool(monkeypatch, max_size=10, idle_ttl=60)
+    pool.put(' A@Example.com ', 'client')
+    assert pool.get('a@example.com') == 'client'
+    assert pool.accounts() == ['a@example.com']
+
+
+def test_evicts_least_recently_used_when_full(monkeypatch):
+    pool, _ = make_pool(monkeypatch, max_size=2, idle_ttl=0)
+    pool.put('a', 'A')
+    pool.put('b', 'B')
+    pool.get('a')
+    pool.put('c', 'C')
+    assert pool.get('b') is None
+    assert pool.accounts() == ['a', 'c']
+
+
+def test_idle_sessions_expire(monkeypatch):
+    pool, clock = make_pool(monkeypatch, max_size=10, idle_ttl=60)
+    pool.put('a', 'A')
+    pool.put('b', 'B')
+    clock.now += 30
+    assert pool.get('a') == 'A'
+    clock.now += 45
+    assert pool.evict_idle() == 1
+    assert pool.accounts() == ['a']
+    clock.now += 61
+    assert pool.get('a') is None
+    assert len(pool) == 0
+
+
+def test_peek_does_not_refresh_idle_time(monkeypatch):
+    pool, clock = make_pool(monkeypatch, max_size=10, idle_ttl=60)
+    pool.put('a', 'A')
+    clock.now += 50
+    assert pool.peek('a') == 'A'
+    clock.now += 20
+    assert pool.peek('a') is None
+    assert pool.get('a') is None
+
+
+def test_remove(monkeypatch):
+    pool, _ = make_pool(monkeypatch, max_size=10, idle_ttl=60)
+    pool.put('a', 'A')
+    assert pool.remove('A') is True
+    assert pool.remove('a') is False
+
+
+def test_prefetch_cycle_evicts_idle_sessions(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+
+    from garmin_core.prefetch import PrefetchScheduler
+    from garmin_core.sync_state import SyncStateStore
+
+    pool, clock = make_pool(monkeypatch, max_size=10, idle_ttl=60)
+    service = SimpleNamespace(session_pool=pool, sync_state=SyncStateStore(str(tmp_path / 'sync_state.sqlite3')))
+    pool.put('a', 'A')
+    clock.now += 61
+    assert PrefetchScheduler(service, interval=60).run_cycle() == {}
+    assert len(pool) == 0
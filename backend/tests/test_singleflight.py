@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from garmin_core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do('key', fetch)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do('key', fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flights.stats()['coalesced'] < 3:
+        pass
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [('result', False)] + [('result', True)] * 3
+    assert flights.stats() == {'executed': 1, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_sequential_calls_run_again():
+    flights = SingleFlight()
+    assert flights.do('key', lambda: 1) == (1, False)
+    assert flights.do('key', lambda: 2) == (2, False)
+    assert flights.executed == 2
+
+
+def test_errors_are_raised_and_not_kept():
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flights.do('key', fail)
+    assert flights.in_flight() == 0
+    assert flights.do('key', lambda: 'ok') == ('ok', False)
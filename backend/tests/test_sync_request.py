@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from garmin_core.service import ServiceError
+
+
+@pytest.mark.parametrize('days', [True, False, 'two', 0, -1, [3]])
+def test_invalid_days_are_rejected(service, session_token, days):
+    with pytest.raises(ServiceError) as e:
+        service.prepare_sync({'email': 'user@example.com', 'session_token': session_token, 'days': days})
+    assert e.value.status == 400
+
+
+@pytest.mark.parametrize('days, expected', [(None, 3), ('2', 2), (5, 5), (100, 7)])
+def test_days_default_and_limit(service, session_token, days, expected):
+    req = service.prepare_sync({'email': 'user@example.com', 'session_token': session_token, 'date': '2020-06-30',
+                                'days': days})
+    assert len(req.dates) == expected
+    assert req.dates[0] == '2020-06-30'
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+
+from garmin_core import config
+from garmin_core.sync_state import SyncStateStore
+
+
+def test_watermark_advances_over_consecutive_complete_days(tmp_path):
+    state = SyncStateStore(str(tmp_path / 'sync_state.sqlite3'))
+    assert state.get_watermark('a') is None
+    assert state.record_days('A', {'2020-06-01': True, '2020-06-02': True, '2020-06-04': True}) == '2020-06-02'
+    assert state.record_days('a', {'2020-06-03': False}) == '2020-06-02'
+    assert state.record_days('a', {'2020-06-03': True}) == '2020-06-04'
+
+
+def test_watermark_stops_before_recent_days(tmp_path):
+    state = SyncStateStore(str(tmp_path / 'sync_state.sqlite3'))
+    today = date.today()
+    days = {(today - timedelta(days=n)).isoformat(): True for n in range(10)}
+    assert state.record_days('a', days) == (today - timedelta(days=config.CACHE_IMMUTABLE_DAYS + 1)).isoformat()
+
+
+def test_incremental_sync_starts_after_watermark(service, server, session_token):
+    data = {'email': 'user@example.com', 'session_token': session_token, 'date': '2020-06-30', 'days': 3}
+    first = service.sync(data)
+    assert first['sync']['watermark'] == '2020-06-30'
+    server.reset()
+    result = service.sync({'email': 'user@example.com', 'session_token': session_token, 'date': '2020-07-02',
+                           'since': 'watermark'})
+    assert [d['date'] for d in result['data']] == ['2020-07-02', '2020-07-01']
+    assert result['sync']['watermark'] == '2020-07-02'
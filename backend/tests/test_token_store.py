@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from garmin_core import config
+from garmin_core.token_store import FileTokenStore, account_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileTokenStore(str(tmp_path / 'tokens'))
+
+
+def test_tokens_require_matching_password(store):
+    store.save_tokens('User@Example.com', 'tokens', password='secret')
+    assert store.load_tokens('user@example.com', password='secret') == 'tokens'
+    assert store.load_tokens('user@example.com', password='wrong') is None
+    assert store.load_tokens('user@example.com') is None
+    assert store.load_tokens('user@example.com', trusted=True) == 'tokens'
+
+
+def test_record_does_not_contain_password(store):
+    store.save_tokens('a@example.com', 'tokens', password='secret')
+    raw = store.get(account_key('a@example.com'))
+    assert 'secret' not in raw
+    assert json.loads(raw)['fingerprint']
+
+
+def test_session_tokens(store):
+    assert store.issue_session('a@example.com') is None
+    store.save_tokens('a@example.com', 'tokens', password='secret')
+    session_token = store.issue_session('a@example.com')
+    assert session_token
+    assert session_token not in store.get(account_key('a@example.com'))
+    assert store.verify_credentials('a@example.com', session_token=session_token)
+    assert store.load_tokens('a@example.com', session_token=session_token) == 'tokens'
+    assert not store.verify_credentials('a@example.com', session_token='forged')
+    assert not store.verify_credentials('b@example.com', session_token=session_token)
+
+
+def test_sessions_survive_same_password_only(store):
+    store.save_tokens('a@example.com', 'tokens', password='secret')
+    session_token = store.issue_session('a@example.com')
+    store.save_tokens('a@example.com', 'refreshed', password='secret')
+    assert store.load_tokens('a@example.com', session_token=session_token) == 'refreshed'
+    store.save_tokens('a@example.com', 'changed', password='new-secret')
+    assert not store.verify_credentials('a@example.com', session_token=session_token)
+    assert not store.verify_credentials('a@example.com', password='secret')
+    assert store.verify_credentials('a@example.com', password='new-secret')
+
+
+def test_session_tokens_are_capped(store, monkeypatch):
+    monkeypatch.setattr(config, 'SESSION_TOKENS_PER_ACCOUNT', 2)
+    store.save_tokens('a@example.com', 'tokens', password='secret')
+    first, second, third = (store.issue_session('a@example.com') for _ in range(3))
+    assert not store.verify_credentials('a@example.com', session_token=first)
+    assert store.verify_credentials('a@example.com', session_token=second)
+    assert store.verify_credentials('a@example.com', session_token=third)
+
+
+def test_expired_and_corrupted_records_are_discarded(store):
+    store.save_tokens('a@example.com', 'tokens', password='secret', ttl=-1)
+    assert store.load_record('a@example.com') is None
+    store.set(account_key('b@example.com'), 'not json')
+    assert store.load_record('b@example.com') is None
+    assert store.get(account_key('b@example.com')) is None
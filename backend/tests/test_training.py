@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from garmin_core.training import AEROBIC, ANAEROBIC, ActivityClassifier, classify_activity
+
+
+def activity(activity_id=1, type_key='running', zones=(600, 1200, 900, 0, 0), aerobic=3.0, anaerobic=0.5):
+    data = {'activityId': activity_id, 'activityType': {'typeKey': type_key}, 'duration': sum(zones),
+            'aerobicTrainingEffect': aerobic, 'anaerobicTrainingEffect': anaerobic, 'averageHR': 175}
+    data.update({f'hrTimeInZone_{i}': seconds for i, seconds in enumerate(zones, 1)})
+    return data
+
+
+def test_classification_signals():
+    result = classify_activity(activity())
+    assert result['classification'] == AEROBIC
+    assert result['basis'] == ['activity_type', 'hr_zones', 'training_effect']
+    hard = classify_activity(activity(type_key='hiit', zones=(0, 0, 100, 400, 900), aerobic=1.0, anaerobic=4.0))
+    assert hard['classification'] == ANAEROBIC
+
+
+def test_unknown_activity_without_signals():
+    result = classify_activity({'activityId': 2, 'activityType': {'typeKey': 'other'}})
+    assert result['classification'] is None and result['basis'] == []
+
+
+def test_results_are_cached_with_bounded_memory(tmp_path):
+    classifier = ActivityClassifier(str(tmp_path / 'cache.sqlite3'), memory_size=1)
+    summary = classifier.summarize([activity(1), activity(2, type_key='hiit', aerobic=1.0, anaerobic=4.0)])
+    assert summary['dominant'] == AEROBIC
+    assert classifier.stats()['memory_entries'] == 1
+    classifier.summarize([activity(1)])
+    assert classifier.stats()['hits'] == 1
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Vercel 函数（zhiji-app/api/garmin.py）保持原来的响应格式"""
+
+import importlib.util
+import os
+
+import pytest
+
+from conftest import EMAIL, PASSWORD
+
+VERCEL_MODULE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             'zhiji-app', 'api', 'garmin.py')
+
+
+@pytest.fixture
+def vercel(service, monkeypatch):
+    """加载 Vercel 函数模块（garmin_core 使用 backend/ 下的源码），服务换成请求模拟服务的 LegacyGarminService"""
+    monkeypatch.setenv('GARMIN_CORE_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    spec = importlib.util.spec_from_file_location('vercel_garmin', VERCEL_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.LegacyGarminService(
+        garmin_cls=service.garmin_cls, session_pool=service.session_pool, token_store=service.token_store,
+        cache=service.cache, sync_state=service.sync_state, default_fields=module.LEGACY_FIELDS,
+        default_days=7, history=False)
+
+
+def test_sync_days_keep_sleep_key(vercel):
+    status, result = vercel.dispatch({'action': 'sync', 'email': EMAIL, 'password': PASSWORD, 'date': '2020-06-30'})
+    assert status == 200 and result['success']
+    assert len(result['data']) == 7
+    for day in result['data']:
+        assert 'sleep' in day and 'sleep_data' not in day
+        assert 'daily_summary' in day and 'activities' in day
+
+
+def test_explicit_fields_are_not_renamed(vercel):
+    status, result = vercel.dispatch({'action': 'sync', 'email': EMAIL, 'password': PASSWORD, 'date': '2020-06-30',
+                                      'days': 1, 'fields': ['sleep_data']})
+    assert status == 200
+    assert 'sleep_data' in result['data'][0]
+
+
+def test_errors_are_returned_with_status_200(vercel):
+    assert vercel.dispatch({'action': 'nope'}) == (200, {'success': False, 'error': 'Unknown action: nope'})
+    status, result = vercel.dispatch({'action': 'sync', 'email': EMAIL})
+    assert status == 200 and result['success'] is False and result['error']
+
+
+def test_login_keeps_data_field(vercel):
+    status, result = vercel.dispatch({'action': 'login', 'email': EMAIL, 'password': PASSWORD})
+    assert status == 200
+    assert result['data']['success'] is True
+    assert result['session_token']
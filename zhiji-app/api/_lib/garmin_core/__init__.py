@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+脂记应用 - Garmin 同步核心模块
+供 backend/app.py 使用的会话、同步等公共组件
+"""
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 登录辅助
+优先复用令牌存储中的会话，只有令牌缺失或被拒绝时才完整登录
+"""
+
+import logging
+
+from . import upstream
+from .errors import is_rate_limit_error, classify_error, CIRCUIT_OPEN
+
+logger = logging.getLogger(__name__)
+
+
+def resume_session(garmin_cls, email, password, store, session_token=None, trusted=False):
+    """尝试用保存的令牌恢复会话（需要匹配的密码或会话密钥，见 TokenStore.load_tokens），失败时返回None"""
+    tokens = store.load_tokens(email, password, session_token=session_token, trusted=trusted)
+    if not tokens:
+        return None
+
+    client = garmin_cls(email, password)
+    try:
+        # 与 Garmin.login(tokenstore) 相同：加载令牌后读取用户资料以验证令牌
+        client.garth.loads(tokens)
+        def get_profile():
+            return client.garth.profile
+        profile = upstream.call(get_profile)
+        client.display_name = profile['displayName']
+        client.full_name = profile['fullName']
+    except Exception as e:
+        if is_rate_limit_error(e) or classify_error(e) == CIRCUIT_OPEN:
+            raise
+        logger.info(f"Stored tokens for {email} rejected, falling back to full login: {e}")
+        store.delete_tokens(email)
+        return None
+
+    logger.info(f"Resumed Garmin session for {email} from token store")
+    return client
+
+
+def save_session(client, email, password, store):
+    """保存客户端当前的令牌"""
+    try:
+        store.save_tokens(email, client.garth.dumps(), password)
+    except Exception as e:
+        logger.warning(f"Could not persist Garmin tokens for {email}: {e}")
+
+
+def login_client(garmin_cls, email, password, store):
+    """获取已登录的客户端，返回 (client, resumed)"""
+    client = resume_session(garmin_cls, email, password, store)
+    if client is not None:
+        return client, True
+
+    client = garmin_cls(email, password)
+    upstream.call(client.login)
+    save_session(client, email, password, store)
+    return client, False
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+多账户批量同步
+一次请求同步多个账户（每个账户可以有自己的日期范围和字段）：每个账户的日期按 chunk_days 切成小块，
+调度器按账户轮转（round-robin）依次提交，每个账户同一时间最多一个块在执行，同时执行的块不超过 concurrency，
+日期范围很大的账户不会让其他账户一直等待。所有上游请求仍经过共享的熔断器和限流器
+"""
+
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import config
+from .compact import to_columns
+from .errors import classify_error, AUTH_EXPIRED, UNAVAILABLE_ERRORS
+from .metrics import metrics
+from .streaming import encode_frame, summarize_days
+from .sync_engine import fetch_days, is_day_complete, is_day_unavailable, day_error_types
+
+logger = logging.getLogger(__name__)
+
+# 每个账户结果中的数据格式：summary 只有汇总（默认），full 为逐天数据，compact 为列式数据
+FORMATS = ('summary', 'full', 'compact')
+
+
+class AccountTask:
+    """一个账户的批量同步：待执行的日期块和已完成的数据"""
+
+    def __init__(self, index, entry, req=None, error=None):
+        self.index = index
+        self.entry = entry
+        self.req = req            # service.SyncRequest，参数无效或未登录时为None
+        self.error = error        # ServiceError.to_dict()
+        self.chunks = deque()
+        self.result_data = []
+        self.sync_info = None
+        self.started = None
+        self.seconds = 0.0
+
+    @property
+    def account(self):
+        return self.req.account if self.req is not None else (self.entry.get('email') or self.entry.get('account'))
+
+    @property
+    def days_total(self):
+        return len(self.req.dates) if self.req is not None else 0
+
+    @property
+    def done(self):
+        return self.error is not None or not self.chunks
+
+
+class BatchSync:
+    """按账户轮转、有并发上限的批量同步"""
+
+    def __init__(self, service, concurrency=None, chunk_days=None, max_accounts=None, max_days=None):
+        self.service = service  # GarminService
+        self.concurrency = concurrency if concurrency is not None else config.BATCH_CONCURRENCY
+        self.chunk_days = chunk_days if chunk_days is not None else config.BATCH_CHUNK_DAYS
+        self.max_accounts = max_accounts if max_accounts is not None else config.BATCH_MAX_ACCOUNTS
+        self.max_days = max_days if max_days is not None else config.BATCH_MAX_DAYS
+
+    def prepare(self, data):
+        """解析批量请求，返回 (tasks, options)；请求本身无效时抛出 ValueError
+
+        data['accounts'] 为账户邮箱或同步参数（email、date、days、since、fields、force_refresh、password）的列表，
+        顶层的同样参数作为所有账户的默认值
+        """
+        data = data or {}
+        entries = data.get('accounts')
+        if not isinstance(entries, list) or not entries:
+            raise ValueError('"accounts" must be a non-empty list')
+        if len(entries) > self.max_accounts:
+            raise ValueError(f'Too many accounts (max {self.max_accounts})')
+        fmt = data.get('format') or 'summary'
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt}. Use {', '.join(FORMATS)}")
+        concurrency = data.get('concurrency') or self.concurrency
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise ValueError('"concurrency" must be a positive integer')
+
+        defaults = {k: v for k, v in data.items() if k not in ('accounts', 'concurrency', 'stream', 'format')}
+        if fmt == 'compact':
+            defaults['format'] = 'compact'
+
+        # 延迟导入避免循环依赖
+        from .service import ServiceError
+
+        tasks = []
+        for index, entry in enumerate(entries):
+            entry = {'email': entry} if isinstance(entry, str) else entry
+            if not isinstance(entry, dict) or not (entry.get('email') or entry.get('account')):
+                raise ValueError(f'accounts[{index}] must be an email or an object with "email"')
+            try:
+                req = self.service.prepare_sync({**defaults, **entry}, max_days=self.max_days)
+            except ServiceError as e:
+                tasks.append(AccountTask(index, entry, error=e.to_dict()))
+                continue
+            task = AccountTask(index, entry, req)
+            for i in range(0, len(req.dates), self.chunk_days):
+                task.chunks.append(req.dates[i:i + self.chunk_days])
+            tasks.append(task)
+        return tasks, {'format': fmt, 'concurrency': min(concurrency, self.concurrency)}
+
+    def _run_chunk(self, task, dates):
+        """同步一个账户的一个日期块（同一账户的块不会并发执行）"""
+        from .service import ServiceError
+
+        req = task.req
+        if callable(req.client):
+            try:
+                req.client = req.client()
+            except Exception as e:
+                # 与单账户同步相同：上游不可用（熔断打开、限流、连接错误）时交给 fetch_days 改用过期缓存，
+                # 只有其他错误才按登录失败处理
+                if classify_error(e) not in UNAVAILABLE_ERRORS:
+                    raise e if isinstance(e, ServiceError) else self.service._login_error(e)
+        days_data = fetch_days(req.client, dates, fields=req.fields, account=req.account, cache=self.service.cache,
+                               force_refresh=req.force_refresh, serve_stale=True)
+        result_data = [days_data[date_str] for date_str in dates]
+        if all(is_day_unavailable(d) for d in result_data):
+            raise self.service._unavailable_error(result_data)
+        return result_data, self.service.finish_sync(req.account, result_data, req.fields)
+
+    def iter_run(self, tasks, concurrency):
+        """执行批量同步，逐个产出 ('progress', ...)（每个日期块完成）和 ('account', ...)（每个账户完成）"""
+        ready = deque(task for task in tasks if not task.done)
+        running = {}  # future -> (task, dates)
+        started = time.perf_counter()
+
+        for task in tasks:
+            if task.done:
+                yield 'account', self._account_result(task)
+
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='garmin-batch')
+        try:
+            while ready or running:
+                # 按账户轮转提交：每次从队首取一个账户的下一个块，账户放回队尾
+                while ready and len(running) < concurrency:
+                    task = ready.popleft()
+                    dates = task.chunks.popleft()
+                    if task.started is None:
+                        task.started = time.perf_counter()
+                    running[executor.submit(self._run_chunk, task, dates)] = (task, dates)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task, dates = running.pop(future)
+                    try:
+                        result_data, task.sync_info = future.result()
+                        task.result_data.extend(result_data)
+                        if any(AUTH_EXPIRED in day_error_types(d) for d in result_data):
+                            self.service.forget(task.account)
+                            task.error = {
+                                'success': False,
+                                'error': 'Authentication expired. Please re-login to Garmin Connect.',
+                                'error_type': AUTH_EXPIRED
+                            }
+                    except Exception as e:
+                        logger.warning(f"Batch sync failed for {task.account} ({dates[-1]} ~ {dates[0]}): {e}")
+                        error = getattr(e, 'to_dict', None)
+                        task.error = error() if error else {'success': False, 'error': f'Sync error: {str(e)}'}
+                    task.seconds = time.perf_counter() - task.started
+
+                    yield 'progress', {
+                        'account': task.account,
+                        'start': dates[-1],
+                        'end': dates[0],
+                        'days_done': len(task.result_data),
+                        'days_total': task.days_total,
+                        'seconds': round(time.perf_counter() - started, 3)
+                    }
+                    if task.done:
+                        yield 'account', self._account_result(task)
+                    else:
+                        ready.append(task)
+        finally:
+            # 客户端断开（流式输出被关闭）时不再提交新的块
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _account_result(task):
+        """账户完成时的汇总：是否成功、错误、部分数据和过期数据状态、水位线"""
+        success = task.error is None
+        metrics.inc('garmin_batch_accounts_total', {'outcome': 'success' if success else 'error'},
+                    help_text='Accounts processed by batch sync by outcome')
+        result = {'index': task.index, 'account': task.account, 'success': success}
+        if not success:
+            result.update({k: v for k, v in task.error.items() if k != 'success'})
+        if task.req is None:
+            return result
+        result.update(summarize_days(task.result_data, is_day_complete))
+        result['seconds'] = round(task.seconds, 3)
+        if task.sync_info is not None:
+            result['watermark'] = task.sync_info['sync']['watermark']
+        return result
+
+    def run(self, data):
+        """执行批量同步，返回按请求顺序排列的每个账户的结果；请求本身无效时抛出 ValueError"""
+        tasks, options = self.prepare(data)
+        started = time.perf_counter()
+        results = {}
+        for frame_type, payload in self.iter_run(tasks, options['concurrency']):
+            if frame_type == 'account':
+                results[payload['index']] = payload
+        ordered = [self._with_format(results[task.index], task, options['format']) for task in tasks]
+        return {
+            'success': True,
+            'results': ordered,
+            'summary': self._summary(ordered, started)
+        }
+
+    def stream(self, data, fmt):
+        """校验请求（无效时立即抛出 ValueError）后返回逐帧编码的生成器：progress、account 帧，最后一帧 summary"""
+        tasks, options = self.prepare(data)
+        by_index = {task.index: task for task in tasks}
+
+        def frames():
+            started = time.perf_counter()
+            results = []
+            for frame_type, payload in self.iter_run(tasks, options['concurrency']):
+                if frame_type == 'account':
+                    payload = self._with_format(payload, by_index[payload['index']], options['format'])
+                    results.append(payload)
+                yield encode_frame(fmt, frame_type, payload)
+            yield encode_frame(fmt, 'summary', {'success': True, **self._summary(results, started)})
+
+        return frames()
+
+    @staticmethod
+    def _with_format(result, task, fmt):
+        """按请求的格式附带数据：full 为逐天数据，compact 为列式数据"""
+        if fmt == 'summary' or task.req is None:
+            return result
+        if fmt == 'full':
+            return {**result, 'data': task.result_data}
+        return {**result, **to_columns(task.result_data, task.req.fields)}
+
+    @staticmethod
+    def _summary(results, started):
+        return {
+            'accounts': len(results),
+            'succeeded': sum(1 for r in results if r['success']),
+            'failed': sum(1 for r in results if not r['success']),
+            'partial': sum(1 for r in results if r.get('partial')),
+            'stale': sum(1 for r in results if r.get('stale')),
+            'seconds': round(time.perf_counter() - started, 3)
+        }
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+每日指标缓存
+按 (账户, 日期, 指标) 缓存同步结果：内存LRU在前，SQLite持久化在后
+过去的日子几乎不会再变化，TTL按日期远近区分：
+当天短TTL，最近几天中等TTL，更早的数据永久有效
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, date
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def ttl_for(date_str, today=None):
+    """根据日期远近返回TTL秒数，None表示永久缓存"""
+    today = today or date.today()
+    try:
+        age = (today - datetime.strptime(date_str, '%Y-%m-%d').date()).days
+    except ValueError:
+        return config.CACHE_TTL_TODAY
+    if age <= 0:
+        return config.CACHE_TTL_TODAY
+    if age <= config.CACHE_IMMUTABLE_DAYS:
+        return config.CACHE_TTL_RECENT
+    return None
+
+
+def is_immutable(date_str, today=None):
+    """该日期的数据是否已视为不再变化"""
+    return ttl_for(date_str, today) is None
+
+
+class DayMetricCache:
+    """线程安全的两级缓存"""
+
+    def __init__(self, path=None, memory_size=None):
+        self.path = path or config.CACHE_PATH
+        self.memory_size = memory_size if memory_size is not None else config.CACHE_MEMORY_SIZE
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS day_metrics (
+                    account TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    value TEXT,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (account, date, metric)
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _key(account, date_str, metric):
+        return ((account or '').strip().lower(), date_str, metric)
+
+    def _remember_locked(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key, now):
+        """返回缓存值，未命中或已过期时返回 _MISSING"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+                return _MISSING
+
+            try:
+                row = self._db().execute(
+                    'SELECT value, expires_at FROM day_metrics WHERE account=? AND date=? AND metric=?', key
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache read failed for {key}: {e}")
+                return _MISSING
+            if row is None or (row[1] is not None and row[1] <= now):
+                return _MISSING
+            value = json.loads(row[0]) if row[0] is not None else None
+            self._remember_locked(key, value, row[1])
+            return value
+
+    def get(self, account, date_str, metric):
+        """读取缓存，返回 (hit, value)"""
+        value = self._lookup(self._key(account, date_str, metric), time.time())
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        return True, value
+
+    def peek(self, account, date_str, metric):
+        """同 get，但不计入命中率统计（例如条件请求的预检查）"""
+        value = self._lookup(self._key(account, date_str, metric), time.time())
+        if value is _MISSING:
+            return False, None
+        return True, value
+
+    def get_stale(self, account, date_str, metric):
+        """读取最近一次缓存的值（即使已过期），返回 (hit, value, fetched_at)；上游不可用时作为降级数据"""
+        key = self._key(account, date_str, metric)
+        with self._lock:
+            try:
+                row = self._db().execute(
+                    'SELECT value, fetched_at FROM day_metrics WHERE account=? AND date=? AND metric=?', key
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache read failed for {key}: {e}")
+                return False, None, None
+        if row is None:
+            return False, None, None
+        return True, json.loads(row[0]) if row[0] is not None else None, row[1]
+
+    def set(self, account, date_str, metric, value, ttl=_MISSING):
+        """写入缓存，默认按日期远近计算TTL"""
+        key = self._key(account, date_str, metric)
+        now = time.time()
+        ttl = ttl_for(date_str) if ttl is _MISSING else ttl
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._remember_locked(key, value, expires_at)
+            try:
+                db = self._db()
+                db.execute(
+                    'INSERT OR REPLACE INTO day_metrics (account, date, metric, value, fetched_at, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    key + (json.dumps(value), now, expires_at)
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache write failed for {key}: {e}")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'memory_entries': len(self._memory)
+            }
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+上游熔断器
+Garmin 连续返回限流（429）、连接错误或 5xx 时打开熔断：冷却期内所有上游请求立即失败（不占用限流预算），
+冷却结束后进入半开状态，只放行少量探测请求，探测成功则关闭熔断，失败则重新打开并开始新的冷却期。
+熔断状态按进程维护：多个 worker 进程各自计数、各自打开（跨进程共享的是限流器的速率预算和退避）
+"""
+
+import time
+import threading
+import logging
+
+from . import config
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# /metrics 中 garmin_circuit_state 的取值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """熔断打开期间拒绝的上游请求"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Garmin upstream circuit open, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """连续失败计数的熔断器（线程安全）"""
+
+    def __init__(self, failure_threshold=None, cooldown=None, half_open_probes=None):
+        self.failure_threshold = (failure_threshold if failure_threshold is not None
+                                  else config.CIRCUIT_FAILURE_THRESHOLD)
+        self.cooldown = cooldown if cooldown is not None else config.CIRCUIT_COOLDOWN
+        self.half_open_probes = half_open_probes if half_open_probes is not None else config.CIRCUIT_HALF_OPEN_PROBES
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0          # 连续失败次数
+        self._opened_at = 0.0
+        self._probes = 0            # 半开状态下进行中的探测请求
+        self._total_opened = 0
+        self._total_rejected = 0
+
+    @staticmethod
+    def _now():
+        return time.monotonic()
+
+    def _transition_locked(self, state):
+        if state == self._state:
+            return
+        logger.warning(f"Garmin upstream circuit {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = self._now()
+            self._total_opened += 1
+        metrics.inc('garmin_circuit_transitions_total', {'state': state},
+                    help_text='Upstream circuit breaker state transitions')
+
+    def before_call(self):
+        """请求上游前调用：熔断打开时抛出 CircuitOpenError，半开时只放行 half_open_probes 个探测请求"""
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self.cooldown - self._now()
+                if remaining > 0:
+                    self._total_rejected += 1
+                    raise CircuitOpenError(remaining)
+                self._transition_locked(HALF_OPEN)
+                self._probes = 0
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self._total_rejected += 1
+                    raise CircuitOpenError(self.cooldown)
+                self._probes += 1
+
+    def release(self):
+        """before_call 之后没有实际请求上游（例如本地限流等待超时）"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def on_success(self):
+        """上游有正常响应（包括隐私保护、认证失败等业务错误）"""
+        with self._lock:
+            self._failures = 0
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._transition_locked(CLOSED)
+
+    def on_failure(self):
+        """上游不可用（限流、连接错误、5xx）"""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._transition_locked(OPEN)
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._transition_locked(OPEN)
+
+    @property
+    def is_open(self):
+        """冷却期内（请求会被立即拒绝）"""
+        with self._lock:
+            return self._state == OPEN and self._opened_at + self.cooldown > self._now()
+
+    def reset(self):
+        with self._lock:
+            self._transition_locked(CLOSED)
+            self._failures = 0
+            self._probes = 0
+
+    def state(self):
+        with self._lock:
+            retry_after = max(0.0, self._opened_at + self.cooldown - self._now()) if self._state == OPEN else 0.0
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'retry_after': round(retry_after, 1),
+                'failure_threshold': self.failure_threshold,
+                'cooldown': self.cooldown,
+                'total_opened': self._total_opened,
+                'total_rejected': self._total_rejected
+            }
+
+
+# 进程内共享的熔断器：所有上游请求都经过它（见 upstream.call）
+breaker = CircuitBreaker()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 上游错误分类
+与 app.py 中基于错误信息的判断保持一致
+"""
+
+PRIVACY_PROTECTED = 'privacy_protected'
+AUTH_EXPIRED = 'auth_expired'
+RATE_LIMITED = 'rate_limited'
+NETWORK_ERROR = 'network_error'
+CIRCUIT_OPEN = 'circuit_open'
+UNKNOWN_ERROR = 'unknown_error'
+
+# 说明上游暂时不可用的分类：计入熔断器的失败次数，同步时可以返回过期的缓存数据
+UNAVAILABLE_ERRORS = (RATE_LIMITED, NETWORK_ERROR, CIRCUIT_OPEN)
+
+
+def _status_code(exc):
+    """尝试从异常中取出HTTP状态码（garth/requests 的 HTTPError）"""
+    for candidate in (exc, getattr(exc, 'error', None)):
+        response = getattr(candidate, 'response', None)
+        status = getattr(response, 'status_code', None)
+        if status:
+            return status
+    return None
+
+
+def classify_error(exc):
+    """把上游异常归类为 privacy_protected / auth_expired / rate_limited / network_error / circuit_open / unknown_error"""
+    name = type(exc).__name__
+    if name == 'CircuitOpenError':
+        return CIRCUIT_OPEN
+    status = _status_code(exc)
+    error_msg = str(exc).lower()
+
+    if name == 'GarminConnectTooManyRequestsError' or status == 429 \
+            or "too many" in error_msg or "rate limit" in error_msg or "429" in error_msg:
+        return RATE_LIMITED
+    if "privacy" in error_msg or "protected" in error_msg:
+        return PRIVACY_PROTECTED
+    if name == 'GarminConnectAuthenticationError' or status in (401, 403) \
+            or "authentication" in error_msg or "login" in error_msg or "401" in error_msg:
+        return AUTH_EXPIRED
+    if name == 'GarminConnectConnectionError' or "network" in error_msg or "connection" in error_msg:
+        return NETWORK_ERROR
+    return UNKNOWN_ERROR
+
+
+def is_rate_limit_error(exc):
+    return classify_error(exc) == RATE_LIMITED
+
+
+def is_auth_error(exc):
+    return classify_error(exc) == AUTH_EXPIRED
+
+
+def is_upstream_unavailable(exc):
+    """限流、连接错误或 5xx：上游暂时不可用（计入熔断器的失败次数）"""
+    status = _status_code(exc)
+    return classify_error(exc) in (RATE_LIMITED, NETWORK_ERROR) or (isinstance(status, int) and status >= 500)
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+每日指标历史（列式存储）
+每个账户一组 NumPy 数组：按日期排序的日期索引（自 1970-01-01 起的天数）
+加上每个指标一列 float64（缺失为 NaN）。同步结果按天合并写入，
+区间、滑动平均和按周/月汇总都以向量化方式计算，多年的历史也只是几千行
+"""
+
+import os
+import hashlib
+import threading
+import logging
+
+import numpy as np
+
+from . import config
+from .locks import file_lock
+from .compact import COLUMNS, flatten_day
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ('mean', 'sum', 'min', 'max', 'count')
+PERIODS = ('week', 'month')
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def to_day(date_str):
+    """'YYYY-MM-DD' -> 自 1970-01-01 起的天数"""
+    return int((np.datetime64(date_str, 'D') - _EPOCH).astype(np.int64))
+
+
+def to_date_str(days):
+    """天数数组 -> 'YYYY-MM-DD' 列表"""
+    return [str(d) for d in (np.asarray(days, dtype=np.int64) + _EPOCH)]
+
+
+def to_json_values(values):
+    """NaN 转为 None，便于 JSON 输出"""
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+
+class AccountHistory:
+    """单个账户的列式历史：dates 为升序 int64 数组，columns 为等长的 float64 数组"""
+
+    def __init__(self, dates=None, columns=None):
+        self.dates = np.asarray(dates if dates is not None else [], dtype=np.int64)
+        self.columns = {name: np.asarray(columns[name], dtype=np.float64)
+                        if columns and name in columns else np.full(len(self.dates), np.nan)
+                        for name in COLUMNS}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def upsert(self, rows):
+        """合并 {day: {列名: 数值}}：已有日期只覆盖新给出的值，新日期按序插入"""
+        if not rows:
+            return
+        new_days = np.fromiter(rows.keys(), dtype=np.int64, count=len(rows))
+        merged = np.union1d(self.dates, new_days)
+        if len(merged) != len(self.dates):
+            positions = np.searchsorted(merged, self.dates)
+            for name, values in self.columns.items():
+                column = np.full(len(merged), np.nan)
+                column[positions] = values
+                self.columns[name] = column
+            self.dates = merged
+
+        positions = np.searchsorted(self.dates, new_days)
+        for position, row in zip(positions, rows.values()):
+            for name, value in row.items():
+                self.columns[name][position] = value
+
+    def slice(self, start, end):
+        """[start, end] 范围内的行（start/end 为天数，含两端）"""
+        lo = np.searchsorted(self.dates, start, side='left')
+        hi = np.searchsorted(self.dates, end, side='right')
+        return self.dates[lo:hi], {name: values[lo:hi] for name, values in self.columns.items()}
+
+    def dense(self, start, end, metrics):
+        """[start, end] 每天一行的稠密数组（没有记录的日期为 NaN）"""
+        days = np.arange(start, end + 1, dtype=np.int64)
+        dates, columns = self.slice(start, end)
+        offsets = dates - start
+        result = {}
+        for name in metrics:
+            values = np.full(len(days), np.nan)
+            values[offsets] = columns[name]
+            result[name] = values
+        return days, result
+
+
+def aggregate(values, how):
+    """单列聚合，忽略 NaN；没有有效值时返回 NaN"""
+    valid = ~np.isnan(values)
+    count = int(valid.sum())
+    if how == 'count':
+        return float(count)
+    if count == 0:
+        return np.nan
+    return float({'mean': np.nanmean, 'sum': np.nansum, 'min': np.nanmin, 'max': np.nanmax}[how](values))
+
+
+def rolling_mean(values, window):
+    """滑动平均（窗口内忽略 NaN，窗口内没有有效值时为 NaN）"""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    index = np.arange(1, len(values) + 1)
+    lower = np.maximum(index - window, 0)
+    window_sums = sums[index] - sums[lower]
+    window_counts = counts[index] - counts[lower]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+
+def period_keys(days, period):
+    """每天所属的周（周一开始）或月的起始日期（天数）"""
+    if period == 'week':
+        return days - (days + 3) % 7  # 1970-01-01 是周四
+    months = (days + _EPOCH).astype('datetime64[M]')
+    return (months.astype('datetime64[D]') - _EPOCH).astype(np.int64)
+
+
+def rollup(days, values, period, how):
+    """按周/月分组聚合，返回 (分组起始天数数组, 聚合值数组)；days 必须升序"""
+    if len(days) == 0:
+        return np.array([], dtype=np.int64), np.array([])
+    keys = period_keys(days, period)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    if how == 'count':
+        return keys[starts], counts.astype(np.float64)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    if how == 'sum':
+        result = sums
+    elif how == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = sums / counts
+    elif how == 'min':
+        result = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+    else:
+        result = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+    return keys[starts], np.where(counts > 0, result, np.nan)
+
+
+class MetricHistoryStore:
+    """所有账户的列式历史，按需从磁盘加载，写入后以 .npz 原子保存
+
+    多个进程共用目录时：写入在文件锁内重新加载、合并再保存，文件被其他进程更新后下次读取时重新加载
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or config.HISTORY_DIR
+        self._lock = threading.RLock()
+        self._accounts = {}  # account -> (AccountHistory, 加载时文件的 mtime_ns)
+
+    def _path(self, account):
+        digest = hashlib.sha256(account.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.npz')
+
+    def _mtime(self, account):
+        try:
+            return os.stat(self._path(account)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, account):
+        mtime = self._mtime(account)
+        cached = self._accounts.get(account)
+        if cached is not None and cached[1] == mtime:
+            return cached[0]
+        try:
+            with np.load(self._path(account)) as data:
+                history = AccountHistory(data['dates'], {name: data[name] for name in COLUMNS if name in data})
+        except FileNotFoundError:
+            history = AccountHistory()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load metric history for {account}: {e}")
+            history = AccountHistory()
+        self._accounts[account] = (history, mtime)
+        return history
+
+    def _save(self, account, history):
+        path = self._path(account)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, dates=history.dates, **history.columns)
+        os.replace(tmp_path, path)
+        self._accounts[account] = (history, self._mtime(account))
+
+    def record_days(self, account, days):
+        """把同步结果（day_data 列表）合并进账户历史，返回写入的天数"""
+        if not account:
+            return 0
+        rows = {}
+        for day_data in days:
+            row = flatten_day(day_data)
+            if row and day_data.get('date'):
+                rows[to_day(day_data['date'])] = row
+        if not rows:
+            return 0
+        with self._lock, file_lock(self._path(account) + '.lock'):
+            history = self._load(account)
+            history.upsert(rows)
+            try:
+                self._save(account, history)
+            except OSError as e:
+                logger.warning(f"Could not save metric history for {account}: {e}")
+        return len(rows)
+
+    def query(self, account, start, end, metrics=None, op='range', window=7, period='week', how='mean'):
+        """查询 [start, end]（'YYYY-MM-DD'）的指标
+
+        op: range 返回每天的值和区间聚合；rolling 返回 window 天滑动平均（按自然日计算）；
+        rollup 返回按 period（week/month）分组的 how 聚合
+        """
+        metrics = list(metrics or COLUMNS.keys())
+        start_day, end_day = to_day(start), to_day(end)
+        with self._lock:
+            history = self._load(account)
+            if op == 'rolling':
+                days, columns = history.dense(start_day - window + 1, end_day, metrics)
+            else:
+                days, columns = history.slice(start_day, end_day)
+                columns = {name: columns[name].copy() for name in metrics}
+            total_days = len(history)
+
+        result = {'start': start, 'end': end, 'op': op, 'history_days': total_days}
+        if op == 'range':
+            result['dates'] = to_date_str(days)
+            result['metrics'] = {name: to_json_values(columns[name]) for name in metrics}
+            result['aggregates'] = {name: {how_: (None if np.isnan(v) else round(v, 4))
+                                           for how_ in AGGREGATES
+                                           for v in [aggregate(columns[name], how_)]}
+                                    for name in metrics}
+        elif op == 'rolling':
+            keep = window - 1
+            result['window'] = window
+            result['dates'] = to_date_str(days[keep:])
+            result['metrics'] = {name: to_json_values(rolling_mean(columns[name], window)[keep:])
+                                 for name in metrics}
+        else:
+            result['period'] = period
+            result['aggregate'] = how
+            result['metrics'] = {}
+            for name in metrics:
+                keys, values = rollup(days, columns[name], period, how)
+                result['periods'] = to_date_str(keys)
+                result['metrics'][name] = to_json_values(values)
+            result.setdefault('periods', [])
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'accounts_loaded': len(self._accounts),
+                    'days_loaded': sum(len(h) for h, _ in self._accounts.values())}
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+同步响应的条件请求和压缩
+content_etag 按同步数据内容计算 ETag（不含缓存命中等每次都会变化的元数据），
+etag_matches 处理 If-None-Match；compress 按 Accept-Encoding 选择 brotli（已安装时）或 gzip
+"""
+
+import gzip
+import json
+import hashlib
+
+from . import config
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，未安装时只使用 gzip
+    brotli = None
+
+# 每天的数据中不参与 ETag 计算的元数据
+_VOLATILE_KEYS = ('cache',)
+
+
+def content_etag(days, fields, options=None):
+    """按每天的数据、字段和附加参数（例如日内心率分析参数）计算弱 ETag"""
+    content = {
+        'fields': list(fields),
+        'options': options or {},
+        'days': [{k: v for k, v in day.items() if k not in _VOLATILE_KEYS} for day in days]
+    }
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match（可能包含多个 ETag 或 *）是否与 etag 匹配，按弱比较"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding):
+    """从 Accept-Encoding 中选择压缩方式（br 优先），不接受压缩时返回None"""
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, accept_encoding, min_size=None):
+    """按 Accept-Encoding 压缩响应体，返回 (body, encoding)；太小或客户端不接受时 encoding 为None"""
+    min_size = config.COMPRESS_MIN_BYTES if min_size is None else min_size
+    if len(body) < min_size:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding == 'br':
+        return brotli.compress(body, quality=config.COMPRESS_BROTLI_QUALITY), encoding
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=config.COMPRESS_GZIP_LEVEL), encoding
+    return body, None
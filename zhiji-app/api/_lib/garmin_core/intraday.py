@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+日内心率序列
+get_heart_rates 的 heartRateValues 以紧凑形式保存：相对首个采样的秒数（int32）和心率（int16），
+base64 编码后随每日缓存一起存储。降采样、心率区间时间和训练负荷都用 NumPy 向量化计算
+"""
+
+import base64
+
+import numpy as np
+
+from . import config
+
+# 心率区间下限（占最大心率的比例），区间 1~5
+ZONE_BOUNDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def parse_series(hr_data):
+    """从 get_heart_rates 的结果中取出 (时间戳秒数组 int64, 心率数组 int16)，丢弃空值并按时间排序"""
+    samples = [s for s in (hr_data or {}).get('heartRateValues') or []
+               if isinstance(s, (list, tuple)) and len(s) >= 2 and s[0] is not None and s[1] is not None]
+    if not samples:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int16)
+    array = np.asarray(samples, dtype=np.int64)
+    order = np.argsort(array[:, 0], kind='stable')
+    return array[order, 0] // 1000, array[order, 1].astype(np.int16)
+
+
+def encode_series(timestamps, values):
+    """压缩为可 JSON 序列化的字典"""
+    if len(timestamps) == 0:
+        return {'start': None, 'count': 0, 'offsets': '', 'values': ''}
+    start = int(timestamps[0])
+    return {
+        'start': start,
+        'count': int(len(timestamps)),
+        'offsets': base64.b64encode((timestamps - start).astype('<i4').tobytes()).decode('ascii'),
+        'values': base64.b64encode(np.asarray(values, dtype='<i2').tobytes()).decode('ascii')
+    }
+
+
+def decode_series(encoded):
+    """encode_series 的逆操作"""
+    if not encoded or not encoded.get('count'):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int16)
+    offsets = np.frombuffer(base64.b64decode(encoded['offsets']), dtype='<i4').astype(np.int64)
+    values = np.frombuffer(base64.b64decode(encoded['values']), dtype='<i2').astype(np.int16)
+    return offsets + encoded['start'], values
+
+
+def extract_series(hr_data):
+    """planner 提取函数：心率接口原始数据 -> 紧凑的日内序列"""
+    return encode_series(*parse_series(hr_data))
+
+
+def sample_durations(timestamps, max_gap=None):
+    """每个采样代表的秒数：到下一个采样的间隔，超过 max_gap 的间隔（未佩戴）只计 max_gap 以内的典型间隔"""
+    if len(timestamps) == 0:
+        return np.array([], dtype=np.int64)
+    max_gap = max_gap or config.INTRADAY_MAX_GAP
+    gaps = np.diff(timestamps)
+    typical = int(np.median(gaps)) if len(gaps) else 0
+    typical = min(typical, max_gap)
+    gaps = np.where(gaps > max_gap, typical, gaps)
+    return np.append(gaps, typical)
+
+
+def downsample(timestamps, values, resolution):
+    """按 resolution 秒分桶求平均，返回 (桶起始时间戳, 平均心率)，空桶不输出"""
+    if len(timestamps) == 0:
+        return np.array([], dtype=np.int64), np.array([])
+    buckets = timestamps // resolution
+    keys, inverse = np.unique(buckets, return_inverse=True)
+    sums = np.bincount(inverse, weights=values.astype(np.float64))
+    counts = np.bincount(inverse)
+    return keys * resolution, sums / counts
+
+
+def zone_seconds(values, durations, max_hr):
+    """各心率区间的秒数：zone_0 为低于区间 1 下限，zone_1 ~ zone_5 按 ZONE_BOUNDS 划分"""
+    bounds = np.asarray(ZONE_BOUNDS) * max_hr
+    zones = np.searchsorted(bounds, values, side='right')
+    seconds = np.bincount(zones, weights=durations, minlength=len(ZONE_BOUNDS) + 1)
+    return {f'zone_{i}': int(s) for i, s in enumerate(seconds)}
+
+
+def load_aggregates(values, durations, max_hr, resting_hr=None):
+    """与能量消耗相关的汇总：时间加权平均心率、活跃时间（区间 2 及以上）和 Banister TRIMP"""
+    total = durations.sum()
+    if total == 0:
+        return {'monitored_seconds': 0, 'mean_hr': None, 'active_seconds': 0, 'trimp': 0.0}
+    hr = values.astype(np.float64)
+    resting = resting_hr or float(np.percentile(hr, 5))
+    reserve = np.clip((hr - resting) / max(max_hr - resting, 1), 0.0, 1.0)
+    trimp = (durations / 60.0) * reserve * 0.64 * np.exp(1.92 * reserve)
+    return {
+        'monitored_seconds': int(total),
+        'mean_hr': round(float((hr * durations).sum() / total), 1),
+        'active_seconds': int(durations[hr >= ZONE_BOUNDS[1] * max_hr].sum()),
+        'trimp': round(float(trimp.sum()), 2)
+    }
+
+
+def analyze(encoded, resolution=None, max_hr=None, resting_hr=None):
+    """从紧凑序列计算降采样序列、区间时间和训练负荷汇总"""
+    resolution = max(1, int(resolution or config.INTRADAY_DEFAULT_RESOLUTION))
+    max_hr = max_hr or config.INTRADAY_DEFAULT_MAX_HR
+    timestamps, values = decode_series(encoded)
+    durations = sample_durations(timestamps)
+    bucket_times, bucket_values = downsample(timestamps, values, resolution)
+    return {
+        'resolution': resolution,
+        'max_hr': max_hr,
+        'samples': int(len(values)),
+        'timestamps': (bucket_times * 1000).tolist(),
+        'values': np.round(bucket_values).astype(int).tolist(),
+        'zones': zone_seconds(values, durations, max_hr),
+        'aggregates': load_aggregates(values, durations, max_hr, resting_hr)
+    }
+
+
+def with_analysis(day_data, resolution=None, max_hr=None):
+    """返回把 heart_rate_intraday 替换为 analyze() 结果的 day_data 副本（原对象可能被合并的请求共享）"""
+    encoded = day_data.get('heart_rate_intraday')
+    if not isinstance(encoded, dict) or 'offsets' not in encoded:
+        return day_data
+    resting_hr = (day_data.get('heart_rate') or {}).get('resting_hr')
+    return dict(day_data, heart_rate_intraday=analyze(encoded, resolution, max_hr, resting_hr))
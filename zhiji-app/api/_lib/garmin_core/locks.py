@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+跨进程文件锁
+多个 worker 进程（gunicorn）共用同一个数据目录时：file_lock 串行化对同一文件的读-改-写，
+LeaderLock 保证后台线程（回填等）只在一个进程中运行，该进程退出后由其他进程接管
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在单进程下运行，锁退化为进程内的锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+
+@contextmanager
+def file_lock(path):
+    """独占锁定 path（阻塞等待），同一进程内的线程之间同样互斥"""
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class LeaderLock:
+    """按名称选出一个 leader 进程：持有锁文件的进程为 leader，直到进程退出才释放"""
+
+    def __init__(self, name, directory=None, retry_interval=None):
+        self.name = name
+        self.path = os.path.join(directory or config.LOCK_DIR, f'{name}.lock')
+        self.retry_interval = retry_interval if retry_interval is not None else config.LEADER_RETRY_INTERVAL
+        self._file = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    @property
+    def is_leader(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        """尝试成为 leader（不阻塞），返回是否为 leader"""
+        with self._lock:
+            if self._file is not None:
+                return True
+            if fcntl is None:
+                self._file = True
+                return True
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            f = open(self.path, 'a+')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            f.seek(0)
+            f.truncate()
+            f.write(str(os.getpid()))
+            f.flush()
+            self._file = f
+        logger.info(f"Process {os.getpid()} is now the {self.name} leader")
+        return True
+
+    def run_as_leader(self, callback):
+        """成为 leader 后调用 callback；暂时不是 leader 时在后台定期重试（当前 leader 退出后接管）"""
+        if self.try_acquire():
+            callback()
+            return
+        with self._lock:
+            if self._watcher is not None:
+                return
+
+            def watch():
+                while True:
+                    time.sleep(self.retry_interval)
+                    if self.try_acquire():
+                        callback()
+                        return
+
+            self._watcher = threading.Thread(target=watch, name=f'garmin-leader-{self.name}', daemon=True)
+            self._watcher.start()
+        logger.info(f"Process {os.getpid()} is a {self.name} follower, retrying every {self.retry_interval}s")
+
+    def state(self):
+        return {'name': self.name, 'leader': self.is_leader, 'pid': os.getpid()}
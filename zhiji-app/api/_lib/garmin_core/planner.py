@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+同步字段规划
+把调用方需要的字段映射到能覆盖它们的最少 garminconnect 请求：
+一个接口可以同时提供多个字段（例如每日汇总同时包含步数、静息心率和卡路里），
+每个请求只执行一次，结果由它提供的所有字段共享
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+
+from . import config
+from .training import classifier
+
+
+def extract_steps(steps_data):
+    """只提取关键步数信息"""
+    return {
+        'total_steps': steps_data.get('totalSteps', 0),
+        'step_goal': steps_data.get('stepGoal', 0),
+        'distance': steps_data.get('totalDistance', 0)
+    }
+
+
+def extract_summary_steps(summary):
+    """从每日汇总中提取步数信息"""
+    return {
+        'total_steps': summary.get('totalSteps', 0),
+        'step_goal': summary.get('dailyStepGoal', 0),
+        'distance': summary.get('totalDistanceMeters', 0)
+    }
+
+
+def extract_heart_rate(hr_data):
+    """只提取关键心率信息（心率接口和每日汇总字段名相同）"""
+    return {
+        'resting_hr': hr_data.get('restingHeartRate'),
+        'max_hr': hr_data.get('maxHeartRate'),
+        'min_hr': hr_data.get('minHeartRate')
+    }
+
+
+def extract_calories(summary):
+    """从每日汇总中提取卡路里"""
+    return {
+        'total_calories': summary.get('totalKilocalories'),
+        'active_calories': summary.get('activeKilocalories'),
+        'bmr_calories': summary.get('bmrKilocalories')
+    }
+
+
+def extract_sleep(sleep_data):
+    """只提取关键睡眠信息"""
+    daily_sleep = sleep_data.get('dailySleepDTO', {})
+    return {
+        'total_sleep_time': daily_sleep.get('sleepTimeSeconds'),
+        'deep_sleep_time': daily_sleep.get('deepSleepSeconds'),
+        'light_sleep_time': daily_sleep.get('lightSleepSeconds'),
+        'rem_sleep_time': daily_sleep.get('remSleepSeconds'),
+        'sleep_score': daily_sleep.get('overallSleepScore')
+    }
+
+
+def extract_weight(weight_data):
+    """只提取体重信息，没有体重记录时返回None"""
+    if weight_data.get('totalAverage'):
+        return {
+            'weight': weight_data['totalAverage'].get('weight'),
+            'bmi': weight_data['totalAverage'].get('bmi')
+        }
+    return None
+
+
+def extract_activities_summary(activities):
+    """只提取活动数量和类型"""
+    return {
+        'total_activities': len(activities) if activities else 0,
+        'activity_types': list(set([act.get('activityType', {}).get('typeKey', 'unknown')
+                                    for act in activities[:5]])) if activities else []  # 最多5个活动类型
+    }
+
+
+def extract_heart_rate_series(hr_data):
+    """日内心率序列（NumPy 按需导入，不请求该字段时不加载）"""
+    from .intraday import extract_series
+    return extract_series(hr_data)
+
+
+def extract_training(activities):
+    """活动的有氧/无氧分类（按 activityId 缓存）"""
+    return classifier.summarize(activities)
+
+
+def raw(data):
+    """原样返回接口数据"""
+    return data
+
+
+def split_daily_steps(steps_list):
+    """按日期拆分 get_daily_steps 的结果"""
+    return {item.get('calendarDate'): item for item in (steps_list or []) if isinstance(item, dict)}
+
+
+def split_body_composition(weight_data):
+    """按日期拆分 get_body_composition 的体重记录，并计算每天的平均值"""
+    entries = {}
+    for item in (weight_data or {}).get('dateWeightList') or []:
+        entries.setdefault(item.get('calendarDate'), []).append(item)
+    result = {}
+    for date_str, items in entries.items():
+        weights = [i['weight'] for i in items if i.get('weight') is not None]
+        bmis = [i['bmi'] for i in items if i.get('bmi') is not None]
+        result[date_str] = {'totalAverage': {
+            'weight': sum(weights) / len(weights) if weights else None,
+            'bmi': sum(bmis) / len(bmis) if bmis else None
+        }}
+    return result
+
+
+def activity_date(activity):
+    """活动发生的本地日期"""
+    return (activity.get('startTimeLocal') or activity.get('startTimeGMT') or '')[:10]
+
+
+def split_activities(activities):
+    """按日期拆分 get_activities_by_date 的活动列表"""
+    result = {}
+    for activity in activities or []:
+        result.setdefault(activity_date(activity), []).append(activity)
+    return result
+
+
+class Endpoint:
+    """一个 garminconnect 接口：按天或按日期范围请求，提供若干字段"""
+
+    def __init__(self, name, label, provides, fetch=None, fetch_range=None, split=None, empty=None):
+        self.name = name
+        self.label = label
+        self.provides = provides        # 字段 -> 提取函数
+        self.fetch = fetch              # (client, date) -> 原始数据
+        self.fetch_range = fetch_range  # (client, start, end) -> 原始数据
+        self.split = split              # 范围数据 -> {date: 当天原始数据}
+        self.empty = empty              # 范围数据中某天没有记录时的原始数据，None 表示每天都应有记录（缺少时按获取失败处理）
+
+    @property
+    def is_range(self):
+        return self.fetch_range is not None
+
+
+ENDPOINTS = OrderedDict((e.name, e) for e in [
+    Endpoint('daily_steps', 'Steps', {'steps': extract_steps},
+             fetch_range=lambda client, start, end: client.get_daily_steps(start, end),
+             split=split_daily_steps),
+    Endpoint('body_composition', 'Weight', {'weight': extract_weight},
+             fetch_range=lambda client, start, end: client.get_body_composition(start, end),
+             split=split_body_composition, empty={}),
+    Endpoint('activities', 'Activities', {'activities_summary': extract_activities_summary, 'training': extract_training,
+              'activities': raw},
+             fetch_range=lambda client, start, end: client.get_activities_by_date(start, end),
+             split=split_activities, empty=[]),
+    Endpoint('heart_rates', 'Heart rate', {'heart_rate': extract_heart_rate, 'heart_rate_intraday': extract_heart_rate_series},
+             fetch=lambda client, date_str: client.get_heart_rates(date_str)),
+    Endpoint('sleep', 'Sleep', {'sleep': extract_sleep, 'sleep_data': raw},
+             fetch=lambda client, date_str: client.get_sleep_data(date_str)),
+    Endpoint('daily_summary', 'Daily summary',
+             {'steps': extract_summary_steps, 'heart_rate': extract_heart_rate,
+              'calories': extract_calories, 'daily_summary': raw},
+             fetch=lambda client, date_str: client.get_user_summary(date_str)),
+])
+
+# 所有可请求的字段
+FIELDS = tuple(OrderedDict.fromkeys(f for e in ENDPOINTS.values() for f in e.provides))
+
+# 未指定 fields 时同步的字段（training 需要显式请求）
+DEFAULT_FIELDS = ('steps', 'heart_rate', 'sleep', 'weight', 'activities_summary')
+
+
+def parse_fields(fields):
+    """解析请求中的 fields（列表或逗号分隔字符串），返回字段元组；包含未知字段时抛出 ValueError"""
+    if not fields:
+        return DEFAULT_FIELDS
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(FIELDS)}")
+    return tuple(OrderedDict.fromkeys(fields))
+
+
+def date_windows(dates, max_days=None):
+    """把日期列表合并为连续的窗口 [(start, end, [dates])]，每个窗口不超过 max_days 天"""
+    max_days = max_days or config.RANGE_CHUNK_DAYS
+    windows = []
+    for date_str in sorted(set(dates)):
+        current = datetime.strptime(date_str, '%Y-%m-%d')
+        if windows:
+            start, end, members = windows[-1]
+            if (current - datetime.strptime(end, '%Y-%m-%d')).days == 1 and len(members) < max_days:
+                windows[-1] = (start, date_str, members + [date_str])
+                continue
+        windows.append((date_str, date_str, [date_str]))
+    return windows
+
+
+class PlannedCall:
+    """规划出的一次上游请求：某个接口在某一天或某个日期窗口上的调用"""
+
+    __slots__ = ('endpoint', 'start', 'end', 'dates', 'fields')
+
+    def __init__(self, endpoint, start, end, dates, fields):
+        self.endpoint = endpoint
+        self.start = start
+        self.end = end
+        self.dates = dates
+        self.fields = fields  # {date: [该次请求要提供的字段]}
+
+
+def plan_calls(pending):
+    """规划覆盖所有待获取 (字段, 日期) 的最少请求
+
+    pending: {field: [date]}。贪心集合覆盖：每轮选择"新覆盖的(字段, 日期)数 / 请求数"最大的接口，
+    范围接口每个连续窗口算一次请求，按天接口每天算一次请求
+    """
+    uncovered = {(field, d) for field, dates in pending.items() for d in dates}
+    calls = []
+    used = set()
+    while uncovered:
+        best = None
+        for endpoint in ENDPOINTS.values():
+            if endpoint.name in used:
+                continue
+            covered = {(f, d) for (f, d) in uncovered if f in endpoint.provides}
+            if not covered:
+                continue
+            dates = sorted({d for _, d in covered})
+            cost = len(date_windows(dates)) if endpoint.is_range else len(dates)
+            score = (len(covered) / cost, -cost, len(endpoint.provides))  # 同等效率时优先请求次数少的
+            if best is None or score > best[0]:
+                best = (score, endpoint, covered, dates)
+        if best is None:
+            break
+        _, endpoint, covered, dates = best
+        used.add(endpoint.name)
+        uncovered -= covered
+
+        fields_by_date = {}
+        for f, d in covered:
+            fields_by_date.setdefault(d, []).append(f)
+        if endpoint.is_range:
+            for start, end, window_dates in date_windows(dates):
+                calls.append(PlannedCall(endpoint, start, end, window_dates,
+                                         {d: fields_by_date[d] for d in window_dates}))
+        else:
+            for d in dates:
+                calls.append(PlannedCall(endpoint, d, d, [d], {d: fields_by_date[d]}))
+    return calls
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 会话池
+按账户缓存已登录的 Garmin 客户端，避免多个用户互相覆盖登录状态
+"""
+
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    """会话池中的单个条目"""
+
+    __slots__ = ('client', 'created_at', 'last_used')
+
+    def __init__(self, client):
+        now = time.monotonic()
+        self.client = client
+        self.created_at = now
+        self.last_used = now
+
+
+class SessionPool:
+    """线程安全的会话池，支持LRU淘汰、空闲超时和容量上限"""
+
+    def __init__(self, max_size=None, idle_ttl=None):
+        self.max_size = max_size if max_size is not None else config.SESSION_POOL_SIZE
+        self.idle_ttl = idle_ttl if idle_ttl is not None else config.SESSION_IDLE_TTL
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def normalize(account):
+        """统一账户键（邮箱不区分大小写）"""
+        return (account or '').strip().lower()
+
+    def get(self, account):
+        """获取账户对应的客户端，不存在或已过期时返回None"""
+        key = self.normalize(account)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            now = time.monotonic()
+            if self.idle_ttl and now - session.last_used > self.idle_ttl:
+                logger.info(f"Session for {key} expired after idle timeout")
+                del self._sessions[key]
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(key)
+            return session.client
+
+    def peek(self, account):
+        """同 get，但不更新最近使用时间（后台任务使用，不会让空闲会话一直留在池中）"""
+        key = self.normalize(account)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if self.idle_ttl and time.monotonic() - session.last_used > self.idle_ttl:
+                logger.info(f"Session for {key} expired after idle timeout")
+                del self._sessions[key]
+                return None
+            return session.client
+
+    def put(self, account, client):
+        """保存账户的客户端，超出容量时淘汰最久未使用的会话"""
+        key = self.normalize(account)
+        with self._lock:
+            self._sessions[key] = _Session(client)
+            self._sessions.move_to_end(key)
+            self._evict_locked()
+
+    def remove(self, account):
+        """移除账户会话（例如认证过期时）"""
+        key = self.normalize(account)
+        with self._lock:
+            return self._sessions.pop(key, None) is not None
+
+    def accounts(self):
+        """返回当前持有会话的账户列表（按最近使用排序）"""
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def evict_idle(self):
+        """清理所有空闲超时的会话，返回清理数量"""
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        evicted = 0
+        if self.idle_ttl:
+            deadline = time.monotonic() - self.idle_ttl
+            for key in [k for k, s in self._sessions.items() if s.last_used < deadline]:
+                del self._sessions[key]
+                evicted += 1
+        while self.max_size and len(self._sessions) > self.max_size:
+            key, _ = self._sessions.popitem(last=False)
+            logger.info(f"Session pool full, evicted least recently used session: {key}")
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        """返回会话池状态"""
+        with self._lock:
+            return {
+                'active_sessions': len(self._sessions),
+                'max_size': self.max_size,
+                'idle_ttl': self.idle_ttl
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
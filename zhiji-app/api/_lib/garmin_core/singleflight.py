@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+相同请求的合并（single-flight）
+同一账户、同一日期范围和字段的同步正在进行时，后来的请求直接等待并共享这次的结果，
+而不是再向Garmin发起一轮相同的请求。只合并同一进程内的请求，多个 worker 进程之间不共享
+"""
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """执行 fn()，同一键已有调用在进行时等待其结果；返回 (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.event.set()
+            if call.waiters:
+                logger.info(f"Single-flight call shared with {call.waiters} concurrent request(s): {key}")
+        else:
+            call.event.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+同步结果流式输出
+支持 NDJSON（每行一个JSON）和 Server-Sent Events 两种格式：
+每天的数据就绪后立即输出一帧，最后输出一帧汇总（错误和部分数据状态）
+"""
+
+from . import jsoncodec
+
+NDJSON = 'ndjson'
+SSE = 'sse'
+
+MIMETYPES = {
+    NDJSON: 'application/x-ndjson',
+    SSE: 'text/event-stream'
+}
+
+
+def stream_format(requested, accept=None):
+    """根据请求参数 stream 或 Accept 头确定流式格式，不需要流式时返回None"""
+    if isinstance(requested, str) and requested.lower() in MIMETYPES:
+        return requested.lower()
+    if requested is True:
+        return NDJSON
+    accept = (accept or '').lower()
+    if MIMETYPES[SSE] in accept:
+        return SSE
+    if MIMETYPES[NDJSON] in accept:
+        return NDJSON
+    return None
+
+
+def encode_frame(fmt, frame_type, payload):
+    """编码一帧：day 帧为 {"type": "day", "data": ...}，summary 帧把汇总字段放在顶层"""
+    if frame_type == 'day':
+        body = {'type': frame_type, 'data': payload}
+    else:
+        body = dict(payload, type=frame_type)
+    text = jsoncodec.dumps(body)
+    if fmt == SSE:
+        return f'event: {frame_type}\ndata: {text}\n\n'
+    return text + '\n'
+
+
+def summarize_days(result_data, is_complete):
+    """汇总帧中的错误和部分数据状态"""
+    errors = {}
+    for day_data in result_data:
+        day_errors = dict(day_data.get('cache', {}).get('errors', {}))
+        if day_data.get('error'):
+            day_errors['day'] = day_data['error']
+        if day_errors:
+            errors[day_data['date']] = day_errors
+    return {
+        'days': len(result_data),
+        'errors': errors,
+        'partial': any(not is_complete(d) for d in result_data),
+        'stale': any(d.get('stale') for d in result_data)
+    }
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Garmin 同步引擎
+按 planner 规划出的最少上游请求获取所需字段：请求提交到有界线程池并发执行，
+一次请求的结果由它提供的所有字段共享，每个请求的错误单独处理，互不影响
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import config
+from . import upstream
+from .errors import classify_error, UNAVAILABLE_ERRORS
+from .planner import DEFAULT_FIELDS, plan_calls
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=config.SYNC_WORKERS, thread_name_prefix='garmin-sync')
+
+# 指标获取状态（出错时为 errors.classify_error 的分类结果）
+STATUS_OK = 'ok'
+STATUS_PRIVACY = 'privacy_protected'
+STATUS_MISSING = 'missing'  # 范围数据中缺少本应存在的日期（不缓存，下次同步重新获取）
+
+
+def is_privacy_protected(data):
+    return isinstance(data, dict) and data.get('privacyProtected')
+
+
+def empty_day(date_str, fields=None):
+    """空的每日数据结构"""
+    day_data = {'date': date_str}
+    for name in fields or DEFAULT_FIELDS:
+        day_data[name] = None
+    return day_data
+
+
+def extract_fields(endpoint, raw, fields, date_str):
+    """从一天的原始数据中提取多个字段，返回 {field: (value, status)}"""
+    results = {}
+    for field in fields:
+        try:
+            results[field] = (endpoint.provides[field](raw) if raw is not None else None, STATUS_OK)
+        except Exception as e:
+            logger.warning(f"Could not parse {field} from {endpoint.label.lower()} data for {date_str}: {e}")
+            results[field] = (None, classify_error(e))
+    return results
+
+
+def execute_call(client, call):
+    """执行一次规划好的请求，返回 {date: {field: (value, status)}}，异常不会向外抛出"""
+    endpoint = call.endpoint
+    span = call.start if call.start == call.end else f"{call.start} ~ {call.end}"
+
+    def all_dates(status):
+        return {d: {f: (None, status) for f in fields} for d, fields in call.fields.items()}
+
+    try:
+        if endpoint.is_range:
+            raw = endpoint.fetch_range(client, call.start, call.end)
+        else:
+            raw = endpoint.fetch(client, call.start)
+    except Exception as e:
+        logger.warning(f"Could not fetch {endpoint.label.lower()} data for {span}: {e}")
+        return all_dates(classify_error(e))
+
+    if is_privacy_protected(raw) or (not endpoint.is_range and not raw):
+        logger.warning(f"{endpoint.label} data privacy protected for {span}")
+        return all_dates(STATUS_PRIVACY)
+
+    by_day = endpoint.split(raw) if endpoint.is_range else {call.start: raw}
+    results = {}
+    for d, fields in call.fields.items():
+        if endpoint.is_range and endpoint.empty is None and d not in by_day:
+            logger.warning(f"{endpoint.label} data missing for {d} in range {span}")
+            results[d] = {f: (None, STATUS_MISSING) for f in fields}
+        else:
+            results[d] = extract_fields(endpoint, by_day.get(d, endpoint.empty), fields, d)
+    logger.info(f"{endpoint.label} data retrieved for {span} "
+                f"({len(call.dates)} days, fields: {', '.join(sorted({f for fs in call.fields.values() for f in fs}))})")
+    return results
+
+
+def timed_execute(client, call, timings):
+    """执行请求并把耗时、上游请求次数和限流等待记入 timings（profiling.RequestTimings）"""
+    started = time.perf_counter()
+    with upstream.tracking() as stats:
+        results = execute_call(client, call)
+    timings.record_call(call, time.perf_counter() - started, stats)
+    return results
+
+
+def iter_fetch_days(client, dates, fields=None, account=None, cache=None, force_refresh=False, timings=None,
+                    serve_stale=False):
+    """获取多天的字段，每天的所有字段就绪后立即产出 day_data
+
+    fields 为 planner.FIELDS 中的字段，默认 DEFAULT_FIELDS。提供 cache 时先按字段读缓存，
+    只规划未命中的字段；成功获取的结果写回缓存，隐私保护或出错的字段不缓存。
+    未命中的 (字段, 日期) 由 planner.plan_calls 规划成最少的上游请求：一个接口同时提供多个字段时
+    只请求一次，支持范围查询的接口把日期合并成窗口。所有请求并发执行。
+    client 也可以是返回客户端的无参函数，只有确实需要请求上游时才调用（便于按需登录）。
+    返回的数据中 cache 字段记录命中、未命中和获取失败的字段。
+    提供 timings 时记录读缓存、登录和每个上游请求的耗时。
+    serve_stale 为真时，因上游不可用（限流、连接错误、熔断打开）而获取失败的字段改用最近一次缓存的值（即使已过期），
+    这些字段列在 cache.stale 中、当天标记 stale: true，仍算作获取失败（之后的同步会重新请求）
+    """
+    fields = list(fields or DEFAULT_FIELDS)
+    results = OrderedDict()
+    pending = {}    # field -> [date]
+    remaining = {}  # date -> 尚未就绪的字段数
+    started = time.perf_counter()
+
+    for date_str in dates:
+        day_data = empty_day(date_str, fields)
+        day_data['cache'] = {'hit': [], 'miss': [], 'failed': [], 'errors': {}}
+        results[date_str] = day_data
+        remaining[date_str] = 0
+        for name in fields:
+            if cache is not None and not force_refresh:
+                hit, value = cache.get(account, date_str, name)
+                if hit:
+                    day_data[name] = value
+                    day_data['cache']['hit'].append(name)
+                    if timings is not None:
+                        timings.record_cache_hit(date_str, name)
+                    continue
+            pending.setdefault(name, []).append(date_str)
+            remaining[date_str] += 1
+
+    def finish(day_data):
+        if cache is None:
+            del day_data['cache']
+        return day_data
+
+    if timings is not None:
+        timings.add_phase('cache_read', time.perf_counter() - started)
+
+    # 完全命中缓存的日期直接产出
+    for date_str, count in remaining.items():
+        if count == 0:
+            yield finish(results[date_str])
+
+    if not pending:
+        return
+
+    login_error = None
+    if callable(client):
+        started = time.perf_counter()
+        try:
+            client = client()
+        except Exception as e:
+            # 上游不可用时无法登录：所有待获取的字段按获取失败处理（改用过期缓存）
+            if not serve_stale or classify_error(e) not in UNAVAILABLE_ERRORS:
+                raise
+            logger.warning(f"Could not log in to Garmin, serving stale cache: {e}")
+            login_error = classify_error(e)
+        if timings is not None:
+            timings.add_phase('login', time.perf_counter() - started)
+
+    if login_error is None:
+        client = upstream.wrap(client)
+        calls = plan_calls(pending)
+        logger.info(f"Planned {len(calls)} upstream calls for {sum(len(d) for d in pending.values())} "
+                    f"pending field-days")
+        if timings is None:
+            futures = [_executor.submit(execute_call, client, call) for call in calls]
+        else:
+            futures = [_executor.submit(timed_execute, client, call, timings) for call in calls]
+        completed = (future.result() for future in as_completed(futures))
+    else:
+        failed = {}
+        for name, field_dates in pending.items():
+            for date_str in field_dates:
+                failed.setdefault(date_str, {})[name] = (None, login_error)
+        completed = [failed]
+
+    for values_by_date in completed:
+        for date_str, values in values_by_date.items():
+            day_data = results[date_str]
+            cache_info = day_data['cache']
+            for name, (value, status) in values.items():
+                day_data[name] = value
+                cache_info['miss'].append(name)
+                if status != STATUS_OK:
+                    cache_info['failed'].append(name)
+                    if status != STATUS_PRIVACY:
+                        cache_info['errors'][name] = status
+                    if serve_stale and cache is not None and status in UNAVAILABLE_ERRORS:
+                        hit, stale_value, _ = cache.get_stale(account, date_str, name)
+                        if hit:
+                            day_data[name] = stale_value
+                            cache_info.setdefault('stale', []).append(name)
+                            day_data['stale'] = True
+                elif cache is not None:
+                    cache.set(account, date_str, name, value)
+                remaining[date_str] -= 1
+            if remaining[date_str] == 0:
+                yield finish(day_data)
+
+
+def fetch_days(client, dates, fields=None, account=None, cache=None, force_refresh=False, timings=None,
+               serve_stale=False):
+    """获取多天的字段，返回按 dates 顺序排列的 {date: day_data}（参见 iter_fetch_days）"""
+    ready = {day_data['date']: day_data for day_data in iter_fetch_days(
+        client, dates, fields=fields, account=account, cache=cache, force_refresh=force_refresh,
+        timings=timings, serve_stale=serve_stale)}
+    return OrderedDict((date_str, ready[date_str]) for date_str in dates)
+
+
+def fetch_day(client, date_str, fields=None, account=None, cache=None, force_refresh=False):
+    """获取单独一天的字段（参见 fetch_days）"""
+    return fetch_days(client, [date_str], fields=fields, account=account,
+                      cache=cache, force_refresh=force_refresh)[date_str]
+
+
+def is_day_complete(day_data):
+    """当天所有指标都已成功获取（命中缓存或请求成功）"""
+    return not day_data.get('error') and not day_data.get('cache', {}).get('failed')
+
+
+def sync_dates(end_date, days=None, since=None, max_days=None):
+    """计算同步的日期列表（从 end_date 往前，按日期倒序）
+
+    指定 since 时覆盖 since 到 end_date 的所有日期，否则覆盖最近 days 天
+    """
+    max_days = max_days or config.SYNC_MAX_DAYS
+    if since is not None:
+        days = (end_date.date() - since.date()).days + 1
+    days = max(1, min(days or 1, max_days))
+    return [(end_date - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+
+def is_day_unavailable(day_data):
+    """当天没有任何可返回的数据：没有命中缓存，也没有过期缓存，且所有失败都是因为上游不可用"""
+    cache_info = day_data.get('cache', {})
+    errors = cache_info.get('errors', {})
+    failed = cache_info.get('failed', [])
+    return (bool(failed) and len(failed) == len(cache_info.get('miss', [])) and not cache_info.get('hit')
+            and not cache_info.get('stale') and len(errors) == len(failed)
+            and all(status in UNAVAILABLE_ERRORS for status in errors.values()))
+
+
+def day_error_types(day_data):
+    """当天各项指标出错的分类集合（rate_limited / auth_expired 等）"""
+    return set(day_data.get('cache', {}).get('errors', {}).values())
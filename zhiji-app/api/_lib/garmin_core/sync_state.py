@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+增量同步状态
+记录每个账户每天是否已完整同步，以及"水位线"：
+水位线及之前的所有日期都已完整同步且数据不再变化，无需再请求Garmin
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timedelta
+
+from . import config
+from .cache import is_immutable
+
+logger = logging.getLogger(__name__)
+
+# 同一账户的请求时间最多每隔多少秒写一次
+ACTIVITY_WRITE_INTERVAL = 60.0
+
+
+class SyncStateStore:
+    """每日同步完成情况和账户水位线（与缓存共用SQLite文件）"""
+
+    def __init__(self, path=None):
+        self.path = path or config.CACHE_PATH
+        self._lock = threading.RLock()
+        self._conn = None
+        self._touched = {}  # 账户 -> 本进程最近一次写入活动时间
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_days (
+                    account TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    complete INTEGER NOT NULL,
+                    synced_at REAL NOT NULL,
+                    PRIMARY KEY (account, date)
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_watermarks (
+                    account TEXT PRIMARY KEY,
+                    watermark TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS account_activity (
+                    account TEXT PRIMARY KEY,
+                    last_request_at REAL NOT NULL
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _account(account):
+        return (account or '').strip().lower()
+
+    def get_watermark(self, account):
+        """返回账户的水位线日期（YYYY-MM-DD），没有时返回None"""
+        with self._lock:
+            row = self._db().execute(
+                'SELECT watermark FROM sync_watermarks WHERE account=?', (self._account(account),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_days(self, account, day_status):
+        """记录每天的同步结果 {date: complete}，并推进水位线"""
+        account = self._account(account)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                'INSERT OR REPLACE INTO sync_days (account, date, complete, synced_at) VALUES (?, ?, ?, ?)',
+                [(account, d, 1 if complete else 0, now) for d, complete in day_status.items()]
+            )
+            db.commit()
+            return self._advance_watermark_locked(account)
+
+    def _advance_watermark_locked(self, account):
+        """从当前水位线开始，沿着连续的、完整且不再变化的日期向后推进"""
+        db = self._db()
+        row = db.execute('SELECT watermark FROM sync_watermarks WHERE account=?', (account,)).fetchone()
+        watermark = row[0] if row else None
+        rows = db.execute(
+            'SELECT date FROM sync_days WHERE account=? AND complete=1 AND date>? ORDER BY date',
+            (account, watermark or '')
+        ).fetchall()
+
+        new_watermark = watermark
+        expected = None
+        if watermark:
+            expected = datetime.strptime(watermark, '%Y-%m-%d') + timedelta(days=1)
+        for (date_str,) in rows:
+            current = datetime.strptime(date_str, '%Y-%m-%d')
+            if expected is not None and current != expected:
+                break
+            if not is_immutable(date_str):
+                break
+            new_watermark = date_str
+            expected = current + timedelta(days=1)
+
+        if new_watermark and new_watermark != watermark:
+            db.execute(
+                'INSERT OR REPLACE INTO sync_watermarks (account, watermark, updated_at) VALUES (?, ?, ?)',
+                (account, new_watermark, time.time())
+            )
+            db.commit()
+            logger.info(f"Sync watermark for {account} advanced to {new_watermark}")
+        return new_watermark
+
+    def touch(self, account, now=None):
+        """记录账户最近一次用户请求的时间（所有 worker 进程共享，预取只处理最近活跃的账户）
+
+        同一进程内同一账户 ACTIVITY_WRITE_INTERVAL 秒内只写一次
+        """
+        account = self._account(account)
+        now = now if now is not None else time.time()
+        with self._lock:
+            if now - self._touched.get(account, 0.0) < ACTIVITY_WRITE_INTERVAL:
+                return
+            self._touched[account] = now
+            db = self._db()
+            db.execute('INSERT OR REPLACE INTO account_activity (account, last_request_at) VALUES (?, ?)',
+                       (account, now))
+            db.commit()
+
+    def active_accounts(self, since):
+        """since（时间戳）之后有过用户请求的账户，按最近请求排序"""
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT account FROM account_activity WHERE last_request_at>=? ORDER BY last_request_at DESC',
+                (since,)
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+冷启动计时
+记录模块导入、按需导入的重量级依赖（garminconnect、NumPy）以及每种请求第一次执行的耗时，
+用于衡量和跟踪 Serverless 冷启动成本；热调用时同一进程内的计时不再变化
+"""
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """进程级的冷启动计时"""
+
+    def __init__(self):
+        self.process_started = time.time()
+        self._lock = threading.Lock()
+        self._imports = {}         # 名称 -> 秒数
+        self._first_requests = {}  # action -> 秒数
+        self._requests = 0
+
+    def record_import(self, name, seconds):
+        with self._lock:
+            self._imports.setdefault(name, seconds)
+        logger.info(f"Imported {name} in {seconds * 1000:.1f} ms")
+
+    @contextmanager
+    def measure_import(self, name):
+        """计时一次导入：with startup.measure_import('garminconnect'): import ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_import(name, time.perf_counter() - started)
+
+    def record_request(self, action, seconds):
+        """记录一次请求；每种 action 只保留第一次（冷启动）的耗时"""
+        with self._lock:
+            self._requests += 1
+            first = action not in self._first_requests
+            if first:
+                self._first_requests[action] = seconds
+        if first:
+            logger.info(f"First {action} request took {seconds * 1000:.1f} ms "
+                        f"({self.since_start():.1f} s after process start)")
+
+    def since_start(self):
+        return time.time() - self.process_started
+
+    def report(self):
+        with self._lock:
+            return {
+                'uptime_seconds': round(self.since_start(), 3),
+                'warm': self._requests > 1,
+                'requests': self._requests,
+                'imports_ms': {name: round(s * 1000, 1) for name, s in self._imports.items()},
+                'first_request_ms': {action: round(s * 1000, 1) for action, s in self._first_requests.items()}
+            }
+
+
+# 进程内共享的计时器
+startup = StartupTimer()
@@ -5,313 +5,64 @@ Garmin Connect API for Vercel Serverless Functions
 使用 Python garminconnect 库获取 Garmin 数据
 """
 
-import json
+import time
+_import_started = time.perf_counter()  # 冷启动计时：模块导入开始
+
 import os
-from datetime import datetime, timedelta
-import traceback
-from http.server import BaseHTTPRequestHandler
-import urllib.parse
+import sys
+
+# 与 backend/ 共享的 Garmin 核心模块（同步引擎、令牌存储、缓存、共享限流等）：
+# Vercel 只部署 zhiji-app，使用 scripts/vendor_garmin_core.py 同步到 api/_lib 的副本；
+# 本地开发可以用 GARMIN_CORE_PATH 指向 backend/
+GARMIN_CORE_PATH = os.environ.get('GARMIN_CORE_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '_lib')
+if GARMIN_CORE_PATH not in sys.path:
+    sys.path.insert(0, GARMIN_CORE_PATH)
+
+from garmin_core.service import GarminService, load_garmin_class
+from garmin_core.adapters import make_request_handler, run_stdin
+from garmin_core.timing import startup
+
+# 未指定 fields 时同步的字段（原始的每日汇总、活动列表和睡眠数据）
+LEGACY_FIELDS = ('daily_summary', 'activities', 'sleep_data')
 
-try:
-    from garminconnect import Garmin, GarminConnectConnectionError, GarminConnectTooManyRequestsError, GarminConnectAuthenticationError
-except ImportError as e:
-    # 如果导入失败，创建一个错误处理器
-    class Handler(BaseHTTPRequestHandler):
-        def do_POST(self):
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            error_response = {
-                'success': False,
-                'error': f'garminconnect library not installed: {str(e)}'
-            }
-            self.wfile.write(json.dumps(error_response).encode())
-    
-    # 导出handler供Vercel使用
-    handler = Handler
-    
-    # 如果作为脚本运行，也要处理
-    if __name__ == '__main__':
-        print(json.dumps({
-            'success': False,
-            'error': f'garminconnect library not installed: {str(e)}'
-        }))
-        exit(1)
 
-def handle_login(data):
-    """处理登录请求"""
-    try:
-        email = data.get('email')
-        password = data.get('password')
-        
-        if not email or not password:
-            return {
-                'success': False,
-                'error': 'Email and password are required'
-            }
-        
-        # 创建Garmin连接
-        garmin = Garmin(email, password)
-        garmin.login()
-        
-        return {
-            'success': True,
-            'data': {
-                'success': True,
-                'message': 'Login successful'
-            }
-        }
-    except GarminConnectAuthenticationError as e:
-        return {
-            'success': False,
-            'error': f'Authentication failed: {str(e)}'
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'Login error: {str(e)}'
-        }
+def legacy_day(day):
+    """把一天的同步数据换回原来的键名（sleep_data -> sleep），不修改缓存中的字典"""
+    if not isinstance(day, dict) or 'sleep_data' not in day:
+        return day
+    return {('sleep' if key == 'sleep_data' else key): value for key, value in day.items()}
 
-def handle_sync(data):
-    """处理数据同步请求"""
-    try:
-        email = data.get('email')
-        password = data.get('password')
-        target_date = data.get('date')
-        
-        if not email or not password:
-            return {
-                'success': False,
-                'error': 'Email and password are required'
-            }
-        
-        # 创建Garmin连接
-        garmin = Garmin(email, password)
-        garmin.login()
-        
-        # 设置目标日期
-        if target_date:
-            try:
-                date_obj = datetime.strptime(target_date, '%Y-%m-%d')
-            except ValueError:
-                return {
-                    'success': False,
-                    'error': 'Invalid date format. Use YYYY-MM-DD'
-                }
-        else:
-            date_obj = datetime.now()
-        
-        # 获取数据
-        result_data = []
-        
-        # 获取过去7天的数据
-        for i in range(7):
-            current_date = date_obj - timedelta(days=i)
-            date_str = current_date.strftime('%Y-%m-%d')
-            
-            try:
-                # 获取每日汇总数据
-                daily_summary = garmin.get_daily_summary(current_date.strftime('%Y-%m-%d'))
-                
-                # 获取活动数据
-                activities = garmin.get_activities_by_date(current_date.strftime('%Y-%m-%d'))
-                
-                # 获取睡眠数据
-                sleep_data = None
-                try:
-                    sleep_data = garmin.get_sleep_data(current_date.strftime('%Y-%m-%d'))
-                except:
-                    pass  # 睡眠数据可能不存在
-                
-                day_data = {
-                    'date': date_str,
-                    'daily_summary': daily_summary,
-                    'activities': activities,
-                    'sleep': sleep_data
-                }
-                
-                result_data.append(day_data)
-                
-            except Exception as e:
-                # 如果某一天的数据获取失败，继续获取其他天的数据
-                day_data = {
-                    'date': date_str,
-                    'error': str(e),
-                    'daily_summary': None,
-                    'activities': [],
-                    'sleep': None
-                }
-                result_data.append(day_data)
-        
-        return {
-            'success': True,
-            'data': result_data
-        }
-        
-    except GarminConnectAuthenticationError as e:
-        return {
-            'success': False,
-            'error': f'Authentication failed: {str(e)}'
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'Sync error: {str(e)}'
-        }
 
-def handle_user_info(data):
-    """处理用户信息请求"""
-    try:
-        email = data.get('email')
-        password = data.get('password')
-        
-        if not email or not password:
-            return {
-                'success': False,
-                'error': 'Email and password are required'
-            }
-        
-        # 创建Garmin连接
-        garmin = Garmin(email, password)
-        garmin.login()
-        
-        # 获取用户信息
-        user_profile = garmin.get_user_profile()
-        
-        return {
-            'success': True,
-            'data': user_profile
-        }
-        
-    except GarminConnectAuthenticationError as e:
-        return {
-            'success': False,
-            'error': f'Authentication failed: {str(e)}'
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'User info error: {str(e)}'
-        }
+class LegacyGarminService(GarminService):
+    """保持原 Vercel 函数的响应格式：动作的结果（包括失败）都以 200 返回，错误放在 success / error 中；
+    未指定 fields 的同步请求把每天的原始睡眠数据放在 sleep 键下；登录结果带上原来的 data 字段"""
 
-class Handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        try:
-            # 读取请求体
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            
-            # 解析JSON数据
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-            except json.JSONDecodeError:
-                self.send_error_response(400, 'Invalid JSON')
-                return
-            
-            action = data.get('action')
-            
-            if action == 'login':
-                result = handle_login(data)
-            elif action == 'sync':
-                result = handle_sync(data)
-            elif action == 'user_info':
-                result = handle_user_info(data)
-            else:
-                result = {
-                    'success': False,
-                    'error': f'Unknown action: {action}'
-                }
-            
-            # 发送响应
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
-            
-        except Exception as e:
-            self.send_error_response(500, f'Server error: {str(e)}')
-    
-    def send_error_response(self, status_code, message):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        error_response = {
-            'success': False,
-            'error': message
-        }
-        self.wfile.write(json.dumps(error_response).encode())
+    def dispatch(self, data):
+        status, result = super().dispatch(data)
+        if status == 304:
+            return status, result
+        action = (data or {}).get('action')
+        if action == 'sync' and result.get('success') and not data.get('fields') \
+                and result.get('format') != 'compact':
+            result['data'] = [legacy_day(day) for day in result.get('data') or []]
+        elif action == 'login' and result.get('success'):
+            result.setdefault('data', {'success': True, 'message': result.get('message')})
+        return 200, result
+
+
+# 与 Flask 后端相同的同步服务，模块级创建以便热调用复用会话池、缓存和配置；
+# 每个请求带上邮箱和密码（或登录时签发的 session_token），使用会话池、令牌和 /tmp 缓存之前先核对凭据指纹，
+# 密码无法在本地验证时先向Garmin登录；garminconnect 在第一次需要登录时才导入，凭据已验证且全部命中缓存时无需登录；
+# 这里没有历史汇总接口，不记录指标历史（同步时不导入 NumPy，只有请求日内心率时才需要）
+service = LegacyGarminService(garmin_loader=load_garmin_class, default_fields=LEGACY_FIELDS, default_days=7,
+                              history=False)
 
 # Vercel Serverless Function handler
-class handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        try:
-            # 读取请求体
-            content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            action = data.get('action')
-            
-            if action == 'login':
-                result = handle_login(data)
-            elif action == 'sync':
-                result = handle_sync(data)
-            elif action == 'user_info':
-                result = handle_user_info(data)
-            else:
-                result = {
-                    'success': False,
-                    'error': f'Unknown action: {action}'
-                }
-            
-            # 发送响应
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
-            
-        except Exception as e:
-            self.send_error_response(500, f'Handler error: {str(e)}')
-    
-    def send_error_response(self, status_code, message):
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        error_response = {
-            'success': False,
-            'error': message
-        }
-        self.wfile.write(json.dumps(error_response).encode())
+handler = make_request_handler(service)
+
+startup.record_import('api.garmin', time.perf_counter() - _import_started)
 
-# 如果作为脚本运行（用于本地开发）
+# 如果作为脚本运行（用于本地开发）：从stdin读取JSON请求
 if __name__ == '__main__':
-    import sys
-    
-    try:
-        # 从stdin读取请求数据
-        input_data = sys.stdin.read()
-        data = json.loads(input_data)
-        
-        action = data.get('action')
-        
-        if action == 'login':
-            result = handle_login(data)
-        elif action == 'sync':
-            result = handle_sync(data)
-        elif action == 'user_info':
-            result = handle_user_info(data)
-        else:
-            result = {
-                'success': False,
-                'error': f'Unknown action: {action}'
-            }
-        
-        print(json.dumps(result))
-        
-    except Exception as e:
-        error_result = {
-            'success': False,
-            'error': f'Script error: {str(e)}',
-            'traceback': traceback.format_exc()
-        }
-        print(json.dumps(error_result))
\ No newline at end of file
+    run_stdin(service)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把 backend/garmin_core 同步到 api/_lib/garmin_core
+Vercel 只部署 zhiji-app 目录，Python 函数（api/garmin.py）使用这份副本；修改 backend/garmin_core 后运行本脚本并一起提交。
+--check 只比较，副本与源码不一致时返回非零退出码
+"""
+
+import os
+import sys
+import shutil
+import filecmp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, '..', 'backend', 'garmin_core')
+TARGET = os.path.join(ROOT, 'api', '_lib', 'garmin_core')
+
+
+def source_files():
+    return sorted(name for name in os.listdir(SOURCE) if name.endswith('.py'))
+
+
+def diff():
+    """返回 (需要更新的文件, 需要删除的文件)"""
+    names = source_files()
+    existing = sorted(n for n in os.listdir(TARGET) if n.endswith('.py')) if os.path.isdir(TARGET) else []
+    changed = [n for n in names if n not in existing
+               or not filecmp.cmp(os.path.join(SOURCE, n), os.path.join(TARGET, n), shallow=False)]
+    removed = [n for n in existing if n not in names]
+    return changed, removed
+
+
+def main():
+    changed, removed = diff()
+    if '--check' in sys.argv[1:]:
+        for name in changed + removed:
+            print(f'out of date: api/_lib/garmin_core/{name}')
+        return 1 if changed or removed else 0
+
+    os.makedirs(TARGET, exist_ok=True)
+    for name in changed:
+        shutil.copy2(os.path.join(SOURCE, name), os.path.join(TARGET, name))
+    for name in removed:
+        os.remove(os.path.join(TARGET, name))
+    print(f'garmin_core vendored: {len(changed)} updated, {len(removed)} removed')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
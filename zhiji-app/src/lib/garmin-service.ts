@@ -44,6 +44,10 @@ export interface GarminData {
  */
 export class GarminService {
   private isLoggedIn = false;
+  // 登录时后端签发的会话密钥，同步和用户信息请求用它代替密码
+  private sessionToken: string | null = null;
+  // 上次同步结果和 ETag（按日期和天数），数据未变化时后端返回 304
+  private syncCache = new Map<string, { etag: string; data: any[] }>();
   private email: string;
   private password: string;
 
@@ -86,6 +90,7 @@ export class GarminService {
       
       if (result.success) {
         this.isLoggedIn = true;
+        this.sessionToken = result.session_token || null;
         console.log('Garmin登录成功');
         return true;
       } else {
@@ -99,6 +104,23 @@ export class GarminService {
     }
   }
 
+  /**
+   * 请求体中的账户凭据：优先使用会话密钥，后端未签发时使用密码
+   */
+  private credentials(): { email: string; session_token?: string; password?: string } {
+    return this.sessionToken
+      ? { email: this.email, session_token: this.sessionToken }
+      : { email: this.email, password: this.password };
+  }
+
+  /**
+   * 会话失效（后端返回401）：下次请求前重新登录
+   */
+  private resetSession(): void {
+    this.isLoggedIn = false;
+    this.sessionToken = null;
+  }
+
   /**
    * 确保已登录
    */
@@ -113,7 +135,7 @@ export class GarminService {
    * @param date 可选的日期字符串，格式为 YYYY-MM-DD
    * @returns Promise<GarminData>
    */
-  async syncData(date?: string): Promise<GarminData> {
+  async syncData(date?: string, retried = false): Promise<GarminData> {
     if (!this.isConfigured()) {
       throw new Error('Garmin账户信息未配置，请在环境变量中设置 GARMIN_EMAIL 和 GARMIN_PASSWORD');
     }
@@ -122,6 +144,8 @@ export class GarminService {
 
     try {
       const days = date ? 1 : 7; // 如果指定日期则获取单日，否则获取7天
+      const cacheKey = `${date || 'today'}:${days}`;
+      const cached = this.syncCache.get(cacheKey);
       
       // 使用新的Render后端服务
       const backendUrl = process.env.GARMIN_BACKEND_URL || 'http://localhost:5001';
@@ -130,16 +154,33 @@ export class GarminService {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(cached ? { 'If-None-Match': cached.etag } : {}),
         },
         body: JSON.stringify({
+          ...this.credentials(),
           date: date,
           days: days
         })
       });
 
+      // 会话已失效：重新登录后重试一次
+      if (response.status === 401 && !retried) {
+        this.resetSession();
+        return this.syncData(date, true);
+      }
+
+      // 数据未变化：复用上次的结果
+      if (response.status === 304 && cached) {
+        return this.transformPythonDataToGarminData(cached.data, date);
+      }
+
       const result = await response.json();
       
       if (result.success && result.data) {
+        const etag = response.headers.get('ETag');
+        if (etag) {
+          this.syncCache.set(cacheKey, { etag, data: result.data });
+        }
         return this.transformPythonDataToGarminData(result.data, date);
       } else {
         throw new Error(result.error || '数据同步失败');
@@ -237,11 +278,12 @@ export class GarminService {
       // 使用新的Render后端服务
       const backendUrl = process.env.GARMIN_BACKEND_URL || 'http://localhost:5001';
       
-      const response = await fetch(`${backendUrl}/api/garmin/user_info`, {
-        method: 'GET',
+      const response = await fetch(`${backendUrl}/api/garmin/user-info`, {
+        method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-        }
+        },
+        body: JSON.stringify(this.credentials())
       });
 
       const result = await response.json();